@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Agent inventory enrichment of device.* from a local Wazuh agent inventory
+
+The inventory comes from a copy of the manager's SQLite global.db (agent,
+labels and group tables) or from a JSON dump of the API's GET /agents
+response, standing in for live API calls. The whole inventory is loaded in
+bulk at startup into a dict keyed by agent id and reloaded by a background
+thread every ttl seconds (sooner, rate limited, when alerts arrive from an
+agent it does not know yet and the file has changed). A reload builds a new
+dict and swaps it in with one assignment, so the translator stage is a dict
+lookup and never waits on I/O. Alert agent ids are normalized with
+agent_key() before the lookup. An unknown id is remembered until the file's
+signature (inode, size, mtime) changes, so a stream of alerts from an
+unregistered agent asks for one early reload, not one per alert.
+
+Each agent contributes device.os, device.groups and its labels, which are
+appended to metadata.labels as "key:value".
+"""
+import json
+import os
+import sqlite3
+import threading
+from time import monotonic
+
+from metrics_exporter import format_sample
+from ocsf_translator import copy_tree
+
+# Wazuh os_platform values to OCSF os.type_id / os.type
+OS_TYPES = {
+    "windows": (100, "Windows"),
+    "darwin": (300, "macOS"),
+    "ios": (301, "iOS"),
+    "android": (201, "Android"),
+}
+LINUX_TYPE = (200, "Linux")
+OTHER_TYPE = (99, "Other")
+NON_LINUX_PLATFORMS = ("bsd", "sunos", "solaris", "aix", "hp-ux")
+
+
+def agent_key(agent_id):
+    """Wazuh agent ids as they appear in alerts: zero-padded to three digits"""
+    agent_id = str(agent_id)
+    return agent_id.zfill(3) if agent_id.isdigit() else agent_id
+
+
+def os_object(name=None, version=None, platform=None, build=None, kernel=None):
+    """OCSF operating system object from Wazuh agent OS fields"""
+    if not name and not platform:
+        return None
+    platform = (platform or "").lower()
+    if platform in OS_TYPES:
+        type_id, type_name = OS_TYPES[platform]
+    elif platform and not platform.startswith(NON_LINUX_PLATFORMS):
+        type_id, type_name = LINUX_TYPE
+    else:
+        type_id, type_name = OTHER_TYPE
+    os_info = {"name": name or platform, "type": type_name, "type_id": type_id}
+    if version:
+        os_info["version"] = version
+    if build:
+        os_info["build"] = build
+    if kernel:
+        os_info["kernel_release"] = kernel
+    return os_info
+
+
+def agent_record(os_info=None, groups=(), labels=None):
+    """Enrichment for one agent: device fields plus metadata labels"""
+    device = {}
+    if os_info:
+        device["os"] = os_info
+    if groups:
+        device["groups"] = [{"name": group} for group in groups]
+    return {"device": device,
+            "labels": ["%s:%s" % item for item in sorted((labels or {}).items())]}
+
+
+def _split_groups(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [group for group in value.split(",") if group]
+    return list(value)
+
+
+def load_global_db(path):
+    """Read agents from a copy of Wazuh's global.db"""
+    connection = sqlite3.connect("file:%s?mode=ro" % path, uri=True)
+    try:
+        connection.row_factory = sqlite3.Row
+        tables = {row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        labels = {}
+        if "labels" in tables:
+            for row in connection.execute("SELECT id, key, value FROM labels"):
+                labels.setdefault(row["id"], {})[row["key"]] = row["value"]
+        agents = {}
+        for row in connection.execute("SELECT * FROM agent"):
+            columns = row.keys()
+            uname = row["os_uname"] if "os_uname" in columns else None
+            agents[agent_key(row["id"])] = agent_record(
+                os_object(row["os_name"], row["os_version"], row["os_platform"],
+                          row["os_build"] if "os_build" in columns else None,
+                          uname.split("|")[2].strip() if uname and uname.count("|") >= 2
+                          else None),
+                _split_groups(row["group"] if "group" in columns else None),
+                labels.get(row["id"]))
+        return agents
+    finally:
+        connection.close()
+
+
+def load_json_dump(path):
+    """Read agents from a JSON dump of the API's GET /agents response"""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("data", data).get("affected_items", [])
+    agents = {}
+    for item in data:
+        os_info = item.get("os") or {}
+        agents[agent_key(item["id"])] = agent_record(
+            os_object(os_info.get("name"), os_info.get("version"), os_info.get("platform"),
+                      os_info.get("build"), os_info.get("release")),
+            _split_groups(item.get("group")),
+            item.get("labels"))
+    return agents
+
+
+def load_inventory(path):
+    if path.endswith(".json"):
+        return load_json_dump(path)
+    return load_global_db(path)
+
+
+class AgentInventory:
+    """Translator stage enriching device.* from a periodically reloaded inventory"""
+
+    def __init__(self, path, ttl=300.0, min_refresh_interval=10.0, loader=load_inventory):
+        self.path = path
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.loader = loader
+        self.enriched = 0
+        self.unknown = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error = None
+        self._loaded_at = monotonic()
+        self._signature = self.signature()
+        # Bulk preload; a broken inventory at startup is an error, later ones are not
+        self.agents = loader(path)
+        # Agent keys looked up and not found since the file last changed
+        self._missing = set()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def signature(self):
+        """(inode, size, mtime) of the inventory file, None if it is missing"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def refresh(self):
+        """Reload the whole inventory and swap it in; False on failure"""
+        signature = self.signature()
+        try:
+            agents = self.loader(self.path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError,
+                sqlite3.Error) as exc:
+            self.errors += 1
+            self.last_error = "%s: %s" % (type(exc).__name__, exc)
+            return False
+        finally:
+            self._loaded_at = monotonic()
+        self.agents = agents
+        if signature != self._signature:
+            self._signature = signature
+            self._missing = set()
+        self.refreshes += 1
+        return True
+
+    def __call__(self, alert, event, raw=None):
+        agent = alert.get("agent")
+        agent_id = agent.get("id") if isinstance(agent, dict) else None
+        if agent_id is None:
+            return
+        key = agent_key(agent_id)
+        record = self.agents.get(key)
+        if record is None:
+            self.unknown += 1
+            missing = self._missing
+            if key not in missing:
+                missing.add(key)
+                # Possibly a newly registered agent: ask for an early reload
+                self._wake.set()
+            return
+        device = event.get("device")
+        if device is None:
+            device = event["device"] = {}
+        # Later stages may edit the event; the inventory record must stay intact
+        device.update(copy_tree(record["device"]))
+        if record["labels"]:
+            metadata = event.setdefault("metadata", {})
+            metadata["labels"] = metadata.get("labels", []) + record["labels"]
+        self.enriched += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="agent-inventory")
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            age = monotonic() - self._loaded_at
+            self._wake.wait(max(self.ttl - age, 0))
+            if self._stopped.is_set():
+                break
+            if self._wake.is_set():
+                self._wake.clear()
+                # Early reloads for unknown agents are rate limited
+                delay = self.min_refresh_interval - (monotonic() - self._loaded_at)
+                if delay > 0 and self._stopped.wait(delay):
+                    break
+                if self.signature() == self._signature:
+                    # Nothing new to find; the ttl reload still runs on schedule
+                    continue
+            self.refresh()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def render(self):
+        return ["# HELP ocsf_agent_inventory_agents Agents in the loaded inventory\n",
+                "# TYPE ocsf_agent_inventory_agents gauge\n",
+                format_sample("ocsf_agent_inventory_agents", len(self.agents)),
+                "# HELP ocsf_agent_inventory_enriched_total Events enriched from the inventory\n",
+                "# TYPE ocsf_agent_inventory_enriched_total counter\n",
+                format_sample("ocsf_agent_inventory_enriched_total", self.enriched),
+                "# HELP ocsf_agent_inventory_unknown_total Events from agents not in the inventory\n",
+                "# TYPE ocsf_agent_inventory_unknown_total counter\n",
+                format_sample("ocsf_agent_inventory_unknown_total", self.unknown),
+                "# HELP ocsf_agent_inventory_refreshes_total Inventory reloads\n",
+                "# TYPE ocsf_agent_inventory_refreshes_total counter\n",
+                format_sample("ocsf_agent_inventory_refreshes_total", self.refreshes),
+                "# HELP ocsf_agent_inventory_errors_total Inventory reloads that failed\n",
+                "# TYPE ocsf_agent_inventory_errors_total counter\n",
+                format_sample("ocsf_agent_inventory_errors_total", self.errors)]
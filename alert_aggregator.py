@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Windowed dedup/aggregation stage for translated OCSF findings
+
+Repeated alerts with the same key (rule.id, agent.id, source/destination IP,
+user, file path) that arrive within the window are merged into one finding
+whose count and first/last seen times cover all of them, so floods such as
+rule 5710 sshd brute force produce one document per window instead of one
+per attempt. State is bounded: the oldest open aggregate is emitted early
+when the table is full, and aggregates are emitted once their window ages out.
+
+Callers that acknowledge their source pass a position with each event
+(a batch number, never decreasing); oldest() returns the position of the
+earliest event still held, so acknowledgements can stop short of it.
+"""
+import time
+from collections import OrderedDict
+
+from ocsf_translator import get_path
+
+DEFAULT_KEY_FIELDS = (
+    "rule.id", "agent.id", "data.srcip", "data.dstip",
+    "data.srcuser", "data.dstuser", "syscheck.path",
+)
+
+
+class AlertAggregator:
+    """Merge duplicate findings per key within a time window"""
+
+    def __init__(self, window_seconds=60, max_entries=100000,
+                 key_fields=DEFAULT_KEY_FIELDS, rule_ids=None, clock=time.monotonic):
+        self.window_ms = int(window_seconds * 1000)
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.key_paths = tuple(tuple(field.split(".")) for field in key_fields)
+        self.rule_ids = set(rule_ids) if rule_ids else None
+        self.clock = clock
+        self.merged = 0
+        self.evicted = 0
+        # key -> [opened_at, event, position]; insertion order is window open order
+        self._table = OrderedDict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def key_for(self, alert):
+        return tuple(get_path(alert, path) for path in self.key_paths)
+
+    def oldest(self):
+        """Position of the earliest event still held, or None when nothing is"""
+        for entry in self._table.values():
+            # Merges keep the opening position, and later opens come later
+            return entry[2]
+        return None
+
+    def add(self, alert, event, position=None):
+        """Add one translated event; return the events ready to be emitted"""
+        if self.rule_ids is not None and get_path(alert, ("rule", "id")) not in self.rule_ids:
+            return [event]
+
+        now = self.clock()
+        ready = self.expire(now)
+        key = self.key_for(alert)
+        entry = self._table.get(key)
+        if entry is not None:
+            if self._merge(entry[1], event):
+                self.merged += 1
+                return ready
+            # Outside the window: close the old aggregate, open a new one
+            del self._table[key]
+            ready.append(self._finish(entry[1]))
+
+        self._table[key] = [now, event, position]
+        if len(self._table) > self.max_entries:
+            _, (_, oldest, _) = self._table.popitem(last=False)
+            self.evicted += 1
+            ready.append(self._finish(oldest))
+        return ready
+
+    def _merge(self, aggregate, event):
+        finding = aggregate["finding"]
+        event_time = event.get("time")
+        if event_time is None or abs(event_time - finding["first_seen_time"]) > self.window_ms:
+            return False
+        aggregate["count"] += event.get("count", 1)
+        if event_time < finding["first_seen_time"]:
+            finding["first_seen_time"] = event_time
+        if event_time > finding["last_seen_time"]:
+            finding["last_seen_time"] = event_time
+            finding["modified_time"] = event_time
+        return True
+
+    def _finish(self, event):
+        if event["count"] > 1:
+            finding = event["finding"]
+            event["start_time"] = finding["first_seen_time"]
+            event["end_time"] = finding["last_seen_time"]
+        return event
+
+    def expire(self, now=None):
+        """Emit aggregates whose window has elapsed"""
+        if now is None:
+            now = self.clock()
+        ready = []
+        table = self._table
+        while table:
+            key = next(iter(table))
+            opened_at, event, _ = table[key]
+            if now - opened_at < self.window_seconds:
+                break
+            del table[key]
+            ready.append(self._finish(event))
+        return ready
+
+    def drain(self):
+        """Emit every open aggregate, e.g. on shutdown"""
+        ready = [self._finish(event) for _, event, _ in self._table.values()]
+        self._table.clear()
+        return ready
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Acknowledgement-driven checkpointing for the Wazuh alerts.json tailer
+
+Unlike Logstash's sincedb, the recorded byte offset only advances once the
+bulk sink has acknowledged every event up to it. Acknowledgements are folded
+into a contiguous frontier and written in group commits (at most once per
+commit interval) with write-to-temp and atomic rename.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from wal_queue import write_atomic
+
+DEFAULT_ALERTS_PATH = "/var/ossec/logs/alerts/alerts.json"
+
+UNCHANGED = "unchanged"
+ROTATED = "rotated"
+TRUNCATED = "truncated"
+MISSING = "missing"
+
+Position = namedtuple("Position", ["inode", "offset"])
+
+
+def check_source(path, position):
+    """Compare the file at path with a checkpointed position"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return MISSING
+    if st.st_ino != position.inode:
+        return ROTATED
+    if st.st_size < position.offset:
+        return TRUNCATED
+    return UNCHANGED
+
+
+class CheckpointManager:
+    """Track in-flight batches and persist the acknowledged offset"""
+
+    def __init__(self, checkpoint_path, source_path=DEFAULT_ALERTS_PATH,
+                 commit_interval_ms=200):
+        self.checkpoint_path = checkpoint_path
+        self.source_path = source_path
+        self.commit_interval = commit_interval_ms / 1000.0
+        self.committed = None
+        self.rotated_from = None
+
+        self._lock = threading.Lock()
+        # Serializes writers: the background committer and maybe_commit() callers
+        self._commit_lock = threading.Lock()
+        self._pending = deque()
+        self._entries = {}
+        self._next_token = 0
+        self._acked = None
+        self._last_commit = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Return the last persisted position, or None"""
+        try:
+            with open(self.checkpoint_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return Position(data["inode"], data["offset"])
+
+    def resume(self, start_at_end=False):
+        """Return the position the tailer should start reading from
+
+        A changed inode means alerts.json was rotated since the checkpoint;
+        the old inode is kept in rotated_from so the tailer can drain the
+        rotated file before continuing with the new one. A file smaller than
+        the checkpoint was truncated and is read again from the start.
+        """
+        saved = self.load()
+        try:
+            st = os.stat(self.source_path)
+        except FileNotFoundError:
+            return saved
+
+        if saved is None:
+            position = Position(st.st_ino, st.st_size if start_at_end else 0)
+        else:
+            state = check_source(self.source_path, saved)
+            if state == ROTATED:
+                self.rotated_from = saved
+                position = Position(st.st_ino, 0)
+            elif state == TRUNCATED:
+                position = Position(st.st_ino, 0)
+            else:
+                position = saved
+
+        self.committed = position
+        self._acked = position
+        return position
+
+    def track(self, inode, end_offset):
+        """Register a batch read up to end_offset and return its token"""
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            entry = [Position(inode, end_offset), False]
+            self._entries[token] = entry
+            self._pending.append(token)
+        return token
+
+    def ack(self, token):
+        """Mark a batch as acknowledged by the sink"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return
+            entry[1] = True
+            while self._pending and self._entries[self._pending[0]][1]:
+                self._acked = self._entries.pop(self._pending.popleft())[0]
+
+    def pending(self):
+        """Number of batches awaiting acknowledgement"""
+        with self._lock:
+            return len(self._pending)
+
+    def maybe_commit(self):
+        """Commit if the commit interval has elapsed since the last write"""
+        if time.monotonic() - self._last_commit >= self.commit_interval:
+            return self.commit()
+        return False
+
+    def commit(self):
+        """Persist the acknowledged frontier if it moved"""
+        with self._commit_lock:
+            with self._lock:
+                position = self._acked
+                self._last_commit = time.monotonic()
+            if position is None or position == self.committed:
+                return False
+            data = {
+                "path": self.source_path,
+                "inode": position.inode,
+                "offset": position.offset,
+                "updated": time.time(),
+            }
+            write_atomic(self.checkpoint_path, json.dumps(data).encode())
+            self.committed = position
+            return True
+
+    def start(self):
+        """Commit on a background timer every commit interval"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="alert-checkpoint")
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.commit_interval):
+            self.commit()
+
+    def close(self):
+        """Stop the background committer and write the final frontier"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.commit()
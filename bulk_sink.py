@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+OpenSearch _bulk sink for encoded OCSF events
+
+Python counterpart of the opensearch output in wazuh-ocsf-pipeline.conf:
+writes to the daily ocsf-security-events-YYYY.MM.dd index over a persistent
+HTTP(S) connection. Events arrive already serialized, so each bulk body is
+built by joining the shared bytes with a cached action line. Items rejected
+with 429 or a 5xx status are raised back as a SinkError carrying only those
+events so the SinkWorker retries them; mapping errors are counted and not
+retried. A whole request refused with 413 is split in half and resent; any
+other non-retryable status (400, 401, 403, ...) counts the batch as
+rejected rather than retrying it forever.
+
+With a rollover alias, daily indices are replaced by numbered backing
+indices (<alias>-000001, ...) behind a write alias. The sink resolves the
+alias's write index once, tracks the _source bytes and documents it has
+written there, and rolls over client-side when either limit is reached.
+Documents already in the write index when the sink attaches are counted
+from _stats and sized at the average _source size of the first batch, so
+both limits stay in _source units. To roll over, the sink creates the
+next index and moves the write alias to it in one _aliases call. Limits
+are checked between batches, so an index overshoots by at most one batch;
+other writers to the same alias are not counted, so run one rolling
+writer per alias or size the limits for it.
+"""
+import base64
+import http.client
+import json
+import os
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from metrics_exporter import format_sample
+from sink_fanout import SinkError
+
+DEFAULT_INDEX_PREFIX = "ocsf-security-events-"
+DEFAULT_ROLLOVER_BYTES = 40 * 1024 ** 3
+RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+def daily_index(prefix=DEFAULT_INDEX_PREFIX, now=None):
+    return prefix + time.strftime("%Y.%m.%d", time.gmtime(now))
+
+
+def next_index(index):
+    """<alias>-000002 after <alias>-000001"""
+    base, _, number = index.rpartition("-")
+    if not number.isdigit():
+        return index + "-000001"
+    return "%s-%0*d" % (base, len(number), int(number) + 1)
+
+
+class OpenSearchBulkSink:
+    """POST batches of encoded events to /_bulk"""
+
+    def __init__(self, url, user=None, password=None, index_prefix=DEFAULT_INDEX_PREFIX,
+                 verify=True, ca_file=None, timeout=30.0, rollover_alias=None,
+                 max_index_bytes=DEFAULT_ROLLOVER_BYTES, max_index_docs=None):
+        parts = urlsplit(url if "://" in url else "https://" + url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 9200)
+        self.scheme = parts.scheme
+        self.base_path = parts.path.rstrip("/")
+        self.path = self.base_path + "/_bulk"
+        self.index_prefix = index_prefix
+        self.rollover_alias = rollover_alias
+        self.max_index_bytes = max_index_bytes
+        self.max_index_docs = max_index_docs
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/x-ndjson"}
+        if user is not None:
+            token = base64.b64encode(("%s:%s" % (user, password or "")).encode()).decode()
+            self.headers["Authorization"] = "Basic " + token
+        self._ssl_context = None
+        if self.scheme == "https":
+            self._ssl_context = ssl.create_default_context(cafile=ca_file)
+            if not verify:
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+        self.rejected = 0
+        self.rollovers = 0
+        # Written to the current target index by this sink
+        self.index_bytes = 0
+        self.index_docs = 0
+        # Documents in the target index before this sink, not yet in index_bytes
+        self._unsized_docs = 0
+        self._connection = None
+        self._index = None
+        self._action = None
+
+    def _connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def action_line(self):
+        """Bulk action line for this batch's target index, rebuilt when it changes"""
+        if self.rollover_alias is not None:
+            index = self._index or self.resolve_write_index()
+        else:
+            index = daily_index(self.index_prefix)
+        if index != self._index:
+            self._set_target(index)
+        return self._action
+
+    def _set_target(self, index, index_docs=0):
+        self._index = index
+        self._action = json.dumps({"index": {"_index": index}},
+                                  separators=(",", ":")).encode() + b"\n"
+        self.index_bytes = 0
+        self.index_docs = index_docs
+        self._unsized_docs = index_docs
+
+    def _written(self, docs, source_bytes):
+        if self._unsized_docs and docs:
+            source_bytes += self._unsized_docs * source_bytes // docs
+            self._unsized_docs = 0
+        self.index_docs += docs
+        self.index_bytes += source_bytes
+
+    def body(self, events):
+        action = self.action_line()
+        return b"".join([part for event in events for part in (action, event, b"\n")])
+
+    def request(self, method, path, body=None, headers=None):
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            self._connection.request(method, self.base_path + path, body=body,
+                                     headers=headers or self.headers)
+            response = self._connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            self.close()
+            raise SinkError("%s %s failed: %s" % (method, path, exc))
+        return response.status, data
+
+    def request_json(self, method, path, document=None):
+        headers = dict(self.headers, **{"Content-Type": "application/json"})
+        body = json.dumps(document).encode() if document is not None else None
+        status, data = self.request(method, path, body, headers)
+        if status in RETRYABLE_STATUS:
+            raise SinkError("%s %s returned HTTP %d" % (method, path, status))
+        return status, json.loads(data) if data else {}
+
+    def post(self, body):
+        return self.request("POST", "/_bulk", body)
+
+    def resolve_write_index(self):
+        """Find (or bootstrap) the alias's write index and how full it already is"""
+        alias = self.rollover_alias
+        status, aliases = self.request_json("GET", "/_alias/" + alias)
+        if status == 404:
+            index = "%s-000001" % alias
+            status, result = self.request_json(
+                "PUT", "/" + index, {"aliases": {alias: {"is_write_index": True}}})
+            if status >= 300 and "already_exists" not in json.dumps(result):
+                raise SinkError("creating %s returned HTTP %d" % (index, status))
+            return self.resolve_write_index() if status >= 300 else index
+        if status >= 300:
+            raise SinkError("GET /_alias/%s returned HTTP %d" % (alias, status))
+        indices = sorted(aliases)
+        writers = [index for index in indices
+                   if aliases[index].get("aliases", {}).get(alias, {}).get("is_write_index")]
+        index = writers[0] if writers else indices[-1]
+        index_docs = 0
+        status, stats = self.request_json("GET", "/%s/_stats/docs" % index)
+        if status < 300:
+            primaries = stats.get("_all", {}).get("primaries", {})
+            index_docs = primaries.get("docs", {}).get("count", 0)
+        self._set_target(index, index_docs)
+        return index
+
+    def needs_rollover(self):
+        if self.rollover_alias is None or self._index is None:
+            return False
+        return ((self.max_index_bytes and self.index_bytes >= self.max_index_bytes) or
+                (self.max_index_docs and self.index_docs >= self.max_index_docs))
+
+    def rollover(self):
+        """Create the next backing index and move the write alias to it"""
+        alias, old = self.rollover_alias, self._index
+        new = next_index(old)
+        status, result = self.request_json("PUT", "/" + new)
+        if status >= 300:
+            if "already_exists" in json.dumps(result):
+                # Another writer rolled over first: follow the alias
+                self._index = None
+                self.resolve_write_index()
+                return
+            raise SinkError("creating %s returned HTTP %d" % (new, status))
+        status, _ = self.request_json("POST", "/_aliases", {"actions": [
+            {"add": {"index": old, "alias": alias, "is_write_index": False}},
+            {"add": {"index": new, "alias": alias, "is_write_index": True}},
+        ]})
+        if status >= 300:
+            raise SinkError("moving alias %s to %s returned HTTP %d" % (alias, new, status))
+        self._set_target(new)
+        self.rollovers += 1
+
+    def __call__(self, events):
+        if self.needs_rollover():
+            self.rollover()
+        status, data = self.post(self.body(events))
+        if status in RETRYABLE_STATUS:
+            raise SinkError("bulk request returned HTTP %d" % status, events)
+        if status == 413 and len(events) > 1:
+            self._send_halves(events)
+            return
+        if status >= 300:
+            self.rejected += len(events)
+            return
+        result = json.loads(data)
+        if not result.get("errors"):
+            self._written(len(events), sum(map(len, events)))
+            return
+        retry = []
+        docs = source_bytes = 0
+        for event, item in zip(events, result.get("items", ())):
+            item_status = next(iter(item.values())).get("status", 200)
+            if item_status in RETRYABLE_STATUS:
+                retry.append(event)
+            elif item_status >= 300:
+                self.rejected += 1
+            else:
+                docs += 1
+                source_bytes += len(event)
+        self._written(docs, source_bytes)
+        if retry:
+            raise SinkError("%d bulk items need retrying" % len(retry), retry)
+
+    def _send_halves(self, events):
+        """Send a batch the cluster found too large as two requests"""
+        half = len(events) // 2
+        for start, part in ((0, events[:half]), (half, events[half:])):
+            try:
+                self(part)
+            except SinkError as exc:
+                # Retry what this half has left plus everything after it
+                remaining = exc.remaining if exc.remaining is not None else part
+                raise SinkError(str(exc), remaining + events[start + len(part):])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def render(self):
+        labels = {"index": self._index or ""}
+        return ["# HELP ocsf_bulk_rejected_total Bulk items rejected and not retried\n",
+                "# TYPE ocsf_bulk_rejected_total counter\n",
+                format_sample("ocsf_bulk_rejected_total", self.rejected),
+                "# HELP ocsf_bulk_rollovers_total Write alias rollovers done by this sink\n",
+                "# TYPE ocsf_bulk_rollovers_total counter\n",
+                format_sample("ocsf_bulk_rollovers_total", self.rollovers),
+                "# HELP ocsf_bulk_index_bytes Source bytes written to the current index\n",
+                "# TYPE ocsf_bulk_index_bytes gauge\n",
+                format_sample("ocsf_bulk_index_bytes", self.index_bytes, labels),
+                "# HELP ocsf_bulk_index_docs Documents written to the current index\n",
+                "# TYPE ocsf_bulk_index_docs gauge\n",
+                format_sample("ocsf_bulk_index_docs", self.index_docs, labels)]
+
+
+def _number(value, cast):
+    return cast(value) if value not in (None, "") else None
+
+
+def from_environment(url=None, rollover_alias=None, max_index_bytes=None, max_index_docs=None,
+                     index_prefix=DEFAULT_INDEX_PREFIX, rollover_environment=True):
+    """Build a sink from the OUTPUT_OPENSEARCH_* variables the Logstash config uses
+
+    With rollover_environment=False the OUTPUT_OPENSEARCH_ROLLOVER_* variables
+    are ignored, so only the arguments decide rollover (for sinks writing
+    somewhere other than the alert index).
+    """
+    environ = os.environ
+    rollover = environ if rollover_environment else {}
+    return OpenSearchBulkSink(
+        url or environ.get("OUTPUT_OPENSEARCH_HOST", "localhost:9200"),
+        user=environ.get("OUTPUT_OPENSEARCH_USER", "admin"),
+        password=environ.get("OUTPUT_OPENSEARCH_PASSWORD", "admin"),
+        index_prefix=index_prefix,
+        verify=False,
+        ca_file=environ.get("OUTPUT_OPENSEARCH_CA_FILE"),
+        rollover_alias=rollover_alias or rollover.get("OUTPUT_OPENSEARCH_ROLLOVER_ALIAS") or None,
+        max_index_bytes=(max_index_bytes
+                         or _number(rollover.get("OUTPUT_OPENSEARCH_ROLLOVER_MAX_BYTES"), int)
+                         or DEFAULT_ROLLOVER_BYTES),
+        max_index_docs=(max_index_docs
+                        or _number(rollover.get("OUTPUT_OPENSEARCH_ROLLOVER_MAX_DOCS"), int)),
+    )
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Fallback field extraction from full_log for alerts without decoder fields
+
+Alerts whose decoder produced no data.* fields reach the translator with
+only full_log, and the OCSF record ends up with little more than raw_data.
+This stage recovers the user, source IP, source port and command from the
+log line with a library of per-program patterns (sshd, sudo, su, kernel
+netfilter, auditd, nginx).
+
+The patterns for each program are compiled into one combined regex whose
+alternatives are named groups; the alternative that matched is read back
+from match.lastgroup. Lines are dispatched on the program name (Wazuh's
+predecoder.program_name, else the syslog header) or, for headerless logs,
+on a line prefix, so each line costs one regex match instead of a search
+per pattern. benchmark() compares this with sequential re.search over the
+whole library. Extracted addresses are only written to src_endpoint.ip
+when ipaddress accepts them: the field is mapped as ip, and one bad value
+would get the whole document rejected by the index.
+"""
+import ipaddress
+import re
+import sys
+from collections import Counter
+from time import perf_counter
+
+from metrics_exporter import format_sample
+from ocsf_translator import get_path, set_path
+
+IP = r"[0-9A-Fa-f:.]+"
+
+# Extracted field name -> OCSF target
+TARGETS = {
+    "user": ("actor", "user", "name"),
+    "ip": ("src_endpoint", "ip"),
+    "port": ("src_endpoint", "port"),
+    "command": ("process", "cmd_line"),
+}
+INTEGER_FIELDS = ("port",)
+# Placeholder values logs use for "no such field"
+EMPTY_VALUES = ("-", "", "?", "(unknown)", "unknown")
+
+# program -> ((pattern name, regex), ...); regexes use the field names above
+PATTERNS = {
+    "sshd": (
+        ("sshd_failed", r"Failed (?:password|publickey|none) for (?:invalid user )?(?P<user>\S+)"
+                        r" from (?P<ip>" + IP + r") port (?P<port>\d+)"),
+        ("sshd_accepted", r"Accepted \S+ for (?P<user>\S+) from (?P<ip>" + IP +
+                          r") port (?P<port>\d+)"),
+        ("sshd_invalid_user", r"Invalid user (?P<user>\S*) from (?P<ip>" + IP +
+                              r")(?: port (?P<port>\d+))?"),
+        ("sshd_disconnect", r"(?:Disconnected from|Connection closed by|Received disconnect "
+                            r"from)(?: (?:invalid|authenticating) user (?P<user>\S+))? "
+                            r"(?P<ip>" + IP + r") port (?P<port>\d+)"),
+    ),
+    "sudo": (
+        ("sudo_command", r"\s*(?P<user>\S+) : (?:.*? ; )?TTY=\S+ ; PWD=\S+ ; USER=\S+ ; "
+                         r"COMMAND=(?P<command>.+)"),
+        ("sudo_failure", r"pam_unix\(sudo:auth\): authentication failure;.*? ruser=(?P<user>\S*)"
+                         r".*?rhost=(?P<ip>" + IP + r")?"),
+    ),
+    "su": (
+        ("su_failed", r"(?:FAILED su|FAILED SU \(to \S+\)) (?:for \S+ by )?(?P<user>\S+)"),
+        ("su_session", r"pam_unix\(su(?:-l)?:session\): session opened for user \S+"
+                       r"(?:\(uid=\d+\))? by (?P<user>[^\s(]+)"),
+        ("su_success", r"(?:Successful su for \S+ by |\(to \S+\) )(?P<user>\S+)"),
+    ),
+    "kernel": (
+        ("netfilter", r".*? SRC=(?P<ip>" + IP + r") DST=\S+ .*?SPT=(?P<port>\d+)"),
+    ),
+    "auditd": (
+        ("audit_execve", r"type=EXECVE msg=audit\([^)]*\): argc=\d+ (?P<command>.+)"),
+        ("audit_user", r"type=USER_\w+ msg=audit\([^)]*\):.*? acct=\"?(?P<user>[^\"\s]+)\"?"
+                       r".*? addr=(?P<ip>" + IP + r")?"),
+    ),
+    "nginx": (
+        ("nginx_error", r"\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[\w+\] .*?client: (?P<ip>" + IP + r")"),
+        ("nginx_access", r"(?P<ip>" + IP + r") - (?P<user>\S+) \[[^\]]+\] \""),
+    ),
+}
+PROGRAM_ALIASES = {"sshd-session": "sshd", "su-l": "su", "audispd": "auditd",
+                   "audit": "auditd", "nginx-access": "nginx", "nginx-error": "nginx"}
+
+SYSLOG_HEADER = re.compile(
+    r"(?:[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d|\d{4}-\d\d-\d\dT\S+) \S+ "
+    r"(?P<program>[^\s\[:]+)(?:\[\d+\])?: ")
+
+
+def compile_program(program, patterns):
+    """One regex of named alternatives plus, per alternative, its field groups"""
+    alternatives = []
+    fields = {}
+    for name, pattern in patterns:
+        # Field groups are renamed per alternative; names must be unique
+        groups = []
+
+        def rename(match, name=name, groups=groups):
+            groups.append(match.group(1))
+            return "(?P<%s__%s>" % (name, match.group(1))
+        alternatives.append("(?P<%s>%s)" % (name, re.sub(r"\(\?P<(\w+)>", rename, pattern)))
+        fields[name] = tuple(("%s__%s" % (name, field), field) for field in groups)
+    return re.compile("|".join(alternatives)), fields
+
+
+def is_address(value):
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+class FallbackParser:
+    """Translator stage filling OCSF fields from full_log when data.* is empty"""
+
+    def __init__(self, patterns=PATTERNS):
+        self.programs = {program: compile_program(program, program_patterns)
+                         for program, program_patterns in patterns.items()}
+        self.parsed = Counter()
+        self.unparsed = 0
+
+    def dispatch(self, alert, line):
+        """Return (program, offset of the message) for a log line"""
+        header = SYSLOG_HEADER.match(line)
+        program = get_path(alert, ("predecoder", "program_name"))
+        if program is None and header is not None:
+            program = header.group("program")
+        offset = header.end() if header is not None else 0
+        if program is None:
+            if line.startswith("type="):
+                program = "auditd"
+            elif line[:1].isdigit():
+                program = "nginx"
+        return PROGRAM_ALIASES.get(program, program), offset
+
+    def parse(self, line, program, offset=0):
+        """Return (pattern name, {field: value}) or None"""
+        compiled = self.programs.get(program)
+        if compiled is None:
+            return None
+        regex, fields = compiled
+        match = regex.match(line, offset)
+        if match is None:
+            return None
+        name = match.lastgroup
+        values = {}
+        for group, field in fields[name]:
+            value = match.group(group)
+            if value not in EMPTY_VALUES and value is not None:
+                values[field] = value
+        return name, values
+
+    def __call__(self, alert, event, raw=None):
+        if alert.get("data"):
+            return
+        line = alert.get("full_log")
+        if not line:
+            return
+        program, offset = self.dispatch(alert, line)
+        result = self.parse(line, program, offset)
+        if result is None:
+            self.unparsed += 1
+            return
+        name, values = result
+        self.parsed[name] += 1
+        for field, value in values.items():
+            target = TARGETS[field]
+            if get_path(event, target) is None:
+                if field in INTEGER_FIELDS:
+                    value = int(value)
+                elif field == "ip" and not is_address(value):
+                    # IP also matches hex-only host names such as "cafe"
+                    continue
+                set_path(event, target, value)
+
+    def render(self):
+        lines = ["# HELP ocsf_fallback_parsed_total full_log lines parsed by fallback patterns\n",
+                 "# TYPE ocsf_fallback_parsed_total counter\n"]
+        for name, count in sorted(self.parsed.items()):
+            lines.append(format_sample("ocsf_fallback_parsed_total", count, {"pattern": name}))
+        lines += ["# HELP ocsf_fallback_unparsed_total full_log lines no pattern matched\n",
+                  "# TYPE ocsf_fallback_unparsed_total counter\n",
+                  format_sample("ocsf_fallback_unparsed_total", self.unparsed)]
+        return lines
+
+
+def sequential_parse(regexes, line):
+    """Baseline: re.search with every pattern until one matches"""
+    for name, regex in regexes:
+        match = regex.search(line)
+        if match is not None:
+            return name, {field: value for field, value in match.groupdict().items()
+                          if value not in EMPTY_VALUES and value is not None}
+    return None
+
+
+SAMPLE_LINES = (
+    "Jul  7 10:00:01 host sshd[4021]: Failed password for invalid user admin "
+    "from 203.0.113.9 port 50122 ssh2",
+    "Jul  7 10:00:02 host sshd[4022]: Accepted publickey for deploy from 10.0.0.7 port 40022 ssh2",
+    "Jul  7 10:00:03 host sudo:   deploy : TTY=pts/0 ; PWD=/home/deploy ; USER=root ; "
+    "COMMAND=/usr/bin/systemctl restart nginx",
+    "Jul  7 10:00:04 host su[881]: FAILED SU (to root) alice on pts/1",
+    "Jul  7 10:00:05 fw kernel: DROP IN=eth0 OUT= SRC=198.51.100.4 DST=10.0.0.1 LEN=60 "
+    "PROTO=TCP SPT=41234 DPT=22",
+    'type=EXECVE msg=audit(1720346405.123:991): argc=3 a0="curl" a1="-s" a2="http://x.test/a"',
+    '192.0.2.44 - - [07/Jul/2024:10:00:06 +0000] "GET /wp-login.php HTTP/1.1" 404 153',
+    "Jul  7 10:00:07 host cron[77]: (root) CMD (run-parts /etc/cron.hourly)",
+)
+
+
+def benchmark(lines=SAMPLE_LINES, repeat=20000):
+    """Seconds per line for dispatched combined regexes vs sequential re.search"""
+    parser = FallbackParser()
+    regexes = [(name, re.compile(pattern))
+               for patterns in PATTERNS.values() for name, pattern in patterns]
+    alert = {}
+
+    def dispatched():
+        for line in lines:
+            parser.parse(line, *parser.dispatch(alert, line))
+
+    def sequential():
+        for line in lines:
+            sequential_parse(regexes, line)
+
+    results = {}
+    for name, run in (("dispatched", dispatched), ("sequential", sequential)):
+        best = None
+        for _ in range(3):
+            start = perf_counter()
+            for _ in range(repeat // len(lines)):
+                run()
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best / (repeat // len(lines) * len(lines))
+    return results
+
+
+def main():
+    results = benchmark()
+    for name, seconds in results.items():
+        print("%-10s %7.2f us/line" % (name, seconds * 1e6))
+    print("speedup    %7.1fx" % (results["sequential"] / results["dispatched"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
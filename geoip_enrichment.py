@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+GeoIP/ASN enrichment of src_endpoint and dst_endpoint from a local database
+
+A CSV of IPv4 ranges is compiled once into a flat binary file of sorted
+interval arrays (range starts, range ends, record ids), a /16 prefix index
+into them, and the OCSF location/autonomous_system objects as JSON. The
+file is mmap'd read-only, so every worker process shares the same
+page-cache pages and keeps no copy of its own. A lookup bisects the starts
+array, viewed through memoryview.cast('I'), within the slice the prefix
+index gives for the address's /16, behind an LRU of hot addresses; records
+are decoded from the blob only on a cache miss.
+
+CSV columns (header required; either network or start_ip/end_ip):
+    network,country_iso_code,country_name,region,city,latitude,longitude,asn,as_org
+
+    python geoip_enrichment.py build geo.csv /var/lib/ocsf/geoip.db
+    python geoip_enrichment.py lookup /var/lib/ocsf/geoip.db 203.0.113.7
+"""
+import csv
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from socket import AF_INET, inet_pton
+
+from metrics_exporter import format_sample
+from ocsf_translator import copy_tree
+from sharded_cache import lru_cache
+
+MAGIC = b"OCSFGEO1"
+# magic, byte order mark, range count, record count
+HEADER = struct.Struct("<8sIII")
+BYTE_ORDER_MARK = 0x01020304
+PREFIX_SHIFT = 16
+PREFIXES = 1 << (32 - PREFIX_SHIFT)
+ENDPOINTS = ("src_endpoint", "dst_endpoint")
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def ocsf_record(row):
+    """OCSF location/autonomous_system objects for one CSV row"""
+    record = {}
+    location = {}
+    for key, column in (("country", "country_iso_code"), ("region", "region"),
+                        ("city", "city")):
+        if row.get(column):
+            location[key] = row[column]
+    latitude, longitude = _float(row.get("latitude")), _float(row.get("longitude"))
+    if latitude is not None and longitude is not None:
+        # OCSF coordinates are [longitude, latitude]
+        location["coordinates"] = [longitude, latitude]
+    if location:
+        record["location"] = location
+    asn = (row.get("asn") or "").upper().lstrip("AS")
+    if asn.isdigit():
+        autonomous_system = {"number": int(asn)}
+        if row.get("as_org"):
+            autonomous_system["name"] = row["as_org"]
+        record["autonomous_system"] = autonomous_system
+    return record
+
+
+def read_ranges(path):
+    """Yield (start, end, record) from a range CSV"""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("network"):
+                network = ipaddress.ip_network(row["network"].strip(), strict=False)
+                if network.version != 4:
+                    continue
+                start, end = int(network.network_address), int(network.broadcast_address)
+            else:
+                start = ipaddress.ip_address(row["start_ip"].strip())
+                end = ipaddress.ip_address(row["end_ip"].strip())
+                if start.version != 4:
+                    continue
+                start, end = int(start), int(end)
+            record = ocsf_record(row)
+            if record:
+                yield start, end, record
+
+
+def build_database(ranges, output_path):
+    """Write sorted, non-overlapping ranges to the binary database format"""
+    ranges = sorted(ranges, key=lambda item: item[0])
+    starts, ends, record_ids = array("I"), array("I"), array("I")
+    record_index = {}
+    blobs = []
+    previous_end = -1
+    for start, end, record in ranges:
+        if end < start:
+            raise ValueError("range %d-%d ends before it starts" % (start, end))
+        if start <= previous_end:
+            raise ValueError("range starting at %s overlaps the previous range"
+                             % ipaddress.IPv4Address(start))
+        previous_end = end
+        blob = json.dumps(record, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        record_id = record_index.get(blob)
+        if record_id is None:
+            record_id = record_index[blob] = len(blobs)
+            blobs.append(blob)
+        starts.append(start)
+        ends.append(end)
+        record_ids.append(record_id)
+    # prefixes[p] is the first range starting at or after p << PREFIX_SHIFT
+    prefixes = array("I")
+    index = 0
+    for prefix in range(PREFIXES + 1):
+        while index < len(starts) and starts[index] >> PREFIX_SHIFT < prefix:
+            index += 1
+        prefixes.append(index)
+    offsets = array("I", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, len(starts), len(blobs)))
+        for table in (starts, ends, record_ids, prefixes, offsets):
+            table.tofile(f)
+        f.write(b"".join(blobs))
+    os.replace(tmp_path, output_path)
+    return len(starts)
+
+
+class GeoIpDatabase:
+    """Read-only, mmap'd interval array over IPv4 ranges"""
+
+    def __init__(self, path, cache_size=65536):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bom, count, record_count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("%s is not a GeoIP database" % path)
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError("%s was built on a machine with another byte order" % path)
+        view = memoryview(self._mmap)
+        self._blob_start = HEADER.size + 4 * (3 * count + PREFIXES + 1 + record_count + 1)
+        tables = view[HEADER.size:self._blob_start].cast("I")
+        self._view = view
+        self._tables = tables
+        self.starts = tables[:count]
+        self.ends = tables[count:2 * count]
+        self.record_ids = tables[2 * count:3 * count]
+        self.prefixes = tables[3 * count:3 * count + PREFIXES + 1]
+        self.offsets = tables[3 * count + PREFIXES + 1:]
+        self.size = count
+        self.lookup = lru_cache(cache_size)(self._lookup)
+        self._record = lru_cache(min(record_count, cache_size) or 1)(self._decode_record)
+
+    def _decode_record(self, record_id):
+        base = self._blob_start
+        start, end = self.offsets[record_id], self.offsets[record_id + 1]
+        return json.loads(bytes(self._view[base + start:base + end]))
+
+    def _lookup(self, ip):
+        """OCSF enrichment for an IPv4 string, or None"""
+        try:
+            address = int.from_bytes(inet_pton(AF_INET, ip), "big")
+        except (OSError, TypeError):
+            return None
+        prefix = address >> PREFIX_SHIFT
+        prefixes = self.prefixes
+        index = bisect_right(self.starts, address, prefixes[prefix], prefixes[prefix + 1]) - 1
+        if index < 0 or self.ends[index] < address:
+            return None
+        return self._record(self.record_ids[index])
+
+    def close(self):
+        self.lookup.cache_clear()
+        self._record.cache_clear()
+        for table in (self.starts, self.ends, self.record_ids, self.prefixes, self.offsets,
+                      self._tables):
+            table.release()
+        self._view.release()
+        self._mmap.close()
+
+
+class GeoIpEnricher:
+    """Translator stage filling location/autonomous_system on endpoints"""
+
+    def __init__(self, database):
+        self.database = database
+        self.enriched = 0
+
+    @classmethod
+    def load(cls, path, cache_size=65536):
+        return cls(GeoIpDatabase(path, cache_size))
+
+    def __call__(self, alert, event, raw=None):
+        lookup = self.database.lookup
+        for name in ENDPOINTS:
+            endpoint = event.get(name)
+            if endpoint is None:
+                continue
+            ip = endpoint.get("ip")
+            if ip is None:
+                continue
+            record = lookup(ip)
+            if record is not None:
+                # The record is cached for every event from this address
+                endpoint.update(copy_tree(record))
+                self.enriched += 1
+
+    def render(self):
+        info = self.database.lookup.cache_info()
+        return ["# HELP ocsf_geoip_endpoints_enriched_total Endpoints given location or AS data\n",
+                "# TYPE ocsf_geoip_endpoints_enriched_total counter\n",
+                format_sample("ocsf_geoip_endpoints_enriched_total", self.enriched),
+                "# HELP ocsf_geoip_cache_hits_total GeoIP lookups served from the LRU\n",
+                "# TYPE ocsf_geoip_cache_hits_total counter\n",
+                format_sample("ocsf_geoip_cache_hits_total", info.hits),
+                "# HELP ocsf_geoip_cache_misses_total GeoIP lookups that searched the ranges\n",
+                "# TYPE ocsf_geoip_cache_misses_total counter\n",
+                format_sample("ocsf_geoip_cache_misses_total", info.misses),
+                "# HELP ocsf_geoip_ranges IPv4 ranges in the mapped database\n",
+                "# TYPE ocsf_geoip_ranges gauge\n",
+                format_sample("ocsf_geoip_ranges", self.database.size)]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or query the OCSF GeoIP database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a range CSV")
+    build.add_argument("csv")
+    build.add_argument("output")
+    lookup = commands.add_parser("lookup", help="look up addresses")
+    lookup.add_argument("database")
+    lookup.add_argument("ips", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_database(read_ranges(args.csv), args.output)
+        print("%d ranges written to %s" % (count, args.output))
+        return 0
+    database = GeoIpDatabase(args.database)
+    for ip in args.ips:
+        print("%s %s" % (ip, json.dumps(database.lookup(ip))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
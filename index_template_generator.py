@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Write-optimized OpenSearch index templates generated from the field mapping
+
+Builds one composable index template per OCSF class named in
+wazuh_ocsf_field_mapping.csv (ocsf-<class>-* indices), plus the legacy
+templates/ocsf-template.json that the Logstash and Data Prepper outputs load
+for ocsf-security-events-*. Field types come from the OCSF attribute types
+below, falling back to the CSV's Data Type column:
+
+- identifiers, names and enums are keyword; free text is text only
+- raw_data is kept in _source but neither indexed nor given doc values
+- unmapped is a disabled object and the root mapping is not dynamic, so
+  new alert fields never add mappings
+- indices are sorted on time, newest first
+- ip and numeric fields ignore malformed values, so one bad address or
+  number leaves that field unindexed instead of rejecting the document
+
+Settings favour bulk ingest: a long refresh interval, one primary shard per
+daily index and a larger translog flush threshold; --async-translog trades
+up to sync_interval of acknowledged writes on a node crash for fewer fsyncs.
+
+    python index_template_generator.py                 # write templates/
+    python index_template_generator.py --benchmark     # doc size report
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sys
+
+from ocsf_translator import DEFAULT_MAPPING_PATH
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+LEGACY_TEMPLATE = "ocsf-template.json"
+SECURITY_EVENTS_PATTERN = "ocsf-security-events-*"
+DETECTION_FINDING = 2004
+
+# OCSF attribute type -> OpenSearch field mapping
+TYPE_MAPPINGS = {
+    "string_t": {"type": "keyword", "ignore_above": 1024},
+    "text_t": {"type": "text"},
+    "integer_t": {"type": "integer", "ignore_malformed": True},
+    "port_t": {"type": "integer", "ignore_malformed": True},
+    "long_t": {"type": "long", "ignore_malformed": True},
+    "float_t": {"type": "float", "ignore_malformed": True},
+    "boolean_t": {"type": "boolean"},
+    "timestamp_t": {"type": "date", "format": "epoch_millis"},
+    "ip_t": {"type": "ip", "ignore_malformed": True},
+    "raw_t": {"type": "keyword", "index": False, "doc_values": False},
+    "json_t": {"type": "object", "enabled": False},
+}
+# CSV Data Type column -> OCSF type, when the field is not in OCSF_TYPES
+CSV_TYPES = {"string": "string_t", "integer": "integer_t", "timestamp": "timestamp_t"}
+
+# OCSF types of the attributes the translator and enrichment stages emit
+OCSF_TYPES = {
+    # Base Event
+    "activity_id": "integer_t", "activity_name": "string_t",
+    "category_uid": "integer_t", "category_name": "string_t",
+    "class_uid": "integer_t", "class_name": "string_t",
+    "type_uid": "long_t", "type_name": "string_t",
+    "severity_id": "integer_t", "severity": "string_t",
+    "action_id": "integer_t", "action": "string_t",
+    "count": "integer_t", "time": "timestamp_t",
+    "start_time": "timestamp_t", "end_time": "timestamp_t",
+    "message": "text_t", "raw_data": "raw_t", "unmapped": "json_t",
+    "metadata.version": "string_t", "metadata.event_code": "string_t",
+    "metadata.log_name": "string_t", "metadata.labels": "string_t",
+    "metadata.profiles": "string_t", "metadata.product.name": "string_t",
+    "metadata.product.vendor_name": "string_t", "metadata.product.version": "string_t",
+    "metadata.product.uid": "string_t", "metadata.product.feature.name": "string_t",
+    "observables.name": "string_t", "observables.type": "string_t",
+    "observables.type_id": "integer_t", "observables.value": "string_t",
+    "enrichments.name": "string_t", "enrichments.value": "string_t",
+    "enrichments.type": "string_t", "enrichments.provider": "string_t",
+    "enrichments.data": "json_t",
+    # Endpoints, devices and actors
+    "device.uid": "string_t", "device.name": "string_t", "device.ip": "ip_t",
+    "device.os.name": "string_t", "device.os.type": "string_t",
+    "device.os.type_id": "integer_t", "device.os.version": "string_t",
+    "device.os.build": "string_t", "device.os.kernel_release": "string_t",
+    "device.groups.name": "string_t",
+    "src_endpoint.ip": "ip_t", "src_endpoint.port": "port_t",
+    "dst_endpoint.ip": "ip_t", "dst_endpoint.port": "port_t",
+    "connection_info.protocol_name": "string_t",
+    "actor.user.name": "string_t",
+    "process.cmd_line": "string_t",
+    "file.path": "string_t", "file.size": "long_t", "file.attributes": "string_t",
+    "file.owner.uid": "string_t",
+    # Detection Finding
+    "finding.uid": "string_t", "finding.title": "text_t", "finding.desc": "text_t",
+    "finding.types": "string_t", "finding.product_uid": "string_t",
+    "finding.created_time": "timestamp_t", "finding.modified_time": "timestamp_t",
+    "finding.first_seen_time": "timestamp_t", "finding.last_seen_time": "timestamp_t",
+    "finding.related_events.uid": "string_t",
+    "finding.attack.technique.uid": "string_t", "finding.attack.technique.name": "string_t",
+    "finding.attack.tactics.name": "string_t", "finding.attack.tactic.name": "string_t",
+}
+ENDPOINT_ENRICHMENTS = {
+    "location.country": "string_t", "location.region": "string_t",
+    "location.city": "string_t", "location.coordinates": "float_t",
+    "autonomous_system.number": "integer_t", "autonomous_system.name": "string_t",
+}
+for _endpoint in ("src_endpoint", "dst_endpoint"):
+    OCSF_TYPES.update(("%s.%s" % (_endpoint, name), ocsf_type)
+                      for name, ocsf_type in ENDPOINT_ENRICHMENTS.items())
+
+# Emitted for every class, whatever the CSV says
+BASE_FIELDS = (
+    "activity_id", "activity_name", "category_uid", "category_name", "class_uid",
+    "class_name", "type_uid", "type_name", "severity_id", "severity", "action_id", "action",
+    "count", "time", "start_time", "end_time", "message", "raw_data", "unmapped",
+    "metadata.version", "metadata.event_code", "metadata.log_name", "metadata.log_provider", "metadata.uid",
+    "metadata.labels",
+    "metadata.profiles", "metadata.product.name", "metadata.product.vendor_name",
+    "metadata.product.version", "metadata.product.uid", "observables.name",
+    "observables.type", "observables.type_id", "observables.value",
+    "enrichments.name", "enrichments.value", "enrichments.type", "enrichments.provider",
+    "enrichments.data",
+)
+DEVICE_FIELDS = tuple(field for field in OCSF_TYPES if field.startswith("device."))
+ENDPOINT_FIELDS = tuple(field for field in OCSF_TYPES
+                        if field.startswith(("src_endpoint.", "dst_endpoint.")))
+FINDING_FIELDS = tuple(field for field in OCSF_TYPES if field.startswith("finding."))
+
+CLASS_NAME = re.compile(r"^(?P<name>.*?)\s*(?:\((?P<uid>\d+)\))?$")
+
+
+def parse_class(value):
+    """(class_uid, name) from a CSV class cell such as 'Network Activity (4001)'"""
+    match = CLASS_NAME.match(value.strip())
+    name = match.group("name")
+    if match.group("uid"):
+        return int(match.group("uid")), name
+    return (0, name) if name == "Base Event" else (None, name)
+
+
+def class_slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def read_rows(mapping_path=DEFAULT_MAPPING_PATH):
+    """(ocsf field, CSV data type, (class_uid, class name)) per mapping row"""
+    with open(mapping_path, newline="") as f:
+        for row in csv.DictReader(f):
+            field = row["OCSF Field"].strip().replace("[]", "")
+            yield field, row["Data Type"].strip(), parse_class(row["OCSF Event Class"])
+
+
+def field_mapping(field, csv_type=None):
+    ocsf_type = OCSF_TYPES.get(field)
+    if ocsf_type is None:
+        base_type = (csv_type or "string").split("(")[0].strip().lower()
+        ocsf_type = CSV_TYPES.get(base_type, "string_t")
+    return dict(TYPE_MAPPINGS[ocsf_type])
+
+
+def build_properties(fields):
+    """Nested OpenSearch properties for {dotted field: mapping}"""
+    properties = {}
+    for field, mapping in sorted(fields.items()):
+        parts = field.split(".")
+        node = properties
+        for part in parts[:-1]:
+            parent = node.setdefault(part, {"properties": {}})
+            node = parent.setdefault("properties", {})
+        node[parts[-1]] = mapping
+    return properties
+
+
+def class_fields(rows, class_uid):
+    """Field mappings for one class: base fields, its CSV rows and stage outputs"""
+    fields = {field: field_mapping(field) for field in BASE_FIELDS}
+    fields.update((field, field_mapping(field)) for field in DEVICE_FIELDS)
+    for field, csv_type, (row_class, _) in rows:
+        # The translator emits every row into a Detection Finding
+        if class_uid == DETECTION_FINDING or row_class in (0, class_uid):
+            fields[field] = field_mapping(field, csv_type)
+    if class_uid == DETECTION_FINDING:
+        fields.update((field, field_mapping(field)) for field in FINDING_FIELDS)
+    if any(field.startswith(("src_endpoint.", "dst_endpoint.")) for field in fields):
+        fields.update((field, field_mapping(field)) for field in ENDPOINT_FIELDS)
+    return fields
+
+
+def index_settings(shards=1, replicas=1, refresh_interval="30s", async_translog=False):
+    settings = {
+        "number_of_shards": shards,
+        "number_of_replicas": replicas,
+        "refresh_interval": refresh_interval,
+        "sort.field": ["time"],
+        "sort.order": ["desc"],
+        "translog.flush_threshold_size": "1gb",
+    }
+    if async_translog:
+        settings["translog.durability"] = "async"
+        settings["translog.sync_interval"] = "30s"
+    return {"index": settings}
+
+
+def mappings(fields):
+    return {"dynamic": False, "_source": {"enabled": True},
+            "properties": build_properties(fields)}
+
+
+def build_templates(mapping_path=DEFAULT_MAPPING_PATH, **settings):
+    """{file name: template} for every class plus the legacy security-events template"""
+    rows = list(read_rows(mapping_path))
+    classes = {uid: name for _, _, (uid, name) in rows if uid is not None}
+    classes.setdefault(DETECTION_FINDING, "Detection Finding")
+    templates = {}
+    for uid, name in sorted(classes.items()):
+        slug = class_slug(name)
+        templates["ocsf-%s.json" % slug] = {
+            "index_patterns": ["ocsf-%s-*" % slug],
+            "priority": 100,
+            "template": {"settings": index_settings(**settings),
+                         "mappings": mappings(class_fields(rows, uid))},
+            "_meta": {"class_uid": uid, "class_name": name,
+                      "generated_by": "index_template_generator.py"},
+        }
+    finding = templates["ocsf-%s.json" % class_slug(classes[DETECTION_FINDING])]["template"]
+    # Legacy (v1) format: what Logstash's template => and Data Prepper's template_file load
+    templates[LEGACY_TEMPLATE] = {"index_patterns": [SECURITY_EVENTS_PATTERN], "order": 100,
+                                  "settings": finding["settings"],
+                                  "mappings": finding["mappings"]}
+    return templates
+
+
+def write_templates(templates, output_dir=TEMPLATE_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    for name, template in sorted(templates.items()):
+        with open(os.path.join(output_dir, name), "w") as f:
+            json.dump(template, f, indent=2)
+            f.write("\n")
+    return sorted(templates)
+
+
+def _leaves(value, prefix=""):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _leaves(child, prefix + key + ".")
+    elif isinstance(value, list):
+        for child in value:
+            yield from _leaves(child, prefix)
+    else:
+        yield prefix[:-1], value
+
+
+def _indexed(properties, field):
+    node = {"properties": properties}
+    for part in field.split("."):
+        if node.get("enabled") is False:
+            return False
+        node = node.get("properties", {}).get(part)
+        if node is None:
+            return False
+    return node.get("index", True) is not False and node.get("enabled", True) is not False
+
+
+def doc_size_report(template, events):
+    """Per-document size and indexing work under dynamic mapping vs the template
+
+    Dynamic mapping indexes every leaf and gives each string both a text
+    field and a keyword sub-field; the template indexes each mapped leaf
+    once and skips raw_data and unmapped.
+    """
+    properties = template["mappings"]["properties"]
+    source = compressed = raw = 0
+    dynamic_fields = set()
+    template_fields = set()
+    dynamic_values = template_values = 0
+    for event in events:
+        encoded = json.dumps(event, separators=(",", ":")).encode("utf-8")
+        source += len(encoded)
+        compressed += len(gzip.compress(encoded, 6, mtime=0))
+        raw += len(json.dumps(event.get("raw_data", "")).encode("utf-8"))
+        for field, value in _leaves(event):
+            dynamic_fields.add(field)
+            dynamic_values += 2 if isinstance(value, str) else 1
+            if _indexed(properties, field):
+                template_fields.add(field)
+                template_values += 1
+    count = max(len(events), 1)
+    return {"events": len(events),
+            "source_bytes": round(source / count, 1),
+            "source_bytes_gzip": round(compressed / count, 1),
+            "raw_data_bytes": round(raw / count, 1),
+            "dynamic_mapped_fields": len(dynamic_fields),
+            "template_indexed_fields": len(template_fields),
+            "dynamic_indexed_values": round(dynamic_values / count, 1),
+            "template_indexed_values": round(template_values / count, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate OCSF OpenSearch index templates")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_PATH)
+    parser.add_argument("--output-dir", default=TEMPLATE_DIR)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--refresh-interval", default="30s")
+    parser.add_argument("--async-translog", action="store_true",
+                        help="fsync the translog every 30s instead of per bulk request")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="report per-document size and indexed fields on the benchmark "
+                        "corpora instead of writing templates")
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    templates = build_templates(args.mapping, shards=args.shards, replicas=args.replicas,
+                                refresh_interval=args.refresh_interval,
+                                async_translog=args.async_translog)
+    if args.benchmark:
+        from benchmark_suite import generate_corpus
+        from ocsf_translator import OcsfTranslator
+        translator = OcsfTranslator(args.mapping)
+        events = [translator.translate_line(line)
+                  for line in generate_corpus("mixed", args.events)]
+        report = doc_size_report(templates[LEGACY_TEMPLATE], [e for e in events if e])
+        for key, value in report.items():
+            print("%-26s %s" % (key, value))
+        return 0
+    for name in write_templates(templates, args.output_dir):
+        print(os.path.join(args.output_dir, name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
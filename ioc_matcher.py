@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Threat-intel IOC matching stage for translated OCSF events
+
+Indicators are loaded from a local feed file into an IndicatorSet: hash
+tables for IP addresses and file hashes, and an Aho-Corasick automaton for
+string indicators (file names, domains, command fragments) matched as
+case-insensitive substrings of process.cmd_line and file.path. The
+automaton is pyahocorasick's when that package is installed and a
+pure-Python one otherwise; either way string results are memoized per
+distinct text, since command lines and monitored paths repeat heavily.
+Matches are attached to the event as OCSF enrichments.
+
+The feed is reloaded when the file changes by building a new IndicatorSet
+off the hot path and swapping it in with one assignment; a feed that fails
+to load leaves the running set in place.
+
+Feed format, one indicator per line, '#' comments:
+    type,value[,source]
+with type one of ip, md5, sha1, sha256, string (domain, url and filename are
+treated as string).
+"""
+import csv
+import threading
+from collections import Counter, deque
+
+from mapping_reload import file_signature
+from metrics_exporter import format_sample
+from sharded_cache import lru_cache
+
+HASH_TYPES = ("md5", "sha1", "sha256")
+STRING_TYPES = ("string", "domain", "url", "filename")
+# syscheck fields holding the hashes of the changed file
+HASH_FIELDS = tuple(hash_type + "_after" for hash_type in HASH_TYPES)
+ENDPOINTS = ("src_endpoint", "dst_endpoint")
+TEXT_SOURCES = (("process", "cmd_line"), ("file", "path"))
+# String indicators shorter than this match far too much to be useful
+MIN_STRING_LENGTH = 4
+
+
+class PythonAutomaton:
+    """Aho-Corasick automaton over lower-case patterns"""
+
+    def __init__(self, patterns):
+        goto = [{}]
+        outputs = [()]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                following = goto[state].get(ch)
+                if following is None:
+                    following = len(goto)
+                    goto[state][ch] = following
+                    goto.append({})
+                    outputs.append(())
+                state = following
+            outputs[state] = (pattern,)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, following in goto[state].items():
+                queue.append(following)
+                target = fail[state]
+                while target and ch not in goto[target]:
+                    target = fail[target]
+                fail[following] = goto[target].get(ch, 0)
+                outputs[following] += outputs[fail[following]]
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def __len__(self):
+        return len(self._goto)
+
+    def search(self, text):
+        """Return the patterns found in text"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        found = ()
+        for ch in text:
+            following = goto[state].get(ch)
+            while following is None and state:
+                state = fail[state]
+                following = goto[state].get(ch)
+            state = following or 0
+            if outputs[state]:
+                found += outputs[state]
+        return found
+
+
+class CAutomaton:
+    """pyahocorasick automaton with the PythonAutomaton interface"""
+
+    def __init__(self, patterns):
+        import ahocorasick
+        automaton = ahocorasick.Automaton()
+        for pattern in patterns:
+            automaton.add_word(pattern, pattern)
+        if len(automaton):
+            automaton.make_automaton()
+        self._automaton = automaton
+
+    def __len__(self):
+        return len(self._automaton)
+
+    def search(self, text):
+        if not len(self._automaton):
+            return ()
+        return tuple(pattern for _, pattern in self._automaton.iter(text))
+
+
+def make_automaton(patterns):
+    try:
+        return CAutomaton(patterns)
+    except ImportError:
+        return PythonAutomaton(patterns)
+
+
+class IndicatorSet:
+    """Immutable compiled indicators: hash tables plus a string automaton"""
+
+    def __init__(self, indicators, cache_size=8192):
+        self.ips = {}
+        self.hashes = {}
+        self.strings = {}
+        self.skipped = 0
+        for indicator_type, value, source in indicators:
+            indicator_type = indicator_type.strip().lower()
+            value = value.strip()
+            if indicator_type == "ip":
+                table, key = self.ips, value
+            elif indicator_type in HASH_TYPES:
+                table, key = self.hashes, value.lower()
+            elif indicator_type in STRING_TYPES and len(value) >= MIN_STRING_LENGTH:
+                table, key = self.strings, value.lower()
+            else:
+                self.skipped += 1
+                continue
+            table[key] = (indicator_type, value, source)
+        self.automaton = make_automaton(self.strings)
+        self.search = lru_cache(cache_size)(self._search)
+
+    def __len__(self):
+        return len(self.ips) + len(self.hashes) + len(self.strings)
+
+    def _search(self, text):
+        strings = self.strings
+        return tuple(strings[pattern] for pattern in dict.fromkeys(
+            self.automaton.search(text.lower())))
+
+
+def read_feed(path):
+    """Yield (type, value, source) from a feed file"""
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#") or len(row) < 2:
+                continue
+            if row[0].strip().lower() == "type" and row[1].strip().lower() == "value":
+                continue
+            yield row[0], row[1], (row[2].strip() if len(row) > 2 else None) or None
+
+
+def enrichment(name, value, indicator):
+    indicator_type, indicator_value, source = indicator
+    item = {"name": name, "value": value, "type": "IOC",
+            "data": {"indicator": indicator_value, "indicator_type": indicator_type}}
+    if source:
+        item["provider"] = source
+    return item
+
+
+class IocMatcher:
+    """Translator stage attaching IOC matches as OCSF enrichments"""
+
+    def __init__(self, path, poll_interval=5.0, cache_size=8192):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self.matched_events = 0
+        self.matches = Counter()
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self._signature = file_signature(path)
+        self.indicators = IndicatorSet(read_feed(path), cache_size)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def reload(self):
+        """Rebuild the indicator set if the feed changed; True when swapped"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            indicators = IndicatorSet(read_feed(self.path), self.cache_size)
+        except (OSError, ValueError, csv.Error) as exc:
+            self.errors += 1
+            self.last_error = "%s: %s" % (type(exc).__name__, exc)
+            return False
+        self.indicators = indicators
+        self.reloads += 1
+        return True
+
+    def __call__(self, alert, event, raw=None):
+        # One read, so a reload mid-event never mixes indicator sets
+        indicators = self.indicators
+        found = []
+        if indicators.ips:
+            for name in ENDPOINTS:
+                endpoint = event.get(name)
+                if endpoint is not None:
+                    ip = endpoint.get("ip")
+                    if ip in indicators.ips:
+                        found.append(enrichment(name + ".ip", ip, indicators.ips[ip]))
+        if indicators.hashes:
+            syscheck = alert.get("syscheck")
+            if syscheck:
+                for field in HASH_FIELDS:
+                    value = syscheck.get(field)
+                    if value and value.lower() in indicators.hashes:
+                        found.append(enrichment("file.hashes", value,
+                                                indicators.hashes[value.lower()]))
+        if indicators.strings:
+            for parent, field in TEXT_SOURCES:
+                holder = event.get(parent)
+                if holder is not None:
+                    text = holder.get(field)
+                    if text:
+                        for indicator in indicators.search(text):
+                            found.append(enrichment(parent + "." + field, text, indicator))
+        if found:
+            event.setdefault("enrichments", []).extend(found)
+            self.matched_events += 1
+            for item in found:
+                self.matches[item["data"]["indicator_type"]] += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True, name="ioc-reload")
+            self._thread.start()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            self.reload()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def render(self):
+        lines = ["# HELP ocsf_ioc_indicators Indicators in the active set\n",
+                 "# TYPE ocsf_ioc_indicators gauge\n",
+                 format_sample("ocsf_ioc_indicators", len(self.indicators)),
+                 "# HELP ocsf_ioc_matched_events_total Events with at least one IOC match\n",
+                 "# TYPE ocsf_ioc_matched_events_total counter\n",
+                 format_sample("ocsf_ioc_matched_events_total", self.matched_events),
+                 "# HELP ocsf_ioc_matches_total IOC matches by indicator type\n",
+                 "# TYPE ocsf_ioc_matches_total counter\n"]
+        for indicator_type, count in sorted(self.matches.items()):
+            lines.append(format_sample("ocsf_ioc_matches_total", count,
+                                       {"type": indicator_type}))
+        lines += ["# HELP ocsf_ioc_reloads_total Indicator sets swapped in at runtime\n",
+                  "# TYPE ocsf_ioc_reloads_total counter\n",
+                  format_sample("ocsf_ioc_reloads_total", self.reloads),
+                  "# HELP ocsf_ioc_reload_errors_total Feed changes that failed to load\n",
+                  "# TYPE ocsf_ioc_reload_errors_total counter\n",
+                  format_sample("ocsf_ioc_reload_errors_total", self.errors)]
+        return lines
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Adaptive load shedding with tiered fidelity for the Python OCSF pipeline
+
+When the queue backs up (alert_rules.yml fires QueueBacklog above 5000
+queued events) it is better to degrade than to fall hours behind. The
+controller tracks pressure from queue depth and per-batch latency and
+adjusts a sample rate for low-severity events with additive increase and
+multiplicative decrease:
+
+- severity_id >= 4 (High, Critical, Fatal) always keeps full fidelity
+- severity_id 1-3 is sampled per rule at the current rate; a kept event's
+  count carries the events skipped since the previous kept one, so
+  count-based dashboards stay accurate
+- Informational events also lose raw_data while shedding is active
+
+The decision is taken from rule.level before translation, so shed events
+never pay the translation cost.
+"""
+from metrics_exporter import format_sample
+from ocsf_translator import severity_for_level
+
+DEFAULT_MAX_QUEUE_DEPTH = 5000
+KEEP_SEVERITY_ID = 4
+INFORMATIONAL = 1
+
+
+class LoadShedder:
+    """Queue-depth and latency driven sampler for low-severity alerts"""
+
+    def __init__(self, max_queue_depth=DEFAULT_MAX_QUEUE_DEPTH, target_latency=1.0,
+                 min_rate=0.01, decrease=0.5, increase=0.05, recover_below=0.8,
+                 keep_severity_id=KEEP_SEVERITY_ID):
+        self.max_queue_depth = max_queue_depth
+        self.target_latency = target_latency
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.recover_below = recover_below
+        self.keep_severity_id = keep_severity_id
+        self.rate = 1.0
+        self.pressure = 0.0
+        self.shed_by_severity = [0] * 7
+        self.raw_data_dropped = 0
+        # rule id -> [sampling credit, events skipped since the last kept one]
+        self._strata = {}
+
+    @property
+    def active(self):
+        return self.rate < 1.0
+
+    def update(self, queue_depth, latency):
+        """Adjust the sample rate from the current backlog and batch latency"""
+        pressure = max(queue_depth / self.max_queue_depth, latency / self.target_latency)
+        self.pressure = pressure
+        if pressure > 1.0:
+            self.rate = max(self.rate * self.decrease, self.min_rate)
+        elif pressure < self.recover_below and self.rate < 1.0:
+            self.rate = min(self.rate + self.increase, 1.0)
+        return self.rate
+
+    def admit(self, alert):
+        """Return the count weight for an alert to keep, or 0 to shed it"""
+        rate = self.rate
+        if rate >= 1.0 and not self._strata:
+            return 1
+        rule = alert.get("rule") or {}
+        try:
+            severity_id = severity_for_level(rule.get("level", 0))[0]
+        except (TypeError, ValueError):
+            return 1
+        if severity_id >= self.keep_severity_id:
+            return 1
+        rule_id = rule.get("id")
+        stratum = self._strata.get(rule_id)
+        if rate >= 1.0:
+            # Recovered: the next event of each rule carries its skipped count
+            return self._strata.pop(rule_id)[1] + 1 if stratum is not None else 1
+        if stratum is None:
+            # Keep the first event of every rule so rare rules stay visible
+            self._strata[rule_id] = [0.0, 0]
+            return 1
+        stratum[0] += rate
+        if stratum[0] < 1.0:
+            stratum[1] += 1
+            self.shed_by_severity[severity_id] += 1
+            return 0
+        stratum[0] -= 1.0
+        weight = stratum[1] + 1
+        stratum[1] = 0
+        return weight
+
+    def degrade(self, event, weight):
+        """Apply count weighting and reduced fidelity to a kept event"""
+        if weight > 1:
+            event["count"] = event.get("count", 1) + weight - 1
+        if (self.rate < 1.0 and event.get("severity_id") == INFORMATIONAL
+                and event.pop("raw_data", None) is not None):
+            self.raw_data_dropped += 1
+        return event
+
+    def render(self):
+        lines = ["# HELP ocsf_shedding_sample_rate Fraction of low-severity events kept\n",
+                 "# TYPE ocsf_shedding_sample_rate gauge\n",
+                 format_sample("ocsf_shedding_sample_rate", self.rate),
+                 "# HELP ocsf_shedding_pressure Queue depth or latency relative to its limit\n",
+                 "# TYPE ocsf_shedding_pressure gauge\n",
+                 format_sample("ocsf_shedding_pressure", self.pressure),
+                 "# HELP ocsf_shedding_events_shed_total Events sampled out before translation\n",
+                 "# TYPE ocsf_shedding_events_shed_total counter\n"]
+        for severity_id in range(1, self.keep_severity_id):
+            lines.append(format_sample("ocsf_shedding_events_shed_total",
+                                       self.shed_by_severity[severity_id],
+                                       {"severity_id": severity_id}))
+        lines.extend(["# HELP ocsf_shedding_raw_data_dropped_total Informational events sent without raw_data\n",
+                      "# TYPE ocsf_shedding_raw_data_dropped_total counter\n",
+                      format_sample("ocsf_shedding_raw_data_dropped_total", self.raw_data_dropped)])
+        return lines
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for each row of wazuh_ocsf_field_mapping.csv
+
+Times every mapping row's transform in isolation over representative alerts
+from the benchmark corpora and ranks the rows by cost. Rows that compile to
+a MappingStep are timed through MappingStep.apply; rows whose target is
+owned by a translator stage (rule.mitre.* -> finding.attack[]) are timed
+through that stage. Results can be appended to a history file keyed by the
+mapping version and git revision, so cost changes can be followed across
+releases.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from time import perf_counter_ns
+
+from benchmark_suite import BENCHMARK_DIR, CORPORA, CORPUS_DIR, load_corpus
+from ocsf_translator import (
+    DEFAULT_MAPPING_PATH, STAGE_OWNED_TARGETS, OcsfTranslator, get_path, load_mapping,
+)
+
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, "mapping_history.json")
+# Translator stage that owns each stage-owned target prefix
+STAGE_FOR_TARGET = {"finding.attack": "mitre"}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def row_transforms(translator, rows):
+    """Yield (wazuh_field, ocsf_field, source path, transform) per CSV row"""
+    steps = {(step.wazuh_field, step.ocsf_field): step for step in translator.plan.steps}
+    stages = dict(translator.stages)
+    for row in rows:
+        wazuh_field = row["Wazuh Field"].strip()
+        ocsf_field = row["OCSF Field"].strip()
+        step = steps.get((wazuh_field, ocsf_field))
+        if step is not None:
+            yield wazuh_field, ocsf_field, step.source, step.apply
+            continue
+        for prefix in STAGE_OWNED_TARGETS:
+            if ocsf_field.startswith(prefix):
+                stage = stages[STAGE_FOR_TARGET[prefix]]
+                yield wazuh_field, ocsf_field, tuple(wazuh_field.split(".")), stage
+
+
+def time_transform(transform, alerts, repeat):
+    """Best-of-repeat nanoseconds to apply transform once to every alert"""
+    best = None
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        for alert in alerts:
+            transform(alert, {})
+        elapsed = perf_counter_ns() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _noop(alert, event):
+    pass
+
+
+def benchmark_rows(translator=None, mapping_path=DEFAULT_MAPPING_PATH, corpora=CORPORA,
+                   corpus_dir=CORPUS_DIR, events=2000, repeat=5):
+    """Return per-row costs, most expensive first"""
+    translator = translator or OcsfTranslator(mapping_path)
+    rows, version = load_mapping(mapping_path)
+    alerts = []
+    for name in corpora:
+        alerts.extend(json.loads(line) for line in load_corpus(name, corpus_dir)[:events])
+    # Loop and empty-dict overhead, subtracted from every row
+    overhead = time_transform(_noop, alerts, repeat)
+
+    results = []
+    for wazuh_field, ocsf_field, source, transform in row_transforms(translator, rows):
+        hits = [alert for alert in alerts if get_path(alert, source) is not None]
+        total = max(time_transform(transform, alerts, repeat) - overhead, 0)
+        hit_total = (max(time_transform(transform, hits, repeat)
+                         - overhead * len(hits) / len(alerts), 0) if hits else 0)
+        results.append({
+            "wazuh_field": wazuh_field,
+            "ocsf_field": ocsf_field,
+            "ns_per_event": total / len(alerts),
+            "ns_per_hit": hit_total / len(hits) if hits else None,
+            "hit_rate": len(hits) / len(alerts),
+        })
+    results.sort(key=lambda r: r["ns_per_event"], reverse=True)
+    return {"version": version, "events": len(alerts), "rows": results}
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(report, path=HISTORY_PATH):
+    """Append a report to the history file"""
+    history = load_history(path)
+    history.append({
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "mapping_version": report["version"],
+        "revision": git_revision(),
+        "python": "%d.%d.%d" % sys.version_info[:3],
+        "rows": {row["wazuh_field"]: row["ns_per_event"] for row in report["rows"]},
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row field mapping micro-benchmarks")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_PATH)
+    parser.add_argument("--corpus", action="append", choices=CORPORA,
+                        help="corpus to draw inputs from (default: all)")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR)
+    parser.add_argument("--events", type=int, default=2000, help="alerts per corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--record", action="store_true",
+                        help="append the results to --history")
+    args = parser.parse_args()
+
+    report = benchmark_rows(mapping_path=args.mapping, corpora=args.corpus or CORPORA,
+                            corpus_dir=args.corpus_dir, events=args.events, repeat=args.repeat)
+    history = load_history(args.history)
+    previous = history[-1]["rows"] if history else {}
+
+    print("Field mapping cost (mapping %s, %d alerts)" % (report["version"], report["events"]))
+    print("=" * 96)
+    print("%-4s %-22s %-34s %9s %9s %6s %8s" % (
+        "rank", "wazuh field", "ocsf field", "ns/event", "ns/hit", "hit%", "vs last"))
+    for rank, row in enumerate(report["rows"], 1):
+        before = previous.get(row["wazuh_field"])
+        delta = ("%+.0f%%" % ((row["ns_per_event"] - before) / before * 100)
+                 if before else "")
+        print("%-4d %-22s %-34s %9.0f %9s %5.0f%% %8s" % (
+            rank, row["wazuh_field"], row["ocsf_field"], row["ns_per_event"],
+            "%.0f" % row["ns_per_hit"] if row["ns_per_hit"] is not None else "-",
+            row["hit_rate"] * 100, delta))
+
+    if args.record:
+        record(report, args.history)
+        print("\nRecorded in %s" % args.history)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Hot reload of wazuh_ocsf_field_mapping.csv for a running translator
+
+A background thread watches the mapping file (inotify on its directory,
+so editor renames are seen, with stat polling as the fallback), recompiles
+the CSV off the hot path and parks the new MappingPlan. The pipeline calls
+apply_pending() between batches, which swaps translator.plan with a single
+attribute assignment, so every event in a batch is translated by exactly
+one plan and carries that plan's version in metadata.labels. A CSV that
+fails to load or compile is reported and the running plan is kept.
+"""
+import os
+import threading
+from time import perf_counter
+
+from metrics_exporter import format_sample
+from ocsf_translator import compile_mapping, load_mapping
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class MappingReloader:
+    """Recompile the translator's mapping in the background when it changes"""
+
+    def __init__(self, translator, poll_interval=1.0, use_inotify=True):
+        self.translator = translator
+        self.path = translator.mapping_path
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_compile_seconds = 0.0
+        self._signature = file_signature(self.path)
+        self._pending = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def version(self):
+        return self.translator.plan.version
+
+    def check(self):
+        """Recompile if the file changed; returns True when a plan is pending"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        start = perf_counter()
+        try:
+            rows, version = load_mapping(self.path)
+            if version == self.version:
+                # Reverted to the running mapping before the swap happened
+                self._pending = None
+                return False
+            plan = compile_mapping(rows, version)
+            if not plan.steps:
+                raise ValueError("mapping has no rows")
+        except (OSError, ValueError, KeyError, AttributeError) as exc:
+            self.errors += 1
+            self.last_error = "%s: %s" % (type(exc).__name__, exc)
+            return False
+        self.last_compile_seconds = perf_counter() - start
+        self._pending = plan
+        return True
+
+    def apply_pending(self):
+        """Swap in a recompiled plan; call only between batches"""
+        plan = self._pending
+        if plan is None:
+            return False
+        self._pending = None
+        self.translator.plan = plan
+        self.reloads += 1
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True,
+                                            name="mapping-reload")
+            self._thread.start()
+
+    def _watch(self):
+        watcher = None
+        if self.use_inotify:
+            try:
+                from alert_tailer import Inotify
+                watcher = Inotify(os.path.dirname(os.path.abspath(self.path)))
+            except (OSError, AttributeError):
+                watcher = None
+        try:
+            while not self._stopped.is_set():
+                if watcher is not None:
+                    watcher.wait(self.poll_interval)
+                else:
+                    self._stopped.wait(self.poll_interval)
+                self.check()
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def render(self):
+        return ["# HELP ocsf_mapping_reloads_total Mapping plans swapped in at runtime\n",
+                "# TYPE ocsf_mapping_reloads_total counter\n",
+                format_sample("ocsf_mapping_reloads_total", self.reloads),
+                "# HELP ocsf_mapping_reload_errors_total Mapping changes rejected as invalid\n",
+                "# TYPE ocsf_mapping_reload_errors_total counter\n",
+                format_sample("ocsf_mapping_reload_errors_total", self.errors),
+                "# HELP ocsf_mapping_info Version of the active field mapping\n",
+                "# TYPE ocsf_mapping_info gauge\n",
+                format_sample("ocsf_mapping_info", 1, {"version": self.version})]
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Prometheus /metrics endpoint for the Python Wazuh-OCSF pipeline
+
+Serves the text exposition format from any number of collectors (objects
+with a render() method returning exposition lines), so translator timings
+and pipeline counters can be scraped next to the jobs in prometheus.yml.
+
+PipelineMetrics publishes the series alert_rules.yml is written against
+(logstash_pipeline_events_*, logstash_jvm_memory_heap_*). Hot-path updates
+take no locks: counters and the summary ring index are itertools.count
+objects, whose increment is a single C call that cannot be interleaved.
+"""
+import itertools
+import os
+import resource
+import threading
+from collections import deque
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_PORT = 9464
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    """Render a label dict as {name="value",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (name, escape_label_value(value))
+                          for name, value in labels.items()) + "}"
+
+
+def format_sample(name, value, labels=None):
+    return "%s%s %s\n" % (name, format_labels(labels), repr(float(value)) if isinstance(value, float) else value)
+
+
+class Counter:
+    """Monotonic counter; inc() is a bound itertools.count.__next__"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._count = itertools.count()
+        self.inc = self._count.__next__
+
+    def add(self, amount):
+        # Advance the count by amount without a Python-level loop
+        deque(itertools.islice(self._count, amount), maxlen=0)
+
+    @property
+    def value(self):
+        # repr is "count(N)"; reading it does not advance the counter
+        return int(repr(self._count)[6:-1])
+
+    def render(self):
+        return ["# HELP %s %s\n" % (self.name, self.help_text),
+                "# TYPE %s counter\n" % self.name,
+                format_sample(self.name, self.value)]
+
+
+class Gauge:
+    """Gauge set directly or computed by a callback at scrape time"""
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.callback() if self.callback is not None else self.value
+        return ["# HELP %s %s\n" % (self.name, self.help_text),
+                "# TYPE %s gauge\n" % self.name,
+                format_sample(self.name, value)]
+
+
+class Summary:
+    """Quantile summary over a fixed ring of the most recent observations"""
+
+    QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+    def __init__(self, name, help_text, window=4096):
+        if window & (window - 1):
+            raise ValueError("window must be a power of two")
+        self.name = name
+        self.help_text = help_text
+        self._mask = window - 1
+        self._ring = [0.0] * window
+        self._index = itertools.count()
+        self._next = self._index.__next__
+        self.sum = 0.0
+
+    def observe(self, value):
+        self._ring[self._next() & self._mask] = value
+        # A rare lost update under thread contention only skews _sum
+        self.sum += value
+
+    @property
+    def count(self):
+        return int(repr(self._index)[6:-1])
+
+    def quantiles(self):
+        count = self.count
+        samples = sorted(self._ring[:min(count, self._mask + 1)])
+        if not samples:
+            return {q: 0.0 for q in self.QUANTILES}
+        return {q: samples[int(q * (len(samples) - 1))] for q in self.QUANTILES}
+
+    def render(self):
+        lines = ["# HELP %s %s\n" % (self.name, self.help_text),
+                 "# TYPE %s summary\n" % self.name]
+        for quantile, value in self.quantiles().items():
+            lines.append(format_sample(self.name, value, {"quantile": repr(quantile)}))
+        lines.append(format_sample(self.name + "_sum", self.sum))
+        lines.append(format_sample(self.name + "_count", self.count))
+        return lines
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_limit_bytes():
+    """cgroup memory limit, falling back to physical memory"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+class PipelineMetrics:
+    """Pipeline series named after the expressions in alert_rules.yml"""
+
+    def __init__(self, queue_size=None, memory_limit=None):
+        self.events_in = Counter("logstash_pipeline_events_in_total",
+                                 "Events read from the alerts source")
+        self.events_out = Counter("logstash_pipeline_events_out_total",
+                                  "OCSF events written to the sinks")
+        self.events_filtered = Counter("logstash_pipeline_events_filtered_total",
+                                       "Events dropped or failing OCSF validation")
+        self.queue_size = Gauge("logstash_pipeline_events_queue_size",
+                                "Events queued between ingest and translation", queue_size)
+        self.duration = Summary("logstash_pipeline_events_duration_seconds",
+                                "Per-event processing latency")
+        self.heap_used = Gauge("logstash_jvm_memory_heap_used_bytes",
+                               "Resident memory of the Python pipeline process",
+                               resident_memory_bytes)
+        limit = memory_limit or memory_limit_bytes()
+        self.heap_max = Gauge("logstash_jvm_memory_heap_max_bytes",
+                              "Memory limit of the Python pipeline process", lambda: limit)
+        self.series = [self.events_in, self.events_out, self.events_filtered,
+                       self.queue_size, self.duration, self.heap_used, self.heap_max]
+
+    def render(self):
+        lines = []
+        for metric in self.series:
+            lines.extend(metric.render())
+        return lines
+
+
+class MetricsServer:
+    """Threaded HTTP server exposing collectors at /metrics"""
+
+    def __init__(self, collectors=(), host="0.0.0.0", port=DEFAULT_PORT):
+        self.collectors = list(collectors)
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def register(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        return "".join("".join(collector.render()) for collector in self.collectors)
+
+    def start(self):
+        """Serve in a background thread; returns the bound port"""
+        # Imported here: http.server is the slowest import in the pipeline and
+        # batch jobs that never serve /metrics should not pay for it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True,
+                                        name="metrics-server")
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Python Wazuh-OCSF pipeline: alerts.json tailer -> write-ahead queue ->
+translator -> aggregator -> sink
+
+Runs the translation outside Logstash with the same event flow as
+wazuh-ocsf-pipeline.conf. Ingest and translation are decoupled by the
+on-disk queue when one is configured; the tailer checkpoint advances once
+lines are durable in the queue. Without a queue it, and with one the queue
+offset, advances once the primary sink has delivered the batch (for a
+FanoutSink, when its primary worker reports the batch done; for a plain
+callable, when it returns). With aggregation, a batch is only acknowledged
+once every alert it contributed to an open aggregate has been emitted too,
+so a restart replays alerts that were still held in a window.
+
+With --partitions, translation runs in parallel worker processes; lines
+are routed by agent.id (or --partition-key) so each agent's events keep
+their order and aggregate within one worker. With --threads, one shared
+translator runs on a thread pool instead, which scales on free-threaded
+Python builds (see threaded_translation.py). With --archives, archives.json
+is converted to minimal Base Events by a separate process with its own
+sink (see archive_events.py). With --errors, events failing OCSF validation
+and the raw lines of alerts the translator raised on are appended to an
+NDJSON file instead of only being counted.
+"""
+import argparse
+import os
+import signal
+import threading
+from collections import deque
+from functools import partial
+from time import perf_counter
+
+from metrics_exporter import DEFAULT_PORT, MetricsServer, PipelineMetrics
+from ocsf_translator import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAPPING_PATH, TRANSLATION_ERRORS, OcsfTranslator,
+)
+from sink_fanout import OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_SPILL, FanoutSink, SinkWorker
+
+QUEUE_CONSUMER = "translator"
+
+
+def _call_all(callbacks):
+    for callback in callbacks:
+        callback()
+
+
+class NdjsonFileSink:
+    """Append encoded events to a newline-delimited JSON file"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab")
+
+    def __call__(self, events):
+        if events:
+            self._file.write(b"\n".join(events) + b"\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class OcsfPipeline:
+    """Drive batches from a tailer through translation into a sink"""
+
+    def __init__(self, translator, sink, queue=None, checkpoint=None,
+                 aggregator=None, metrics=None, error_sink=None, batch_size=1000,
+                 shedder=None, prefilter=None, reloader=None, executor=None,
+                 partition_key=None, threaded=None):
+        self.translator = translator
+        self.sink = sink
+        self.queue = queue
+        self.checkpoint = checkpoint
+        self.aggregator = aggregator
+        self.error_sink = error_sink
+        self.batch_size = batch_size
+        self.shedder = shedder
+        self.prefilter = prefilter
+        self.reloader = reloader
+        self.executor = executor
+        self.partition_key = partition_key
+        self.threaded = threaded
+        self._partitioned = ([], [], [0])
+        self.metrics = metrics or PipelineMetrics(queue_size=self.queue_depth)
+        self._ingested = 0
+        # Position of the last batch translated; aggregates record the one before theirs
+        self._position = 0
+        # (position, done) of delivered batches whose alerts an aggregate still holds
+        self._waiting = deque()
+        self._stopped = threading.Event()
+        self._consumer = None
+
+    def queue_depth(self):
+        """Events ingested but not yet translated"""
+        return max(self._ingested - self.metrics.events_in.value, 0)
+
+    def collect_partition(self, partition, result):
+        """Executor emit callback; runs on the executor's collector thread"""
+        output, errors, filtered = self._partitioned
+        events, error_events, count = result
+        output.extend(events)
+        errors.extend(error_events)
+        filtered[0] += count
+
+    def process_partitioned(self, lines):
+        """process_batch through the executor; returns once every line is done"""
+        metrics = self.metrics
+        prefilter = self.prefilter
+        key = self.partition_key
+        submit = self.executor.submit
+        start = perf_counter()
+        metrics.events_in.add(len(lines))
+        for line in lines:
+            if prefilter is not None and not prefilter.accepts_line(line):
+                continue
+            submit(key(line), line)
+        self._position = self.executor.barrier()
+        output, errors, filtered = self._partitioned
+        self._partitioned = ([], [], [0])
+        metrics.events_filtered.add(filtered[0])
+        if lines:
+            metrics.duration.observe((perf_counter() - start) / len(lines))
+        if errors and self.error_sink is not None:
+            self.error_sink(errors)
+        return output
+
+    def process_threaded(self, lines):
+        """process_batch with translation spread over the thread pool"""
+        metrics = self.metrics
+        prefilter = self.prefilter
+        aggregator = self.aggregator
+        position = self._position
+        encode = self.translator.encode
+        start = perf_counter()
+        metrics.events_in.add(len(lines))
+        if prefilter is not None:
+            lines = [line for line in lines if prefilter.accepts_line(line)]
+        output = []
+        errors = []
+        filtered = 0
+        for alert, event, encoded in self.threaded.translate_lines(lines, aggregator is None):
+            if event is None:
+                filtered += 1
+                if encoded is not None:
+                    # Raw line of an alert translate() raised on
+                    errors.append(encoded)
+            elif "ocsf_validation_errors" in event:
+                filtered += 1
+                errors.append(encode(event))
+            elif aggregator is None:
+                output.append(encoded)
+            else:
+                output.extend(encode(ready)
+                              for ready in aggregator.add(alert, event, position))
+        if aggregator is not None:
+            output.extend(encode(ready) for ready in aggregator.expire())
+        metrics.events_filtered.add(filtered)
+        if lines:
+            metrics.duration.observe((perf_counter() - start) / len(lines))
+        if errors and self.error_sink is not None:
+            self.error_sink(errors)
+        self._position = position + 1
+        return output
+
+    def process_batch(self, lines):
+        """Translate a batch of alert lines and return encoded OCSF events"""
+        if self.executor is not None:
+            return self.process_partitioned(lines)
+        if self.threaded is not None:
+            return self.process_threaded(lines)
+        metrics = self.metrics
+        translator = self.translator
+        aggregator = self.aggregator
+        shedder = self.shedder
+        prefilter = self.prefilter
+        position = self._position
+        encode = translator.encode
+        observe = metrics.duration.observe
+        filtered = metrics.events_filtered.inc
+        output = []
+        errors = []
+        metrics.events_in.add(len(lines))
+        for line in lines:
+            start = perf_counter()
+            if prefilter is not None and not prefilter.accepts_line(line):
+                # Intended drops: counted by the prefilter, not as filtered errors
+                continue
+            alert = translator.decode(line)
+            weight = 1
+            try:
+                if shedder is not None and alert is not None:
+                    weight = shedder.admit(alert)
+                    if not weight:
+                        continue
+                event = translator.translate(alert, line) if alert is not None else None
+            except TRANSLATION_ERRORS:
+                filtered()
+                errors.append(line)
+                continue
+            if event is None:
+                filtered()
+                continue
+            if shedder is not None:
+                shedder.degrade(event, weight)
+            if "ocsf_validation_errors" in event:
+                filtered()
+                errors.append(encode(event))
+                continue
+            if aggregator is None:
+                output.append(encode(event))
+            else:
+                output.extend(encode(ready)
+                              for ready in aggregator.add(alert, event, position))
+            observe(perf_counter() - start)
+        if aggregator is not None:
+            output.extend(encode(ready) for ready in aggregator.expire())
+        if errors and self.error_sink is not None:
+            self.error_sink(errors)
+        self._position = position + 1
+        return output
+
+    def held_position(self):
+        """Position of the last batch before the oldest alert still aggregated"""
+        if self.executor is not None:
+            return self.executor.held()
+        if self.aggregator is not None:
+            return self.aggregator.oldest()
+        return None
+
+    def deliver(self, lines, done=None):
+        """Translate lines and sink them; done() runs once the sink has them
+
+        While an aggregate holds alerts from this batch or an earlier one,
+        done() waits for the delivery of the batch that emits it.
+        """
+        if self.reloader is not None:
+            # Between batches: every event in a batch uses one mapping plan
+            self.reloader.apply_pending()
+        start = perf_counter()
+        output = self.process_batch(lines)
+        waiting = self._waiting
+        if done is not None:
+            waiting.append((self._position, done))
+        held = self.held_position()
+        ready = []
+        while waiting and (held is None or waiting[0][0] <= held):
+            ready.append(waiting.popleft()[1])
+        self._send(output, ready)
+        if self.shedder is not None:
+            self.shedder.update(self.queue_depth(), perf_counter() - start)
+
+    def ingest(self, tailer):
+        """Read tailer batches into the queue, or straight through the pipeline"""
+        checkpoint = self.checkpoint
+        for batch in tailer.batches():
+            token = checkpoint.track(batch.inode, batch.end_offset) if checkpoint else None
+            self._ingested += len(batch.lines)
+            if self.queue is not None:
+                self.queue.append_batch(batch.lines)
+                if checkpoint is not None:
+                    checkpoint.ack(token)
+            else:
+                self.deliver(batch.lines, partial(checkpoint.ack, token) if checkpoint else None)
+            if checkpoint is not None:
+                checkpoint.maybe_commit()
+            if self._stopped.is_set():
+                break
+
+    def consume(self):
+        """Translate committed queue records until stopped"""
+        queue = self.queue
+        while not self._stopped.is_set():
+            records = queue.read(QUEUE_CONSUMER, self.batch_size, timeout=0.5)
+            if not records:
+                if self.aggregator is not None or self.executor is not None:
+                    # Expires aggregates (in every partition worker through the
+                    # barrier) and acknowledges the batches they were holding
+                    self.deliver([])
+                continue
+            self.deliver([record.payload for record in records],
+                         partial(queue.ack, QUEUE_CONSUMER, records[-1].next_position))
+
+    def _send(self, output, callbacks):
+        """Sink output; the callbacks run once the primary sink has it"""
+        if not output and not callbacks:
+            return
+        done = partial(_call_all, callbacks) if callbacks else None
+        submit = getattr(self.sink, "submit", None)
+        if submit is not None:
+            submit(output, done)
+        else:
+            self.sink(output)
+            if done is not None:
+                done()
+        self.metrics.events_out.add(len(output))
+
+    def run(self, tailer):
+        """Run ingest in this thread and translation in a worker thread"""
+        if self.checkpoint is not None:
+            # Acks arrive from sink threads after ingest has moved on or gone idle
+            self.checkpoint.start()
+        if self.queue is not None:
+            self.queue.start_flusher()
+            self._consumer = threading.Thread(target=self.consume, daemon=True,
+                                              name="ocsf-translator")
+            self._consumer.start()
+        try:
+            self.ingest(tailer)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopped.set()
+        if self._consumer is not None:
+            self._consumer.join()
+            self._consumer = None
+        output = []
+        if self.aggregator is not None:
+            encode = self.translator.encode
+            output.extend(encode(event) for event in self.aggregator.drain())
+        if self.threaded is not None:
+            self.threaded.close()
+        if self.executor is not None:
+            self.executor.close()
+            output.extend(self._partitioned[0])
+            self._partitioned = ([], [], [0])
+        # Nothing is held any more: every waiting batch is done with this output
+        self._send(output, [done for _, done in self._waiting])
+        self._waiting.clear()
+        # Delivery callbacks ack the checkpoint and queue, so drain the sink first
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            close()
+        close = getattr(self.error_sink, "close", None)
+        if close is not None:
+            close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if self.queue is not None:
+            self.queue.close()
+
+
+def build_sink(output=None, opensearch=None, spill_dir=None, siem=None, rollover=None):
+    """A single file sink, or a fan-out whose first sink is the primary path"""
+    if opensearch is None and siem is None:
+        return NdjsonFileSink(output)
+    from bulk_sink import from_environment
+
+    # The primary sink applies backpressure; secondary sinks never stall it
+    secondary = OVERFLOW_SPILL if spill_dir else OVERFLOW_DROP
+    workers = []
+    if opensearch:
+        workers.append(SinkWorker("opensearch", from_environment(opensearch, **(rollover or {})),
+                                  overflow=OVERFLOW_BLOCK))
+    if output:
+        workers.append(SinkWorker("file", NdjsonFileSink(output),
+                                  overflow=secondary if workers else OVERFLOW_BLOCK,
+                                  spill_dir=spill_dir))
+    if siem:
+        import siem_forwarder
+        workers.append(SinkWorker("siem", siem_forwarder.from_environment(siem),
+                                  overflow=secondary if workers else OVERFLOW_BLOCK,
+                                  spill_dir=spill_dir))
+    return FanoutSink(workers)
+
+
+def main():
+    from alert_aggregator import AlertAggregator
+    from alert_checkpoint import DEFAULT_ALERTS_PATH, CheckpointManager
+    from alert_tailer import AlertTailer
+    from load_shedding import LoadShedder
+    from mapping_reload import MappingReloader
+    from partitioned_executor import PartitionedExecutor, TranslationWorker, field_key
+    from rule_prefilter import PrefilterIndex, RulePrefilter
+    from threaded_translation import ThreadedTranslator
+    from wal_queue import SegmentQueue
+
+    parser = argparse.ArgumentParser(description="Wazuh alerts.json to OCSF pipeline")
+    parser.add_argument("--alerts", default=DEFAULT_ALERTS_PATH)
+    parser.add_argument("--output", help="OCSF NDJSON output file")
+    parser.add_argument("--opensearch", help="OpenSearch URL for the daily OCSF index; "
+                        "credentials come from OUTPUT_OPENSEARCH_USER/PASSWORD")
+    parser.add_argument("--rollover-alias", help="write through this alias with size-based "
+                        "rollover instead of daily indices")
+    parser.add_argument("--rollover-max-gb", type=float,
+                        help="roll over after this many GB of _source (default 40)")
+    parser.add_argument("--rollover-max-docs", type=int, help="roll over after this many documents")
+    parser.add_argument("--siem-url", default=os.environ.get("EXTERNAL_SIEM_URL")
+                        if os.environ.get("EXTERNAL_SIEM_ENABLED") == "true" else None,
+                        help="batched NDJSON forwarding to an external SIEM "
+                        "(default: EXTERNAL_SIEM_URL when EXTERNAL_SIEM_ENABLED=true)")
+    parser.add_argument("--spill-dir", help="spill secondary sinks to disk when their queue fills")
+    parser.add_argument("--errors", help="NDJSON file for events failing OCSF validation and "
+                        "raw lines the translator could not handle")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_PATH)
+    parser.add_argument("--plan-cache", default=DEFAULT_CACHE_DIR,
+                        help="directory for the compiled mapping cache ('' disables it)")
+    parser.add_argument("--watch-mapping", action="store_true",
+                        help="recompile the mapping CSV when it changes, without a restart")
+    parser.add_argument("--checkpoint", default="/opt/ocsf/alerts.checkpoint")
+    parser.add_argument("--queue-dir", help="enable the on-disk write-ahead queue")
+    parser.add_argument("--aggregate-window", type=float, default=0,
+                        help="merge duplicate alerts within this many seconds")
+    parser.add_argument("--fallback-parser", action="store_true",
+                        help="extract user/IP/port/command from full_log when data.* is empty")
+    parser.add_argument("--geoip", help="GeoIP/ASN database built by geoip_enrichment.py")
+    parser.add_argument("--agent-inventory", help="copy of Wazuh global.db, or a JSON dump of "
+                        "GET /agents, for device OS, groups and labels")
+    parser.add_argument("--agent-inventory-ttl", type=float, default=300.0,
+                        help="seconds between agent inventory reloads")
+    parser.add_argument("--ioc-feed", help="threat-intel indicator file (type,value,source) "
+                        "matched against IPs, file hashes, command lines and paths")
+    parser.add_argument("--prefilter", help="JSON rule/level/group/agent drop config "
+                        "applied before translation")
+    parser.add_argument("--shed-queue-depth", type=int, default=0,
+                        help="sample low-severity alerts when this many events are queued")
+    parser.add_argument("--shed-latency", type=float, default=1.0,
+                        help="batch latency in seconds that also triggers shedding")
+    parser.add_argument("--partitions", type=int, default=0,
+                        help="translate in this many worker processes, partitioned by agent")
+    parser.add_argument("--partition-key", default="agent.id",
+                        help="alert field whose value picks the partition worker")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="translate on this many threads sharing one translator; "
+                        "scales on free-threaded Python (3.13t)")
+    parser.add_argument("--archives", help="also convert this archives.json to OCSF Base "
+                        "Events, in a separate process with its own sink")
+    parser.add_argument("--archive-checkpoint", default="/opt/ocsf/archives.checkpoint")
+    parser.add_argument("--archive-output", help="Base Event NDJSON file for archives; "
+                        "with --opensearch they also go to the ocsf-base_event-* indices")
+    parser.add_argument("--archive-batch-events", type=int, default=20000,
+                        help="events per archive bulk request")
+    parser.add_argument("--archive-rollover-alias", help="rollover alias for archive Base "
+                        "Events; --rollover-alias and its environment never apply to them")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--profile-stages", action="store_true",
+                        help="time translator stages and export them on /metrics")
+    parser.add_argument("--profile-dir", help="SIGUSR2 toggles a profile capture of all "
+                        "threads, written here when it stops")
+    parser.add_argument("--profile-mode", choices=("sampling", "cprofile"), default="sampling",
+                        help="cprofile only covers the main thread before Python 3.12")
+    args = parser.parse_args()
+    if not (args.output or args.opensearch or args.siem_url):
+        parser.error("at least one of --output, --opensearch or --siem-url is required")
+    if args.partitions and (args.profile_stages or args.watch_mapping or args.agent_inventory
+                            or args.ioc_feed or args.shed_queue_depth):
+        parser.error("--partitions does not support --profile-stages, --watch-mapping, "
+                     "--agent-inventory, --ioc-feed or --shed-queue-depth")
+    if args.threads and (args.partitions or args.profile_stages or args.shed_queue_depth):
+        parser.error("--threads does not support --partitions, --profile-stages "
+                     "or --shed-queue-depth")
+    if args.archives and not (args.archive_output or args.opensearch):
+        parser.error("--archives needs --archive-output or --opensearch")
+
+    if args.profile_stages:
+        from pipeline_profiling import ProfiledTranslator
+        translator = ProfiledTranslator(args.mapping, cache_dir=args.plan_cache or None)
+    else:
+        translator = OcsfTranslator(args.mapping, cache_dir=args.plan_cache or None)
+    reloader = MappingReloader(translator) if args.watch_mapping else None
+    fallback = None
+    if args.fallback_parser:
+        from fallback_parser import FallbackParser
+        fallback = FallbackParser()
+        # Ahead of observables so recovered addresses and commands are listed too
+        translator.add_stage("fallback", fallback, before="observables")
+    geoip = None
+    if args.geoip:
+        from geoip_enrichment import GeoIpEnricher
+        geoip = GeoIpEnricher.load(args.geoip)
+        translator.add_stage("geoip", geoip)
+    inventory = None
+    if args.agent_inventory:
+        from agent_inventory import AgentInventory
+        inventory = AgentInventory(args.agent_inventory, ttl=args.agent_inventory_ttl)
+        translator.add_stage("agent_inventory", inventory)
+    ioc = None
+    if args.ioc_feed:
+        from ioc_matcher import IocMatcher
+        ioc = IocMatcher(args.ioc_feed)
+        translator.add_stage("ioc", ioc)
+
+    checkpoint = CheckpointManager(args.checkpoint, args.alerts)
+    tailer = AlertTailer(args.alerts, checkpoint=checkpoint)
+    rollover = {"rollover_alias": args.rollover_alias,
+                "max_index_bytes": int(args.rollover_max_gb * 1024 ** 3)
+                if args.rollover_max_gb else None,
+                "max_index_docs": args.rollover_max_docs}
+    sink = build_sink(args.output, args.opensearch, args.spill_dir, args.siem_url, rollover)
+    pipeline = OcsfPipeline(
+        translator, sink,
+        queue=SegmentQueue(args.queue_dir) if args.queue_dir else None,
+        checkpoint=checkpoint,
+        error_sink=NdjsonFileSink(args.errors) if args.errors else None,
+        aggregator=(AlertAggregator(args.aggregate_window)
+                    if args.aggregate_window and not args.partitions else None),
+        shedder=(LoadShedder(args.shed_queue_depth, args.shed_latency)
+                 if args.shed_queue_depth else None),
+        prefilter=RulePrefilter(PrefilterIndex.load(args.prefilter)) if args.prefilter else None,
+        reloader=reloader,
+        partition_key=field_key(args.partition_key),
+        threaded=ThreadedTranslator(translator, args.threads) if args.threads else None,
+    )
+    if args.partitions:
+        # Each worker builds its own translator and per-partition aggregator
+        pipeline.executor = PartitionedExecutor(
+            partial(TranslationWorker, args.mapping, args.plan_cache or None,
+                    args.aggregate_window, args.fallback_parser, args.geoip),
+            pipeline.collect_partition, workers=args.partitions)
+    server = MetricsServer([pipeline.metrics], port=args.metrics_port)
+    if pipeline.executor is not None:
+        server.register(pipeline.executor)
+    if args.profile_stages:
+        server.register(translator.profiler)
+    if pipeline.shedder is not None:
+        server.register(pipeline.shedder)
+    if pipeline.prefilter is not None:
+        server.register(pipeline.prefilter)
+    if fallback is not None:
+        server.register(fallback)
+    if geoip is not None:
+        server.register(geoip)
+    if inventory is not None:
+        server.register(inventory)
+        inventory.start()
+    if ioc is not None:
+        server.register(ioc)
+        ioc.start()
+    if isinstance(sink, FanoutSink):
+        server.register(sink)
+        for worker in sink.workers:
+            if hasattr(worker.sink, "render"):
+                server.register(worker.sink)
+    if reloader is not None:
+        server.register(reloader)
+        reloader.start()
+    server.start()
+    if args.profile_dir:
+        from pipeline_profiling import ProfileCapture
+        ProfileCapture(args.profile_dir, args.profile_mode).install()
+    archives = None
+    if args.archives:
+        import multiprocessing
+        from archive_events import run_archives
+        archives = multiprocessing.get_context("spawn").Process(
+            target=run_archives, name="ocsf-archives",
+            args=(args.archives, args.archive_checkpoint, args.archive_output,
+                  args.opensearch, args.archive_batch_events),
+            kwargs={"metrics_port": args.metrics_port + 1 if args.metrics_port else None,
+                    "rollover_alias": args.archive_rollover_alias})
+        archives.start()
+    try:
+        pipeline.run(tailer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if archives is not None:
+            # SIGINT lets the archive pipeline flush its sink and checkpoint
+            os.kill(archives.pid, signal.SIGINT)
+            archives.join(30)
+            if archives.is_alive():
+                archives.terminate()
+        if reloader is not None:
+            reloader.stop()
+        if inventory is not None:
+            inventory.stop()
+        if ioc is not None:
+            ioc.stop()
+        server.stop()
+        tailer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Wazuh alert to OCSF Detection Finding translator
+
+Python port of the filter section of wazuh-ocsf-pipeline.conf. Field
+mappings are read from wazuh_ocsf_field_mapping.csv and compiled once into a
+flat plan of (source path, target path, converter) steps; the MITRE
+ATT&CK, observables and finding objects are built by dedicated stages.
+"""
+import json
+import os
+import threading
+import zlib
+from datetime import date, datetime
+
+from sharded_cache import lru_cache
+
+DEFAULT_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "wazuh_ocsf_field_mapping.csv")
+OCSF_VERSION = "1.1.0"
+# Compiled plans are pickled here by load_plan(); OCSF_CACHE_DIR overrides
+DEFAULT_CACHE_DIR = os.environ.get("OCSF_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "wazuh-ocsf")
+# Bump when MappingPlan/MappingStep change shape so stale caches are ignored
+PLAN_CACHE_FORMAT = 1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# What translate() raises on valid JSON with malformed fields (a bad timestamp,
+# a non-numeric rule.level, rule given as a string); callers skip the alert
+TRANSLATION_ERRORS = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+REQUIRED_INPUT_FIELDS = ("timestamp", "rule", "agent")
+REQUIRED_OCSF_FIELDS = ("activity_id", "category_uid", "class_uid", "severity_id", "time")
+
+# Wazuh rule level (0-16) to OCSF severity_id / severity
+SEVERITY_BY_LEVEL = (
+    [(1, "Informational")] * 4 + [(2, "Low")] * 3 + [(3, "Medium")] * 3 +
+    [(4, "High")] * 3 + [(5, "Critical")] * 3 + [(6, "Fatal")]
+)
+
+ACTION_IDS = {
+    "allow": 1, "allowed": 1, "accept": 1, "accepted": 1, "pass": 1, "permit": 1,
+    "deny": 2, "denied": 2, "block": 2, "blocked": 2, "drop": 2, "dropped": 2,
+    "reject": 2, "rejected": 2,
+}
+ACTION_NAMES = {0: "Unknown", 1: "Allowed", 2: "Denied", 99: "Other"}
+
+# Detection Finding activities; syscheck events map onto them
+FINDING_ACTIVITIES = {1: "Create", 2: "Update", 3: "Close"}
+SYSCHECK_ACTIVITIES = {"added": 1, "modified": 2, "deleted": 3}
+
+# Targets built by a dedicated stage rather than by the generic plan
+STAGE_OWNED_TARGETS = ("finding.attack",)
+
+BASE_EVENT = {
+    "activity_id": 1,
+    "category_uid": 2,
+    "category_name": "Findings",
+    "class_uid": 2004,
+    "class_name": "Detection Finding",
+    "count": 1,
+}
+
+PRODUCT = {
+    "name": "Wazuh",
+    "vendor_name": "Wazuh Inc",
+    "version": "4.8.0",
+    "uid": "wazuh-4.x",
+}
+
+OBSERVABLE_SOURCES = (
+    (("src_endpoint", "ip"), "src_endpoint.ip", "IP Address", 2),
+    (("dst_endpoint", "ip"), "dst_endpoint.ip", "IP Address", 2),
+    (("file", "path"), "file.path", "File Name", 7),
+    (("process", "cmd_line"), "process.cmd_line", "Command Line", 6),
+)
+
+
+def get_path(obj, path):
+    """Return the value at a tuple path in nested dicts, or None"""
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+        if obj is None:
+            return None
+    return obj
+
+
+def copy_tree(value):
+    """Copy nested dicts and lists; scalars are shared"""
+    if isinstance(value, dict):
+        return {key: copy_tree(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [copy_tree(child) for child in value]
+    return value
+
+
+def set_path(obj, path, value):
+    """Set a value at a tuple path, creating intermediate dicts"""
+    for key in path[:-1]:
+        child = obj.get(key)
+        if child is None:
+            child = obj[key] = {}
+        obj = child
+    obj[path[-1]] = value
+
+
+@lru_cache(maxsize=4096)
+def _epoch_seconds(prefix):
+    days = date(int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10])).toordinal() - EPOCH_ORDINAL
+    return (days * 86400 + int(prefix[11:13]) * 3600 + int(prefix[14:16]) * 60
+            + int(prefix[17:19]))
+
+
+def parse_timestamp(value):
+    """Convert a Wazuh ISO 8601 timestamp to epoch milliseconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        seconds = _epoch_seconds(value[:19])
+        rest = value[19:]
+        millis = 0
+        if rest.startswith("."):
+            digits = 1
+            while digits < len(rest) and rest[digits].isdigit():
+                digits += 1
+            millis = int((rest[1:digits] + "000")[:3])
+            rest = rest[digits:]
+        if rest and rest != "Z":
+            sign = -1 if rest[0] == "-" else 1
+            tz = rest[1:].replace(":", "")
+            seconds -= sign * (int(tz[0:2]) * 3600 + int(tz[2:4] or 0) * 60)
+        return seconds * 1000 + millis
+    except (ValueError, IndexError):
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return int(dt.timestamp() * 1000)
+
+
+def severity_for_level(level):
+    """Map a Wazuh rule level to (severity_id, severity)"""
+    level = int(level)
+    return SEVERITY_BY_LEVEL[min(max(level, 0), 16)]
+
+
+# -- converters: (event, target, value) -------------------------------------
+
+def convert_string(event, target, value):
+    set_path(event, target, value if isinstance(value, str) else str(value))
+
+
+def convert_integer(event, target, value):
+    try:
+        set_path(event, target, int(value))
+    except (TypeError, ValueError):
+        pass
+
+
+def convert_timestamp(event, target, value):
+    set_path(event, target, parse_timestamp(value))
+
+
+def convert_severity(event, target, value):
+    severity_id, severity = severity_for_level(value)
+    set_path(event, target, severity_id)
+    event["severity"] = severity
+
+
+def convert_action(event, target, value):
+    action_id = ACTION_IDS.get(str(value).lower(), 99)
+    set_path(event, target, action_id)
+    event["action"] = ACTION_NAMES[action_id]
+
+
+def convert_finding_activity(event, target, value):
+    activity_id = SYSCHECK_ACTIVITIES.get(str(value).lower())
+    if activity_id is not None:
+        set_path(event, target, activity_id)
+
+
+CONVERTERS_BY_FIELD = {
+    "rule.level": convert_severity,
+    "timestamp": convert_timestamp,
+    "data.action": convert_action,
+    "syscheck.event": convert_finding_activity,
+}
+
+CONVERTERS_BY_TYPE = {
+    "String": convert_string,
+    "Integer": convert_integer,
+    "Timestamp": convert_timestamp,
+}
+
+
+class MappingStep:
+    """One compiled row of the field mapping CSV"""
+
+    __slots__ = ("wazuh_field", "ocsf_field", "source", "target", "item", "converter")
+
+    def __init__(self, wazuh_field, ocsf_field, converter):
+        self.wazuh_field = wazuh_field
+        self.ocsf_field = ocsf_field
+        self.source = tuple(wazuh_field.split("."))
+        if "[]" in ocsf_field:
+            list_part, item_part = ocsf_field.split("[]", 1)
+            self.target = tuple(list_part.split("."))
+            self.item = tuple(item_part.lstrip(".").split("."))
+        else:
+            self.target = tuple(ocsf_field.split("."))
+            self.item = None
+        self.converter = converter
+
+    def apply(self, alert, event):
+        value = get_path(alert, self.source)
+        if value is None:
+            return
+        if self.item is None:
+            self.converter(event, self.target, value)
+            return
+        items = []
+        for element in (value if isinstance(value, list) else [value]):
+            item = {}
+            self.converter(item, self.item, element)
+            items.append(item)
+        set_path(event, self.target, items)
+
+
+class MappingPlan:
+    """Compiled, immutable form of wazuh_ocsf_field_mapping.csv"""
+
+    def __init__(self, steps, version):
+        self.steps = steps
+        self.version = version
+        # metadata.labels entry identifying the mapping an event was built with
+        self.label = "mapping_version:%s" % version
+
+    def apply(self, alert, event):
+        for step in self.steps:
+            step.apply(alert, event)
+
+
+def load_mapping(path=DEFAULT_MAPPING_PATH):
+    """Read the mapping CSV and return (rows, content version)"""
+    import csv
+    import hashlib
+    with open(path, "rb") as f:
+        content = f.read()
+    rows = list(csv.DictReader(content.decode("utf-8").splitlines()))
+    return rows, hashlib.sha1(content).hexdigest()[:12]
+
+
+def compile_mapping(rows, version=None):
+    """Compile mapping rows into a MappingPlan"""
+    steps = []
+    for row in rows:
+        wazuh_field = row["Wazuh Field"].strip()
+        ocsf_field = row["OCSF Field"].strip()
+        if ocsf_field.startswith(STAGE_OWNED_TARGETS):
+            continue
+        converter = CONVERTERS_BY_FIELD.get(wazuh_field)
+        if converter is None:
+            data_type = row["Data Type"].split("(")[0].strip()
+            converter = CONVERTERS_BY_TYPE.get(data_type, convert_string)
+        steps.append(MappingStep(wazuh_field, ocsf_field, converter))
+    return MappingPlan(steps, version)
+
+
+def plan_cache_path(mapping_path, cache_dir):
+    """Cache file for a mapping, keyed by its path, inode, size and mtime"""
+    st = os.stat(mapping_path)
+    return os.path.join(cache_dir, "ocsf-plan-v%d-%08x-%x-%x-%x.pickle" % (
+        PLAN_CACHE_FORMAT, zlib.crc32(os.path.abspath(mapping_path).encode()),
+        st.st_ino, st.st_size, st.st_mtime_ns))
+
+
+def load_plan(mapping_path=DEFAULT_MAPPING_PATH, cache_dir=None):
+    """Compile the mapping, reusing a pickled plan from cache_dir when current"""
+    if cache_dir is None:
+        rows, version = load_mapping(mapping_path)
+        return compile_mapping(rows, version)
+    import pickle
+    cache_path = plan_cache_path(mapping_path, cache_dir)
+    try:
+        with open(cache_path, "rb") as f:
+            plan = pickle.load(f)
+        if isinstance(plan, MappingPlan):
+            return plan
+    except (OSError, EOFError, AttributeError, ImportError, TypeError, pickle.UnpicklingError):
+        pass
+    rows, version = load_mapping(mapping_path)
+    plan = compile_mapping(rows, version)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = os.path.basename(cache_path).rsplit("-", 3)[0] + "-"
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(cache_dir, name))
+        # Unique per thread as well, for translators built in parallel threads
+        tmp_path = "%s.%d.%d.tmp" % (cache_path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            pickle.dump(plan, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return plan
+
+
+def build_attack(mitre):
+    """Build finding.attack[] from a Wazuh rule.mitre object"""
+    ids = mitre.get("id") or []
+    techniques = mitre.get("technique") or []
+    tactics = [{"name": t} for t in (mitre.get("tactic") or [])]
+    attack = []
+    for index, technique_id in enumerate(ids):
+        item = {"technique": {
+            "uid": technique_id,
+            "name": techniques[index] if index < len(techniques) else technique_id,
+        }}
+        if tactics:
+            item["tactics"] = tactics
+        attack.append(item)
+    if not attack and tactics:
+        attack.append({"tactics": tactics})
+    return attack
+
+
+def validate(event):
+    """Return the required OCSF fields missing from event"""
+    return [field for field in REQUIRED_OCSF_FIELDS if event.get(field) is None]
+
+
+def encode(event):
+    """Serialize an OCSF event to compact JSON bytes"""
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class OcsfTranslator:
+    """Translate decoded Wazuh alerts into OCSF Detection Findings"""
+
+    def __init__(self, mapping_path=DEFAULT_MAPPING_PATH, plan=None, cache_dir=None):
+        self.mapping_path = mapping_path
+        self.plan = plan if plan is not None else load_plan(mapping_path, cache_dir)
+        # Ordered translation stages, each called as stage(alert, event, raw)
+        self.stages = (
+            ("mapping", self.apply_mapping),
+            ("mitre", self.add_attack),
+            ("observables", self.add_observables),
+            ("finding", self.add_finding),
+            ("validation", self.check_required),
+        )
+
+    def add_stage(self, name, stage, before="validation"):
+        """Insert an extra stage(alert, event, raw) ahead of the named stage"""
+        names = [existing for existing, _ in self.stages]
+        index = names.index(before) if before in names else len(names)
+        self.stages = self.stages[:index] + ((name, stage),) + self.stages[index:]
+
+    def decode(self, line):
+        """Decode one alerts.json line; None if it is not a JSON object"""
+        try:
+            alert = json.loads(line)
+        except ValueError:
+            return None
+        return alert if isinstance(alert, dict) else None
+
+    def encode(self, event):
+        return encode(event)
+
+    def translate_line(self, line):
+        """Decode one alerts.json line and translate it; None if unusable"""
+        alert = self.decode(line)
+        if alert is None:
+            return None
+        return self.translate(alert, line)
+
+    def accepts(self, alert):
+        """Check the Wazuh fields the pipeline requires are present"""
+        for field in REQUIRED_INPUT_FIELDS:
+            if not alert.get(field):
+                return False
+        return True
+
+    def translate(self, alert, raw=None):
+        """Translate a decoded alert; returns None when required input is missing"""
+        if not self.accepts(alert):
+            return None
+        event = dict(BASE_EVENT)
+        for _, stage in self.stages:
+            stage(alert, event, raw)
+        return event
+
+    def apply_mapping(self, alert, event, raw=None):
+        self.plan.apply(alert, event)
+
+    def add_attack(self, alert, event, raw=None):
+        mitre = get_path(alert, ("rule", "mitre"))
+        if mitre:
+            attack = build_attack(mitre)
+            if attack:
+                event.setdefault("finding", {})["attack"] = attack
+
+    def add_observables(self, alert, event, raw=None):
+        observables = []
+        for path, name, type_name, type_id in OBSERVABLE_SOURCES:
+            value = get_path(event, path)
+            if value is not None:
+                observables.append({"name": name, "type": type_name,
+                                    "type_id": type_id, "value": value})
+        if observables:
+            event["observables"] = observables
+
+    def check_required(self, alert, event, raw=None):
+        errors = validate(event)
+        if errors:
+            event["ocsf_validation_errors"] = errors
+
+    def add_finding(self, alert, event, raw=None):
+        rule = alert["rule"]
+        time_ms = event.get("time")
+        activity_id = event["activity_id"]
+        activity_name = FINDING_ACTIVITIES.get(activity_id, "Other")
+        event["activity_name"] = activity_name
+        event["type_uid"] = event["class_uid"] * 100 + activity_id
+        event["type_name"] = "Detection Finding: " + activity_name
+
+        description = rule.get("description")
+        finding = event.setdefault("finding", {})
+        finding.setdefault("uid", str(alert.get("id", time_ms)))
+        finding["created_time"] = time_ms
+        finding["first_seen_time"] = time_ms
+        finding["last_seen_time"] = time_ms
+        finding["modified_time"] = time_ms
+        finding["title"] = description or "Wazuh Security Alert"
+        finding["desc"] = description or "Security event detected by Wazuh"
+        finding["product_uid"] = get_path(alert, ("manager", "name")) or "wazuh-manager"
+        finding["types"] = ["Security Control"]
+        finding.setdefault("related_events", [{"uid": alert.get("id", "unknown")}])
+
+        metadata = event.setdefault("metadata", {})
+        metadata["event_code"] = str(rule.get("id", ""))
+        metadata["version"] = OCSF_VERSION
+        metadata["product"] = dict(PRODUCT, **metadata.get("product", {}))
+        metadata["profiles"] = ["security_control"]
+        metadata["labels"] = [self.plan.label]
+
+        event.setdefault("message", description or "")
+        if "raw_data" not in event:
+            if raw is None:
+                raw = json.dumps(alert, separators=(",", ":"))
+            elif isinstance(raw, bytes):
+                raw = raw.decode("utf-8", "replace")
+            event["raw_data"] = raw
+
+        unmapped = {}
+        if rule.get("groups"):
+            unmapped["wazuh_rule_groups"] = rule["groups"]
+        if alert.get("location"):
+            unmapped["wazuh_location"] = alert["location"]
+        decoder = get_path(alert, ("decoder", "name"))
+        if decoder:
+            unmapped["wazuh_decoder"] = decoder
+        cluster = get_path(alert, ("cluster", "name"))
+        if cluster:
+            unmapped["wazuh_cluster"] = cluster
+        if unmapped:
+            event["unmapped"] = unmapped
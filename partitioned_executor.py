@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Key-partitioned parallel executor that keeps per-key order
+
+Items are routed by a stable hash of their key (agent.id by default) to one
+of a fixed number of slots, and each slot is owned by exactly one worker.
+Every worker has its own bounded input queue and processes its batches in
+order, and all results come back through one result queue drained by one
+collector thread, so results for a key are emitted in submission order
+without any lock shared between workers. Stateful per-key work such as
+windowed aggregation can therefore live inside the workers.
+
+Workers are processes (spawn) or threads. In process mode each worker's
+inbox is a shared-memory ring (shm_ring.ShmRing) where the CPU supports
+it, so batches of raw lines cross without pickling; items must then be
+bytes. ring_capacity=None uses multiprocessing queues for other items.
+
+resize() rebalances by moving as few slots as possible to the new worker
+set: the workers that lose slots are drained first (their queued batches
+finish and their drain() results are emitted), and only then are moved
+keys routed to their new owner, so a key is never processed by two
+workers at once.
+
+A worker is built in its own process or thread by calling
+worker_factory(); it is called with a list of items and may define drain()
+for state to flush on rebalance and close, and expire() for time-based
+state. Every barrier() runs expire() in each worker it reaches, including
+workers that had no batch since the last one, and emits the result. A
+worker holding items across barriers may also define mark(token): it is
+called at each barrier with that barrier's token and returns the token of
+the last barrier before the oldest item it still holds, or None; held()
+is the lowest such token over all workers. TranslationWorker is the
+pipeline's worker: a translator plus an optional per-partition aggregator.
+"""
+import queue
+import re
+import threading
+import zlib
+
+from metrics_exporter import format_sample
+
+DEFAULT_SLOTS = 256
+DEFAULT_RING_CAPACITY = 8 * 1024 * 1024
+BATCH = 0
+MARKER = 1
+STOP = 2
+# agent.id straight from the raw alerts.json line, without decoding it
+AGENT_ID = re.compile(rb'"agent":\s*\{[^{}]*?"id":\s*"([^"]*)"')
+
+
+def agent_id_key(line):
+    match = AGENT_ID.search(line)
+    return match.group(1) if match is not None else b""
+
+
+def field_key(path):
+    """Key function reading a dotted field path from a raw alert line"""
+    if path == "agent.id":
+        return agent_id_key
+    import json
+    from ocsf_translator import get_path
+    parts = tuple(path.split("."))
+
+    def key(line):
+        try:
+            value = get_path(json.loads(line), parts)
+        except ValueError:
+            return b""
+        return str(value).encode() if value is not None else b""
+    return key
+
+
+def slot_for(key, slots=DEFAULT_SLOTS):
+    """Stable across processes and runs, unlike hash()"""
+    if isinstance(key, str):
+        key = key.encode()
+    return zlib.crc32(key) % slots
+
+
+def rebalance(table, workers):
+    """Reassign slots to worker ids 0..workers-1, moving as few as possible"""
+    slots = len(table)
+    quota = [slots // workers + (1 if worker < slots % workers else 0)
+             for worker in range(workers)]
+    owned = [0] * workers
+    table = list(table)
+    free = []
+    for slot, worker in enumerate(table):
+        if worker < workers and owned[worker] < quota[worker]:
+            owned[worker] += 1
+        else:
+            free.append(slot)
+    for worker in range(workers):
+        while owned[worker] < quota[worker]:
+            table[free.pop()] = worker
+            owned[worker] += 1
+    return table
+
+
+class TranslationWorker:
+    """Translate alert lines; returns (encoded events, error records, filtered)
+
+    Error records are encoded events that failed validation, or the raw line
+    when translate() raised on it.
+    """
+
+    def __init__(self, mapping_path=None, cache_dir=None, aggregate_window=0,
+                 fallback=False, geoip=None):
+        from ocsf_translator import DEFAULT_MAPPING_PATH, TRANSLATION_ERRORS, OcsfTranslator
+        self.translation_errors = TRANSLATION_ERRORS
+        self.translator = OcsfTranslator(mapping_path or DEFAULT_MAPPING_PATH,
+                                         cache_dir=cache_dir)
+        if fallback:
+            from fallback_parser import FallbackParser
+            self.translator.add_stage("fallback", FallbackParser(), before="observables")
+        if geoip:
+            from geoip_enrichment import GeoIpEnricher
+            self.translator.add_stage("geoip", GeoIpEnricher.load(geoip))
+        self.aggregator = None
+        if aggregate_window:
+            from alert_aggregator import AlertAggregator
+            self.aggregator = AlertAggregator(aggregate_window)
+        # Token of the last barrier; aggregates record it as their position
+        self.token = 0
+
+    def __call__(self, lines):
+        translator = self.translator
+        aggregator = self.aggregator
+        encode = translator.encode
+        output = []
+        errors = []
+        filtered = 0
+        for line in lines:
+            alert = translator.decode(line)
+            try:
+                event = translator.translate(alert, line) if alert is not None else None
+            except self.translation_errors:
+                filtered += 1
+                errors.append(line)
+                continue
+            if event is None:
+                filtered += 1
+            elif "ocsf_validation_errors" in event:
+                filtered += 1
+                errors.append(encode(event))
+            elif aggregator is None:
+                output.append(encode(event))
+            else:
+                output.extend(encode(ready)
+                              for ready in aggregator.add(alert, event, self.token))
+        if aggregator is not None:
+            output.extend(encode(ready) for ready in aggregator.expire())
+        return output, errors, filtered
+
+    def expire(self):
+        """Aggregates whose window has elapsed, on every barrier"""
+        if self.aggregator is None:
+            return None
+        events = self.aggregator.expire()
+        if not events:
+            return None
+        encode = self.translator.encode
+        return [encode(event) for event in events], [], 0
+
+    def drain(self):
+        if self.aggregator is None:
+            return None
+        encode = self.translator.encode
+        return [encode(event) for event in self.aggregator.drain()], [], 0
+
+    def mark(self, token):
+        """Record a barrier; returns the barrier the oldest held alert followed"""
+        self.token = token
+        return self.aggregator.oldest() if self.aggregator is not None else None
+
+
+def _worker_loop(index, worker_factory, inbox, results):
+    worker = worker_factory()
+    drain = getattr(worker, "drain", None)
+    expire = getattr(worker, "expire", None)
+    mark = getattr(worker, "mark", None)
+    while True:
+        kind, payload = inbox.get()
+        if kind == BATCH:
+            results.put((index, BATCH, worker(payload)))
+        elif kind == MARKER:
+            token, flush = payload
+            if flush and drain is not None:
+                drained = drain()
+            else:
+                drained = expire() if expire is not None else None
+            held = mark(token) if mark is not None else None
+            results.put((index, MARKER, (token, drained, held)))
+        else:
+            return
+
+
+class _RingInbox:
+    """Worker inbox over a single-producer ShmRing, one frame per message"""
+
+    def __init__(self, capacity):
+        from shm_ring import ShmRing
+        self.ring = ShmRing(capacity)
+
+    def put(self, message):
+        kind, payload = message
+        if kind == BATCH:
+            self._put_lines(payload)
+        elif kind == MARKER:
+            token, flush = payload
+            self.ring.put_many((b"M", b"%d" % token, b"1" if flush else b"0"))
+        else:
+            self.ring.put(b"S")
+
+    def _put_lines(self, lines):
+        # put_many splits a frame that does not fit, which would orphan the header
+        size = 4 * (len(lines) + 3) + 1 + sum(map(len, lines))
+        if size > self.ring.capacity // 2 and len(lines) > 1:
+            half = len(lines) // 2
+            self._put_lines(lines[:half])
+            self._put_lines(lines[half:])
+        else:
+            self.ring.put_many([b"B"] + lines)
+
+    def get(self):
+        records = self.ring.get_frame(timeout=None)
+        kind = records[0]
+        if kind == b"B":
+            return BATCH, records[1:]
+        if kind == b"M":
+            return MARKER, (int(records[1]), records[2] == b"1")
+        return STOP, None
+
+    def close(self):
+        self.ring.close()
+
+
+class _ThreadContext:
+    """The parts of a multiprocessing context the executor uses, for threads"""
+
+    Queue = queue.Queue
+
+    @staticmethod
+    def Process(target, args, daemon, name):
+        return threading.Thread(target=target, args=args, daemon=daemon, name=name)
+
+
+class PartitionedExecutor:
+    """Run worker(batch) in parallel while keeping per-key order"""
+
+    def __init__(self, worker_factory, emit, workers=4, slots=DEFAULT_SLOTS,
+                 batch_size=256, max_pending=8, mode="process",
+                 ring_capacity=DEFAULT_RING_CAPACITY):
+        if workers > slots:
+            raise ValueError("more workers than slots")
+        self.worker_factory = worker_factory
+        self.emit = emit
+        self.slots = slots
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.ring_capacity = None
+        if mode == "process":
+            import multiprocessing
+            from shm_ring import SUPPORTED
+            self._context = multiprocessing.get_context("spawn")
+            self.ring_capacity = ring_capacity if SUPPORTED else None
+        elif mode == "thread":
+            self._context = _ThreadContext
+        else:
+            raise ValueError("mode must be 'process' or 'thread'")
+        self.table = rebalance([0] * slots, workers)
+        self.rebalances = 0
+        self.submitted = []
+        self._results = self._context.Queue()
+        self._inboxes = []
+        self._workers = []
+        self._pending = []
+        self._token = 0
+        self._acked = {}
+        self._held = {}
+        self._acks = threading.Condition()
+        self._start_workers(workers)
+        self._collector = threading.Thread(target=self._collect, daemon=True,
+                                           name="partition-collector")
+        self._collector.start()
+
+    @property
+    def workers(self):
+        return len(self._workers)
+
+    def _start_workers(self, count):
+        while len(self._workers) < count:
+            index = len(self._workers)
+            if self.ring_capacity:
+                inbox = _RingInbox(self.ring_capacity)
+            else:
+                inbox = self._context.Queue(self.max_pending)
+            process = self._context.Process(
+                target=_worker_loop, args=(index, self.worker_factory, inbox, self._results),
+                daemon=True, name="partition-%d" % index)
+            process.start()
+            self._inboxes.append(inbox)
+            self._workers.append(process)
+            self._pending.append([])
+            self.submitted.append(0)
+
+    def _collect(self):
+        while True:
+            index, kind, payload = self._results.get()
+            if kind == BATCH:
+                self.emit(index, payload)
+            elif kind == MARKER:
+                token, drained, held = payload
+                if drained is not None:
+                    self.emit(index, drained)
+                with self._acks:
+                    self._acked[index] = token
+                    self._held[index] = held
+                    self._acks.notify_all()
+            else:
+                return
+
+    def submit(self, key, item):
+        """Queue an item; call from a single routing thread"""
+        worker = self.table[slot_for(key, self.slots)]
+        pending = self._pending[worker]
+        pending.append(item)
+        self.submitted[worker] += 1
+        if len(pending) >= self.batch_size:
+            self._send(worker)
+
+    def _send(self, worker):
+        pending = self._pending[worker]
+        if pending:
+            self._pending[worker] = []
+            self._inboxes[worker].put((BATCH, pending))
+
+    def barrier(self, workers=None, drain=False):
+        """Wait until everything submitted to these workers has been emitted
+
+        Returns the barrier's token.
+        """
+        workers = range(self.workers) if workers is None else workers
+        self._token += 1
+        token = self._token
+        for worker in workers:
+            self._send(worker)
+            self._inboxes[worker].put((MARKER, (token, drain)))
+        done = lambda: all(self._acked.get(worker) == token for worker in workers)
+        with self._acks:
+            while not self._acks.wait_for(done, timeout=1.0):
+                dead = [worker for worker in workers if not self._workers[worker].is_alive()]
+                if dead:
+                    raise RuntimeError("partition worker %d exited" % dead[0])
+        return token
+
+    def held(self):
+        """Lowest token any worker's mark() reported at its last barrier, or None"""
+        with self._acks:
+            tokens = [token for token in self._held.values() if token is not None]
+        return min(tokens) if tokens else None
+
+    def resize(self, workers):
+        """Rebalance slots onto a new number of workers"""
+        if workers > self.slots or workers < 1:
+            raise ValueError("workers must be between 1 and %d" % self.slots)
+        table = rebalance(self.table, workers)
+        losing = sorted({old for old, new in zip(self.table, table) if old != new})
+        # Moved keys must finish on their old worker before the new one sees them
+        self.barrier(losing, drain=True)
+        self._start_workers(workers)
+        self.table = table
+        while self.workers > workers:
+            self._stop_worker(self.workers - 1)
+        self.rebalances += 1
+
+    def _stop_worker(self, worker):
+        self._inboxes[worker].put((STOP, None))
+        self._workers[worker].join()
+        if isinstance(self._inboxes[worker], _RingInbox):
+            self._inboxes[worker].close()
+        del self._workers[worker], self._inboxes[worker], self._pending[worker]
+        del self.submitted[worker]
+        with self._acks:
+            self._held.pop(worker, None)
+
+    def close(self):
+        self.barrier(drain=True)
+        while self.workers:
+            self._stop_worker(self.workers - 1)
+        self._results.put((-1, STOP, None))
+        self._collector.join()
+
+    def render(self):
+        lines = ["# HELP ocsf_partition_workers Partition workers running\n",
+                 "# TYPE ocsf_partition_workers gauge\n",
+                 format_sample("ocsf_partition_workers", self.workers),
+                 "# HELP ocsf_partition_rebalances_total Slot table rebalances\n",
+                 "# TYPE ocsf_partition_rebalances_total counter\n",
+                 format_sample("ocsf_partition_rebalances_total", self.rebalances),
+                 "# HELP ocsf_partition_items_total Items routed to each partition worker\n",
+                 "# TYPE ocsf_partition_items_total counter\n"]
+        for worker, count in enumerate(self.submitted):
+            lines.append(format_sample("ocsf_partition_items_total", count,
+                                       {"partition": str(worker)}))
+        return lines
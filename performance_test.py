@@ -4,7 +4,6 @@ Performance testing script for Wazuh-OCSF pipeline
 """
 import time
 import json
-import requests
 import threading
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor
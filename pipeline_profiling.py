@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and profiling hooks for the OCSF translator
+
+ProfiledTranslator times decode, each translation stage and encode with the
+monotonic perf counter and aggregates the samples into fixed-bucket
+histograms, alongside event counters per class_uid and rule.id. A cProfile
+or sampling-profiler capture can be toggled at runtime with a signal.
+"""
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter
+from time import perf_counter
+
+from metrics_exporter import format_sample
+from ocsf_translator import BASE_EVENT, OcsfTranslator
+
+# Bucket upper bounds in seconds, 1 µs to 1 s
+DEFAULT_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 0.1, 1.0,
+)
+OTHER_RULES = "other"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(format_sample(name + "_bucket", cumulative, dict(labels, le=repr(bound))))
+        lines.append(format_sample(name + "_bucket", self.count, dict(labels, le="+Inf")))
+        lines.append(format_sample(name + "_sum", self.sum, labels))
+        lines.append(format_sample(name + "_count", self.count, labels))
+        return lines
+
+
+class StageProfiler:
+    """Stage histograms plus per-class and per-rule event counters"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_rule_ids=5000):
+        self.buckets = buckets
+        self.max_rule_ids = max_rule_ids
+        self.stages = {}
+        self.class_counts = Counter()
+        self.rule_counts = Counter()
+
+    def histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def count_event(self, event):
+        self.class_counts[event["class_uid"]] += 1
+        rule_id = event.get("metadata", {}).get("event_code") or OTHER_RULES
+        if rule_id not in self.rule_counts and len(self.rule_counts) >= self.max_rule_ids:
+            rule_id = OTHER_RULES
+        self.rule_counts[rule_id] += 1
+
+    def summary(self):
+        """Mean microseconds per call for each stage"""
+        return {stage: (h.sum / h.count * 1e6 if h.count else 0.0)
+                for stage, h in self.stages.items()}
+
+    def render(self):
+        lines = ["# HELP ocsf_translator_stage_duration_seconds Time spent per translator stage\n",
+                 "# TYPE ocsf_translator_stage_duration_seconds histogram\n"]
+        for stage, histogram in sorted(self.stages.items()):
+            lines.extend(histogram.render("ocsf_translator_stage_duration_seconds",
+                                          {"stage": stage}))
+        lines.append("# HELP ocsf_translator_events_total Translated events per OCSF class\n")
+        lines.append("# TYPE ocsf_translator_events_total counter\n")
+        for class_uid, count in sorted(self.class_counts.items()):
+            lines.append(format_sample("ocsf_translator_events_total", count,
+                                       {"class_uid": class_uid}))
+        lines.append("# HELP ocsf_translator_rule_events_total Translated events per Wazuh rule\n")
+        lines.append("# TYPE ocsf_translator_rule_events_total counter\n")
+        for rule_id, count in sorted(self.rule_counts.items()):
+            lines.append(format_sample("ocsf_translator_rule_events_total", count,
+                                       {"rule_id": rule_id}))
+        return lines
+
+
+class ProfiledTranslator(OcsfTranslator):
+    """OcsfTranslator that times every stage into a StageProfiler"""
+
+    def __init__(self, *args, **kwargs):
+        self.profiler = kwargs.pop("profiler", None) or StageProfiler()
+        super().__init__(*args, **kwargs)
+
+    def decode(self, line):
+        start = perf_counter()
+        alert = super().decode(line)
+        self.profiler.observe("decode", perf_counter() - start)
+        return alert
+
+    def translate(self, alert, raw=None):
+        if not self.accepts(alert):
+            return None
+        observe = self.profiler.observe
+        event = dict(BASE_EVENT)
+        for name, stage in self.stages:
+            start = perf_counter()
+            stage(alert, event, raw)
+            observe(name, perf_counter() - start)
+        self.profiler.count_event(event)
+        return event
+
+    def encode(self, event):
+        start = perf_counter()
+        data = super().encode(event)
+        self.profiler.observe("encode", perf_counter() - start)
+        return data
+
+
+class ProfileCapture:
+    """Start/stop a cProfile or sampling capture, e.g. from a signal
+
+    Sampling walks every thread's stack, so it covers the tailer, the
+    translator thread and the sink workers; stacks are rooted at the thread
+    name in the folded output. cProfile only sees the thread that starts it
+    (the main thread when toggled by a signal) before Python 3.12.
+    """
+
+    def __init__(self, output_dir, mode="cprofile", sample_interval=0.005):
+        if mode not in ("cprofile", "sampling"):
+            raise ValueError("mode must be 'cprofile' or 'sampling'")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.active = False
+        self._profile = None
+        self._sampler = None
+        self._stacks = None
+
+    def install(self, signum=signal.SIGUSR2):
+        """Toggle capture whenever signum is received"""
+        signal.signal(signum, lambda *_: self.toggle())
+
+    def toggle(self):
+        if self.active:
+            return self.stop()
+        self.start()
+        return None
+
+    def start(self):
+        if self.active:
+            return
+        self.active = True
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stacks = Counter()
+            self._sampler = threading.Thread(target=self._sample, daemon=True,
+                                             name="profile-sampler")
+            self._sampler.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while self.active:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = ";".join(["thread:%s" % names.get(thread_id, thread_id)]
+                                 + ["%s:%s" % (f.name, f.lineno)
+                                    for f in traceback.extract_stack(frame)])
+                self._stacks[stack] += 1
+            time.sleep(self.sample_interval)
+
+    def stop(self):
+        """Stop capturing and write the result; returns the output path"""
+        if not self.active:
+            return None
+        self.active = False
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.mode == "cprofile":
+            self._profile.disable()
+            path = os.path.join(self.output_dir, "ocsf-translator-%s.pstats" % stamp)
+            self._profile.dump_stats(path)
+            self._profile = None
+        else:
+            self._sampler.join()
+            path = os.path.join(self.output_dir, "ocsf-translator-%s.folded" % stamp)
+            with open(path, "w") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write("%s %d\n" % (stack, count))
+            self._sampler = None
+        return path
@@ -1,5 +1,5 @@
+import csv
 import json
-import pandas as pd
 
 # Create a comprehensive Wazuh to OCSF field mapping table
 wazuh_ocsf_mapping = {
@@ -40,12 +40,20 @@ wazuh_ocsf_mapping = {
     ]
 }
 
-# Create DataFrame and save to CSV
-mapping_df = pd.DataFrame(wazuh_ocsf_mapping)
-mapping_df.to_csv('wazuh_ocsf_field_mapping.csv', index=False)
+# Save to CSV (the csv module writes the same file pandas did, without
+# paying pandas' import time)
+columns = list(wazuh_ocsf_mapping)
+rows = list(zip(*wazuh_ocsf_mapping.values()))
+with open('wazuh_ocsf_field_mapping.csv', 'w', newline='') as f:
+    writer = csv.writer(f, lineterminator='\n')
+    writer.writerow(columns)
+    writer.writerows(rows)
 
+widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
 print("Wazuh to OCSF Field Mapping Table:")
 print("=" * 60)
-print(mapping_df.to_string(index=False))
-print(f"\nTotal mappings: {len(mapping_df)}")
+print(" ".join(column.rjust(width) for column, width in zip(columns, widths)))
+for row in rows:
+    print(" ".join(value.rjust(width) for value, width in zip(row, widths)))
+print(f"\nTotal mappings: {len(rows)}")
 print(f"CSV file saved: wazuh_ocsf_field_mapping.csv")
\ No newline at end of file
@@ -312,13 +312,13 @@ output {
     http {
       url => "${EXTERNAL_SIEM_URL}"
       http_method => "post"
+      # One JSON-array request per batch, gzip-compressed, instead of one
+      # request per event; ocsf_pipeline.py --siem-url is the batched Python path
+      format => "json_batch"
+      http_compression => true
       headers => {
-        "Content-Type" => "application/json"
         "Authorization" => "Bearer ${EXTERNAL_SIEM_TOKEN}"
       }
-      mapping => {
-        "event" => "%{[@metadata][ocsf_event]}"
-      }
       retry_failed => true
       retries => 3
       retry_non_idempotent => true
@@ -122,6 +122,34 @@ services:
         max-size: "100m"
         max-file: "5"
 
+  # Python OCSF pipeline: tails alerts.json and serves /metrics for Prometheus
+  wazuh-ocsf-translator:
+    image: python:3.11-slim
+    container_name: wazuh-ocsf-translator
+    restart: unless-stopped
+    working_dir: /app
+    command:
+      - python
+      - ocsf_pipeline.py
+      - --alerts=/var/ossec/logs/alerts/alerts.json
+      - --output=/opt/ocsf/output/ocsf-events.json
+      - --checkpoint=/opt/ocsf/alerts.checkpoint
+      - --queue-dir=/opt/ocsf/queue
+      - --metrics-port=9464
+    environment:
+      # --siem-url defaults to EXTERNAL_SIEM_URL when enabled
+      - EXTERNAL_SIEM_ENABLED=${EXTERNAL_SIEM_ENABLED:-false}
+      - EXTERNAL_SIEM_URL=${EXTERNAL_SIEM_URL:-}
+      - EXTERNAL_SIEM_TOKEN=${EXTERNAL_SIEM_TOKEN:-}
+    ports:
+      - "9464:9464"  # Prometheus /metrics
+    volumes:
+      - ./:/app:ro
+      - /var/ossec/logs/alerts:/var/ossec/logs/alerts:ro
+      - ocsf_data:/opt/ocsf
+    networks:
+      - wazuh-ocsf-network
+
   # Mock Wazuh Indexer for testing
   wazuh-indexer:
     image: opensearchproject/opensearch:2.11.0
@@ -221,6 +249,7 @@ services:
 volumes:
   logstash_data:
   logstash_logs:
+  ocsf_data:
   wazuh_indexer_data:
   opensearch_data:
   prometheus_data:
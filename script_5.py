@@ -183,6 +183,16 @@ jobs:
         run: |
           python tests/test_performance.py
       
+      - name: Translator benchmark regression gate
+        # Base and head are measured on this runner, in alternating rounds
+        if: github.event_name != 'schedule'
+        run: |
+          git fetch --no-tags --depth=1 origin "$BASE_SHA"
+          git worktree add --detach ../benchmark-base "$BASE_SHA"
+          python benchmark_suite.py --against ../benchmark-base --rounds 5 --max-regression 15 --output benchmark-results.json
+        env:
+          BASE_SHA: ${{ github.event.pull_request.base.sha || github.event.before }}
+      
       - name: Collect metrics
         run: |
           python tests/collect_metrics.py
@@ -245,7 +255,6 @@ Unit tests for Wazuh to OCSF field mappings
 """
 import json
 import pytest
-from jsonschema import validate, ValidationError
 
 class TestFieldMappings:
     
@@ -16,11 +16,14 @@ alerting:
           - alertmanager:9093
 
 scrape_configs:
-  # Logstash metrics
+  # Pipeline metrics in Prometheus text format from the Python pipeline's
+  # /metrics endpoint (Logstash's /_node/stats is JSON and cannot be scraped).
+  # The job keeps its name because alert_rules.yml selects up{job="logstash"};
+  # translator stage timings are served here too when --profile-stages is on.
   - job_name: 'logstash'
     static_configs:
-      - targets: ['wazuh-ocsf-logstash:9600']
-    metrics_path: /_node/stats
+      - targets: ['wazuh-ocsf-translator:9464']
+    metrics_path: /metrics
     scrape_interval: 10s
     
   # OpenSearch metrics
@@ -104,7 +107,6 @@ Performance testing script for Wazuh-OCSF pipeline
 """
 import time
 import json
-import requests
 import threading
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Memoizing caches that stay fast when many threads translate at once
+
+functools.lru_cache is the right cache under the GIL. On free-threaded
+CPython (3.13t) it is still correct, but every call, hit or miss, takes
+the cache's one lock to reorder its linked list, so translator threads
+serialize on each timestamp, GeoIP and IOC lookup. ShardedCache splits the
+keys over independent dicts. A hit is a plain dict read with no lock;
+free-threaded dicts are safe to read while another thread writes. A miss
+computes the value outside any lock and inserts it under the shard's lock.
+Each shard evicts in insertion order (FIFO, not LRU), because recording
+recency would turn every hit into a write. Hit/miss counts are advisory
+under free threading: racing increments can be lost.
+
+lru_cache(maxsize) returns functools.lru_cache while the GIL is enabled
+and a ShardedCache otherwise; both expose cache_info() and cache_clear().
+"""
+import functools
+import sys
+import threading
+from collections import namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+DEFAULT_SHARDS = 64
+_MISSING = object()
+
+
+def gil_enabled():
+    """False only on a free-threaded build running with the GIL disabled"""
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_enabled is None else is_enabled()
+
+
+class ShardedCache:
+    """Thread-safe memoizing wrapper for a one-argument function"""
+
+    def __init__(self, function, maxsize, shards=DEFAULT_SHARDS):
+        self.function = function
+        self.maxsize = maxsize
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._shard_size = max(maxsize // shards, 1)
+        self._hits = [0] * shards
+        self._misses = [0] * shards
+        functools.update_wrapper(self, function)
+
+    def __call__(self, key):
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        value = shard.get(key, _MISSING)
+        if value is not _MISSING:
+            self._hits[index] += 1
+            return value
+        value = self.function(key)
+        with self._locks[index]:
+            self._misses[index] += 1
+            if key not in shard:
+                if len(shard) >= self._shard_size:
+                    del shard[next(iter(shard))]
+                shard[key] = value
+        return value
+
+    def cache_info(self):
+        return CacheInfo(sum(self._hits), sum(self._misses), self.maxsize,
+                         sum(len(shard) for shard in self._shards))
+
+    def cache_clear(self):
+        for index, lock in enumerate(self._locks):
+            with lock:
+                self._shards[index] = {}
+                self._hits[index] = self._misses[index] = 0
+
+
+def lru_cache(maxsize=128):
+    """functools.lru_cache under the GIL, ShardedCache without it"""
+    if gil_enabled():
+        return functools.lru_cache(maxsize)
+    return lambda function: ShardedCache(function, maxsize)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Shared-memory ring buffer for passing byte records between processes
+
+multiprocessing.Queue pickles every item, writes it down a pipe from a
+feeder thread and unpickles it on the other side, which for alert lines
+costs more than translating them. ShmRing keeps length-prefixed records in
+a multiprocessing.shared_memory block instead: the producer copies bytes in
+and publishes a new head offset, the consumer copies them out and publishes
+a new tail offset, and only those two offsets are shared state.
+
+Layout: head (uint64) and tail (uint64) on separate cache lines, then a
+power-of-two data area. Each put_many() writes one frame: its size, the
+record count, the record lengths, then the records back to back, so a batch
+costs one copy in and one copy out. Offsets grow monotonically and are
+reduced modulo the capacity; a frame that would straddle the end is
+preceded by a wrap marker (or, with under four bytes left, an implicit
+wrap) and written at the start. One process advances tail; producers
+advance head, serialized by a multiprocessing lock when the ring is
+multi-producer (MPSC), so the consumer never takes a lock. Waiting is
+spin-then-sleep polling.
+
+get_frame() removes exactly one frame; get() hands out its records one at
+a time, keeping the rest of the frame on the consumer side, and
+get_many() removes every frame written so far.
+
+Head is published only after the record bytes are written. That ordering
+holds on x86-64 (stores are not reordered with other stores); CPython
+offers no fence, so weakly ordered CPUs are not supported (SUPPORTED is
+False there). PartitionedExecutor uses a ring per worker as its process
+mode inbox where it is supported.
+
+benchmark() compares the ring with multiprocessing.Queue, per record and
+per batch:
+
+    python shm_ring.py --records 200000
+"""
+import argparse
+import os
+import platform
+import struct
+import sys
+from collections import deque
+from multiprocessing import shared_memory
+from time import monotonic, perf_counter, sleep
+
+HEAD = 0
+TAIL = 64
+DATA = 128
+OFFSET = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+WRAP = 0xFFFFFFFF
+DEFAULT_CAPACITY = 16 * 1024 * 1024
+# Busy-polling only pays when the other side has its own CPU
+SPINS = 200 if (os.cpu_count() or 1) > 1 else 0
+SUPPORTED = platform.machine().lower() in ("x86_64", "amd64", "i386", "i686")
+
+
+def _wait(ready, timeout):
+    """Poll ready() with backoff; False when timeout (seconds) expires"""
+    for _ in range(SPINS):
+        if ready():
+            return True
+    deadline = None if timeout is None else monotonic() + timeout
+    delay = 0.00005
+    while not ready():
+        if deadline is not None and monotonic() >= deadline:
+            return False
+        sleep(delay)
+        delay = min(delay * 2, 0.001)
+    return True
+
+
+class ShmRing:
+    """SPSC or MPSC ring of byte records in shared memory"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None, lock=None, create=True):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.lock = lock
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=DATA + capacity)
+        self.name = self.shm.name
+        self._owner = create
+        # Records of a frame get() has taken but not yet returned
+        self._unread = deque()
+        if create:
+            self.shm.buf[:DATA] = bytes(DATA)
+
+    @classmethod
+    def multi_producer(cls, capacity=DEFAULT_CAPACITY, context=None):
+        import multiprocessing
+        return cls(capacity, lock=(context or multiprocessing).Lock())
+
+    def __reduce__(self):
+        # Child processes attach by name; nothing else is shared
+        return _attach, (self.name, self.capacity, self.lock)
+
+    def _load(self, field):
+        return OFFSET.unpack_from(self.shm.buf, field)[0]
+
+    def __len__(self):
+        """Bytes in use, including length prefixes and wrap padding; excludes get()'s leftovers"""
+        return self._load(HEAD) - self._load(TAIL)
+
+    def put(self, record, timeout=None):
+        return self.put_many((record,), timeout)
+
+    def put_many(self, records, timeout=None):
+        """Append records as one frame; False if no room before the timeout"""
+        records = list(records)
+        if not records:
+            return True
+        count = len(records)
+        lengths = [len(record) for record in records]
+        size = LENGTH.size * (count + 2) + sum(lengths)
+        if size > self.capacity:
+            if count == 1:
+                raise ValueError("record of %d bytes does not fit the ring" % lengths[0])
+            half = count // 2
+            return (self.put_many(records[:half], timeout)
+                    and self.put_many(records[half:], timeout))
+        frame = struct.pack("<%dI" % (count + 2), size - LENGTH.size, count, *lengths)
+        if self.lock is None:
+            return self._put_frame(frame, records, size, timeout)
+        with self.lock:
+            return self._put_frame(frame, records, size, timeout)
+
+    def _put_frame(self, frame, records, size, timeout):
+        buf = self.shm.buf
+        capacity = self.capacity
+        head = self._load(HEAD)
+        offset = head & (capacity - 1)
+        skip = capacity - offset if capacity - offset < size else 0
+        needed = head + skip + size - capacity
+        if self._load(TAIL) < needed and not _wait(lambda: self._load(TAIL) >= needed, timeout):
+            return False
+        if skip:
+            if skip >= LENGTH.size:
+                LENGTH.pack_into(buf, DATA + offset, WRAP)
+            head += skip
+            offset = 0
+        start = DATA + offset
+        buf[start:start + size] = frame + b"".join(records)
+        OFFSET.pack_into(buf, HEAD, head + size)
+        return True
+
+    def get(self, timeout=None):
+        """Next record, or None on timeout"""
+        if not self._unread:
+            self._unread.extend(self.get_frame(timeout))
+            if not self._unread:
+                return None
+        return self._unread.popleft()
+
+    def get_frame(self, timeout=None):
+        """Remove and return the records of the oldest frame; [] on timeout"""
+        return self._take(timeout, frames=1)
+
+    def get_many(self, timeout=None):
+        """Remove and return every record written so far; [] on timeout"""
+        if self._unread:
+            records = list(self._unread)
+            self._unread.clear()
+            return records + self._take(0)
+        return self._take(timeout)
+
+    def _take(self, timeout, frames=None):
+        """Decode up to frames frames (all when None) and advance tail past them"""
+        tail = self._load(TAIL)
+        if not _wait(lambda: self._load(HEAD) != tail, timeout):
+            return []
+        buf = self.shm.buf
+        capacity = self.capacity
+        mask = capacity - 1
+        head = self._load(HEAD)
+        records = []
+        while tail < head and frames != 0:
+            offset = tail & mask
+            if capacity - offset < LENGTH.size:
+                tail += capacity - offset
+                continue
+            size = LENGTH.unpack_from(buf, DATA + offset)[0]
+            if size == WRAP:
+                tail += capacity - offset
+                continue
+            start = DATA + offset + LENGTH.size
+            count = LENGTH.unpack_from(buf, start)[0]
+            lengths = struct.unpack_from("<%dI" % count, buf, start + LENGTH.size)
+            body = bytes(buf[start + LENGTH.size * (count + 1):start + size])
+            position = 0
+            for length in lengths:
+                records.append(body[position:position + length])
+                position += length
+            tail += LENGTH.size + size
+            if frames is not None:
+                frames -= 1
+        OFFSET.pack_into(buf, TAIL, tail)
+        return records
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _attach(name, capacity, lock):
+    return ShmRing(capacity, name=name, lock=lock, create=False)
+
+
+def _ring_producer(ring, records, count, batch):
+    sent = 0
+    while sent < count:
+        chunk = records[:min(batch, count - sent)]
+        ring.put_many(chunk)
+        sent += len(chunk)
+    ring.shm.close()
+
+
+def _queue_producer(queue, records, count, batch):
+    sent = 0
+    while sent < count:
+        if batch == 1:
+            queue.put(records[sent % len(records)])
+            sent += 1
+        else:
+            chunk = records[:min(batch, count - sent)]
+            queue.put(chunk)
+            sent += len(chunk)
+
+
+def benchmark(count=100000, batch=256, records=None, context="spawn"):
+    """Records per second from one producer process to this process"""
+    import multiprocessing
+    ctx = multiprocessing.get_context(context)
+    if records is None:
+        from benchmark_suite import load_corpus
+        records = load_corpus("mixed")[:batch]
+    results = {}
+    for name, batched in (("queue", False), ("queue_batched", True), ("shm_ring", True)):
+        size = batch if batched else 1
+        if name == "shm_ring":
+            channel = ShmRing()
+            target = _ring_producer
+        else:
+            channel = ctx.Queue(maxsize=1024)
+            target = _queue_producer
+        producer = ctx.Process(target=target, args=(channel, records, count, size))
+        producer.start()
+        received = 0
+        start = None
+        while received < count:
+            if name == "shm_ring":
+                got = len(channel.get_many())
+            else:
+                item = channel.get()
+                got = len(item) if batched else 1
+            received += got
+            if start is None:
+                # Exclude process start-up and the first receive from the timing
+                start = perf_counter()
+                count_from = received
+        elapsed = perf_counter() - start
+        producer.join()
+        if name == "shm_ring":
+            channel.close()
+        results[name] = (received - count_from) / elapsed if elapsed else float("inf")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared-memory ring "
+                                     "against multiprocessing.Queue")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+    results = benchmark(args.records, args.batch)
+    for name, rate in results.items():
+        print("%-14s %10.0f records/s" % (name, rate))
+    print("ring vs queue  %10.1fx" % (results["shm_ring"] / results["queue"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Batched, compressed HTTP forwarder for EXTERNAL_SIEM_URL
+
+The Logstash http output posts one event per request. This forwarder
+collects encoded OCSF events into NDJSON bodies of up to batch_events
+events or linger_ms milliseconds, compresses them with gzip (or zstd when
+the zstandard package is installed) and posts them from a fixed pool of
+sender threads, each holding a keep-alive connection. At most max_in_flight
+requests are outstanding; when all are busy, including while a throttled
+endpoint is being retried per Retry-After (capped at the retry policy's
+max_backoff), the caller blocks, so a SinkWorker in front of the forwarder
+spills or drops instead of the pipeline stalling.
+
+Retries are bounded (DEFAULT_MAX_RETRIES unless a RetryPolicy is given),
+and flush() and close() take a deadline: once close() runs out of time the
+senders stop retrying, and batches not yet accepted by the SIEM are counted
+as rejected.
+"""
+import gzip
+import http.client
+import os
+import queue
+import ssl
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from metrics_exporter import format_sample
+from sink_fanout import RetryPolicy
+
+RETRYABLE_STATUS = frozenset((408, 429, 500, 502, 503, 504))
+COMPRESSIONS = ("gzip", "zstd", None)
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_CLOSE_TIMEOUT = 10.0
+# Extra time close() gives senders to abandon their batches after the deadline
+STOP_GRACE = 1.0
+
+
+def retry_after_seconds(value, now=None):
+    """Parse a Retry-After header given as delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - (time.time() if now is None else now), 0.0)
+
+
+def make_compressor(compression, level=None):
+    """Return (Content-Encoding, compress function) for a compression name"""
+    if compression not in COMPRESSIONS:
+        raise ValueError("compression must be one of %s" % (COMPRESSIONS,))
+    if compression == "gzip":
+        level = 6 if level is None else level
+        return "gzip", lambda data: gzip.compress(data, level, mtime=0)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the zstandard package")
+        level = 3 if level is None else level
+        # ZstdCompressor objects are not thread-safe: one per sender thread
+        local = threading.local()
+
+        def compress(data):
+            compressor = getattr(local, "compressor", None)
+            if compressor is None:
+                compressor = local.compressor = zstandard.ZstdCompressor(level=level)
+            return compressor.compress(data)
+        return "zstd", compress
+    return None, None
+
+
+class SiemForwarder:
+    """Sink callable that batches, compresses and posts events to a SIEM"""
+
+    def __init__(self, url, token=None, batch_events=1000, linger_ms=1000,
+                 compression="gzip", compression_level=None, max_in_flight=4,
+                 retry=None, timeout=30.0, verify=True, headers=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError("SIEM URL must be http or https: %r" % url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        self.batch_events = batch_events
+        self.linger = linger_ms / 1000.0
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy(DEFAULT_MAX_RETRIES, initial_backoff=0.5,
+                                          max_backoff=60.0)
+        self.encoding, self.compress = make_compressor(compression, compression_level)
+        self.headers = {"Content-Type": "application/x-ndjson"}
+        if self.encoding:
+            self.headers["Content-Encoding"] = self.encoding
+        if token:
+            self.headers["Authorization"] = "Bearer " + token
+        self.headers.update(headers or {})
+        self._ssl_context = None
+        if self.scheme == "https":
+            self._ssl_context = ssl.create_default_context()
+            if not verify:
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+
+        self.requests = 0
+        self.events_sent = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        self.rejected = 0
+        self._batch = []
+        self._batch_started = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._in_flight = 0
+        self._idle = threading.Condition(threading.Lock())
+        self._outbox = queue.Queue()
+        self._closed = False
+        # Set when close() runs out of time: senders give up on what is left
+        self._stopping = threading.Event()
+        self._senders = [threading.Thread(target=self._send_loop, daemon=True,
+                                          name="siem-sender-%d" % i)
+                         for i in range(max_in_flight)]
+        for sender in self._senders:
+            sender.start()
+        self._lingerer = threading.Thread(target=self._linger_loop, daemon=True,
+                                          name="siem-linger")
+        self._lingerer.start()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def __call__(self, events):
+        ready = []
+        with self._lock:
+            if self._closed:
+                raise ValueError("forwarder is closed")
+            if not self._batch:
+                self._batch_started = time.monotonic()
+                self._wakeup.notify()
+            self._batch.extend(events)
+            while len(self._batch) >= self.batch_events:
+                ready.append(self._batch[:self.batch_events])
+                del self._batch[:self.batch_events]
+            if ready and self._batch:
+                self._batch_started = time.monotonic()
+        for batch in ready:
+            self._submit(batch)
+
+    def _take_batch(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+            self._batch_started = None
+        return batch
+
+    def _submit(self, batch, timeout=None):
+        # Blocks while max_in_flight requests are outstanding
+        if not self._slots.acquire(timeout=timeout):
+            return False
+        with self._idle:
+            self._in_flight += 1
+        self._outbox.put(batch)
+        return True
+
+    def _linger_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._batch_started is None:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                remaining = self._batch_started + self.linger - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+            batch = self._take_batch()
+            if batch:
+                self._submit(batch)
+
+    def _connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _send_loop(self):
+        connection = None
+        while True:
+            batch = self._outbox.get()
+            if batch is None:
+                if connection is not None:
+                    connection.close()
+                return
+            try:
+                if self._stopping.is_set():
+                    with self._idle:
+                        self.rejected += len(batch)
+                else:
+                    connection = self._send(connection, batch)
+            finally:
+                with self._idle:
+                    self._in_flight -= 1
+                    self._idle.notify_all()
+                self._slots.release()
+
+    def _send(self, connection, batch):
+        """Post one batch, retrying on the same keep-alive connection"""
+        body = b"\n".join(batch) + b"\n"
+        if self.compress is not None:
+            body = self.compress(body)
+        attempt = 0
+        while True:
+            delay = None
+            try:
+                if connection is None:
+                    connection = self._connect()
+                connection.request("POST", self.path, body=body, headers=self.headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    connection.close()
+                    connection = None
+                with self._idle:
+                    self.requests += 1
+                if status < 300:
+                    with self._idle:
+                        self.events_sent += len(batch)
+                        self.bytes_sent += len(body)
+                    return connection
+                if status not in RETRYABLE_STATUS:
+                    with self._idle:
+                        self.rejected += len(batch)
+                    return connection
+                delay = retry_after_seconds(response.getheader("Retry-After"))
+                if delay is not None:
+                    # A server asking for hours must not park a sender slot that long
+                    delay = min(delay, self.retry.max_backoff)
+            except (OSError, http.client.HTTPException):
+                if connection is not None:
+                    connection.close()
+                connection = None
+            attempt += 1
+            with self._idle:
+                if self.retry.gives_up(attempt) or self._stopping.is_set():
+                    self.rejected += len(batch)
+                    return connection
+                self.retries += 1
+            self._stopping.wait(delay if delay is not None else self.retry.backoff(attempt))
+
+    def flush(self, timeout=None):
+        """Send the partial batch and wait for every in-flight request
+
+        Returns False if requests are still outstanding after timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        batch = self._take_batch()
+        if batch and not self._submit(batch, timeout):
+            with self._idle:
+                self.rejected += len(batch)
+        with self._idle:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout=DEFAULT_CLOSE_TIMEOUT):
+        """Flush for up to timeout seconds, then reject whatever is left"""
+        deadline = time.monotonic() + timeout
+        if not self.flush(timeout):
+            self._stopping.set()
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        deadline = max(deadline, time.monotonic() + STOP_GRACE)
+        self._lingerer.join(max(deadline - time.monotonic(), 0))
+        for _ in self._senders:
+            self._outbox.put(None)
+        for sender in self._senders:
+            # A request still on the wire after that is bounded by the connection timeout
+            sender.join(max(deadline - time.monotonic(), 0))
+
+    def render(self):
+        metrics = (
+            ("ocsf_siem_requests_total", "counter", "Batched requests sent to the SIEM", self.requests),
+            ("ocsf_siem_events_sent_total", "counter", "Events accepted by the SIEM", self.events_sent),
+            ("ocsf_siem_bytes_sent_total", "counter", "Compressed request bytes accepted", self.bytes_sent),
+            ("ocsf_siem_retries_total", "counter", "Retried SIEM requests", self.retries),
+            ("ocsf_siem_events_rejected_total", "counter", "Events the SIEM refused", self.rejected),
+            ("ocsf_siem_requests_in_flight", "gauge", "Outstanding SIEM requests", self._in_flight),
+        )
+        lines = []
+        for name, kind, help_text, value in metrics:
+            lines.append("# HELP %s %s\n" % (name, help_text))
+            lines.append("# TYPE %s %s\n" % (name, kind))
+            lines.append(format_sample(name, value))
+        return lines
+
+
+def from_environment(url=None):
+    """Build a forwarder from the EXTERNAL_SIEM_* variables the Logstash config uses"""
+    compression = os.environ.get("EXTERNAL_SIEM_COMPRESSION", "gzip")
+    return SiemForwarder(
+        url or os.environ["EXTERNAL_SIEM_URL"],
+        token=os.environ.get("EXTERNAL_SIEM_TOKEN") or None,
+        batch_events=int(os.environ.get("EXTERNAL_SIEM_BATCH_EVENTS", 1000)),
+        linger_ms=int(os.environ.get("EXTERNAL_SIEM_LINGER_MS", 1000)),
+        compression=None if compression in ("", "none") else compression,
+    )
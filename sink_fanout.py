@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Fan-out of encoded OCSF events to independent sinks
+
+Replaces the single Logstash output block, where a slow external SIEM stalls
+the OpenSearch index and the json_lines file alike. Events are serialized
+once by the pipeline and the same list of bytes is handed to every sink.
+Each sink runs in its own worker thread behind its own bounded queue with a
+retry policy, so a degraded sink only backs up its own queue. When that
+queue is full the sink either blocks the producer (the primary index path),
+spills batches to a write-ahead queue on disk and replays them in order
+once it recovers, or drops them.
+
+FanoutSink.submit() takes a callback that runs once the primary (first)
+sink has finished with the batch: delivered, rejected, finally dropped or
+spilled to disk. The pipeline acks its checkpoint and write-ahead queue
+from it, so a batch still in memory when the process dies is read again.
+With the primary on block overflow, as build_sink() sets it up, callbacks
+run on its worker thread in submission order.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+from metrics_exporter import format_sample
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_SPILL = "spill"
+OVERFLOW_DROP = "drop"
+SPILL_CONSUMER = "sink"
+
+
+class SinkError(Exception):
+    """Delivery failure; remaining holds the events still to be retried"""
+
+    def __init__(self, message, remaining=None):
+        super().__init__(message)
+        self.remaining = remaining
+
+
+class RetryPolicy:
+    """Capped exponential backoff; max_retries=None retries forever"""
+
+    def __init__(self, max_retries=None, initial_backoff=0.1, max_backoff=30.0, multiplier=2.0):
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+
+    def backoff(self, attempt):
+        return min(self.initial_backoff * self.multiplier ** (attempt - 1), self.max_backoff)
+
+    def gives_up(self, attempt):
+        return self.max_retries is not None and attempt > self.max_retries
+
+
+class SinkWorker:
+    """Bounded queue, retry loop and optional disk spill for one sink"""
+
+    def __init__(self, name, sink, max_queued_events=50000, overflow=OVERFLOW_DROP,
+                 retry=None, spill_dir=None, spill_segment_size=16 * 1024 * 1024,
+                 max_batch_events=None):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_SPILL, OVERFLOW_DROP):
+            raise ValueError("overflow must be 'block', 'spill' or 'drop'")
+        if overflow == OVERFLOW_SPILL and spill_dir is None:
+            raise ValueError("spill overflow needs a spill_dir")
+        self.name = name
+        self.sink = sink
+        self.max_queued_events = max_queued_events
+        # Queued batches are merged into sink calls of up to this many events
+        self.max_batch_events = max_batch_events
+        self.overflow = overflow
+        self.retry = retry or RetryPolicy()
+        self.spill = None
+        if overflow == OVERFLOW_SPILL:
+            from wal_queue import SegmentQueue
+            self.spill = SegmentQueue(os.path.join(spill_dir, name), spill_segment_size)
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self._batches = deque()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # Once anything is spilled, later batches follow it to disk until the
+        # spill is drained, so the sink sees events in arrival order
+        self._spilling = self.spill is not None and self.spill.lag(SPILL_CONSUMER) > 0
+        self._closing = False
+        # Set when close gives up on a stuck sink; the worker must not touch the spill
+        self._detached = False
+        self._thread = None
+
+    @property
+    def healthy(self):
+        return self.consecutive_failures == 0
+
+    @property
+    def queued(self):
+        return self._queued
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="sink-%s" % self.name)
+            self._thread.start()
+
+    def put(self, events, done=None):
+        """Queue a batch of encoded events; never raises for a slow sink
+
+        done() runs once the batch is delivered, rejected, dropped or
+        spilled; an empty batch with a callback keeps its place in line.
+        """
+        if not events and done is None:
+            return
+        with self._lock:
+            if self._spilling:
+                self._spill_locked(events)
+            elif (self._queued + len(events) > self.max_queued_events and self._queued
+                  and self.overflow != OVERFLOW_BLOCK):
+                if self.overflow == OVERFLOW_SPILL:
+                    self._spilling = True
+                    self._spill_locked(events)
+                else:
+                    self.dropped += len(events)
+            else:
+                while (self._queued + len(events) > self.max_queued_events
+                       and self._queued and not self._closing):
+                    self._not_full.wait()
+                self._batches.append((events, done))
+                self._queued += len(events)
+                self._not_empty.notify()
+                return
+        if done is not None:
+            done()
+
+    def _spill_locked(self, events):
+        if events:
+            self.spill.append_batch(events)
+            self.spilled += len(events)
+        self._not_empty.notify()
+
+    def _next_batch(self):
+        """Next batch in arrival order: memory first, then the spill"""
+        with self._lock:
+            while True:
+                if self._batches:
+                    events, done = self._batches.popleft()
+                    callbacks = [done] if done is not None else []
+                    limit = self.max_batch_events
+                    if limit is not None:
+                        while self._batches and len(events) + len(self._batches[0][0]) <= limit:
+                            more, done = self._batches.popleft()
+                            events = events + more
+                            if done is not None:
+                                callbacks.append(done)
+                    self._queued -= len(events)
+                    self._not_full.notify_all()
+                    return events, callbacks, None
+                if self._detached:
+                    return None, None, None
+                if self._spilling:
+                    records = self.spill.read(SPILL_CONSUMER, 1000)
+                    if records:
+                        return ([bytes(r.payload) for r in records], (),
+                                records[-1].next_position)
+                    self._spilling = False
+                if self._closing:
+                    return None, None, None
+                self._not_empty.wait()
+
+    def _run(self):
+        while True:
+            events, callbacks, spill_position = self._next_batch()
+            if events is None:
+                return
+            self._deliver(events)
+            for done in callbacks:
+                done()
+            if spill_position is not None:
+                with self._lock:
+                    if self._detached:
+                        # Closed while this batch was in flight; it replays on restart
+                        return
+                    self.spill.ack(SPILL_CONSUMER, spill_position)
+                    self.spill.commit_offsets()
+
+    def _deliver(self, events):
+        attempt = 0
+        while events:
+            try:
+                self.sink(events)
+            except Exception as exc:
+                attempt += 1
+                self.failures += 1
+                self.consecutive_failures += 1
+                if isinstance(exc, SinkError) and exc.remaining is not None:
+                    self.delivered += len(events) - len(exc.remaining)
+                    events = exc.remaining
+                if self.retry.gives_up(attempt):
+                    self.dropped += len(events)
+                    return
+                time.sleep(self.retry.backoff(attempt))
+                continue
+            self.delivered += len(events)
+            self.consecutive_failures = 0
+            return
+
+    def close(self, timeout=10.0):
+        """Drain what the sink accepts within timeout, spill or drop the rest"""
+        with self._lock:
+            self._closing = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                # Sink still stuck: keep what is left for the next start
+                # Without a spill, done() is not called, so the source replays them
+                while self._batches:
+                    events, done = self._batches.popleft()
+                    if self.spill is not None:
+                        self._spill_locked(events)
+                        if done is not None:
+                            done()
+                    else:
+                        self.dropped += len(events)
+                self._queued = 0
+                self._detached = True
+        if self.spill is not None:
+            self.spill.close()
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            close()
+
+
+class FanoutSink:
+    """Sink callable that hands each encoded batch to every SinkWorker"""
+
+    def __init__(self, workers):
+        self.workers = list(workers)
+        self.batches = itertools.count()
+        for worker in self.workers:
+            worker.start()
+
+    def __call__(self, events):
+        self.submit(events)
+
+    def submit(self, events, on_delivered=None):
+        """Hand events to every worker; on_delivered runs when the primary is done"""
+        if not events and on_delivered is None:
+            return
+        if events:
+            next(self.batches)
+        primary, *secondary = self.workers
+        primary.put(events, on_delivered)
+        if events:
+            for worker in secondary:
+                worker.put(events)
+
+    def close(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.close(max(deadline - time.monotonic(), 0))
+
+    def render(self):
+        """Per-sink series for the metrics endpoint"""
+        series = (
+            ("ocsf_sink_events_delivered_total", "counter", "Events accepted by the sink", "delivered"),
+            ("ocsf_sink_events_dropped_total", "counter", "Events dropped after overflow or retries", "dropped"),
+            ("ocsf_sink_events_spilled_total", "counter", "Events spilled to disk on overflow", "spilled"),
+            ("ocsf_sink_delivery_failures_total", "counter", "Failed delivery attempts", "failures"),
+            ("ocsf_sink_queue_events", "gauge", "Events queued in memory for the sink", "queued"),
+            ("ocsf_sink_up", "gauge", "1 while the last delivery attempt succeeded", "healthy"),
+        )
+        lines = []
+        for name, kind, help_text, attribute in series:
+            lines.append("# HELP %s %s\n" % (name, help_text))
+            lines.append("# TYPE %s %s\n" % (name, kind))
+            for worker in self.workers:
+                lines.append(format_sample(name, int(getattr(worker, attribute)),
+                                           {"sink": worker.name}))
+        return lines
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Unit tests for agent inventory enrichment
+"""
+import json
+import sqlite3
+import time
+
+from agent_inventory import AgentInventory, load_global_db, load_json_dump
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+
+def make_global_db(path):
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE agent (id INTEGER PRIMARY KEY, name TEXT, ip TEXT, os_name TEXT,
+            os_version TEXT, os_platform TEXT, os_build TEXT, os_uname TEXT,
+            version TEXT, `group` TEXT);
+        CREATE TABLE labels (id INTEGER, key TEXT, value TEXT, PRIMARY KEY (id, key));
+        INSERT INTO agent VALUES (0, 'manager', '127.0.0.1', 'Ubuntu', '22.04.3 LTS',
+            'ubuntu', NULL, 'Linux |manager |5.15.0-91-generic |#101 |x86_64',
+            'Wazuh v4.8.0', NULL);
+        INSERT INTO agent VALUES (1, 'web-server-01', '192.168.1.100',
+            'Microsoft Windows Server 2022', '10.0.20348', 'windows', '20348', NULL,
+            'Wazuh v4.8.0', 'default,windows-servers');
+        INSERT INTO labels VALUES (1, 'env', 'prod'), (1, 'owner', 'web-team');
+    """)
+    connection.commit()
+    connection.close()
+
+
+class TestAgentInventory:
+
+    def test_global_db(self, tmp_path):
+        path = str(tmp_path / "global.db")
+        make_global_db(path)
+        agents = load_global_db(path)
+        assert agents["000"]["device"] == {"os": {
+            "name": "Ubuntu", "type": "Linux", "type_id": 200, "version": "22.04.3 LTS",
+            "kernel_release": "5.15.0-91-generic"}}
+        assert agents["001"] == {
+            "device": {"os": {"name": "Microsoft Windows Server 2022", "type": "Windows",
+                              "type_id": 100, "version": "10.0.20348", "build": "20348"},
+                       "groups": [{"name": "default"}, {"name": "windows-servers"}]},
+            "labels": ["env:prod", "owner:web-team"],
+        }
+
+    def test_json_dump_enriches_translated_events(self, tmp_path):
+        path = str(tmp_path / "agents.json")
+        with open(path, "w") as f:
+            json.dump({"data": {"affected_items": [
+                {"id": "001", "name": "web-server-01", "group": ["default"],
+                 "os": {"name": "CentOS Stream", "version": "9", "platform": "centos"}},
+            ]}}, f)
+        assert load_json_dump(path)["001"]["device"]["os"]["type_id"] == 200
+
+        inventory = AgentInventory(path)
+        translator = OcsfTranslator()
+        translator.add_stage("agent_inventory", inventory)
+        event = translator.translate(make_alert())
+        assert event["device"]["uid"] == "001"
+        assert event["device"]["name"] == "web-server-01"
+        assert event["device"]["os"]["name"] == "CentOS Stream"
+        assert event["device"]["groups"] == [{"name": "default"}]
+        event["device"]["os"]["name"] = "trimmed"
+        event["device"]["groups"].append({"name": "ioc-hit"})
+        again = translator.translate(make_alert())
+        assert again["device"]["os"]["name"] == "CentOS Stream"
+        assert again["device"]["groups"] == [{"name": "default"}]
+        assert translator.translate(make_alert(agent={"id": "042", "name": "new"}))
+        assert (inventory.enriched, inventory.unknown) == (2, 1)
+
+    def test_unknown_agent_triggers_rate_limited_refresh(self, tmp_path):
+        path = str(tmp_path / "agents.json")
+        with open(path, "w") as f:
+            json.dump([], f)
+        inventory = AgentInventory(path, ttl=60, min_refresh_interval=0.05)
+        inventory.start()
+        try:
+            with open(path, "w") as f:
+                json.dump([{"id": "001", "os": {"name": "macOS", "platform": "darwin"}}], f)
+            event = {}
+            inventory(make_alert(), event)
+            deadline = time.monotonic() + 5
+            while "001" not in inventory.agents:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+        finally:
+            inventory.stop()
+        inventory(make_alert(), event)
+        assert event["device"]["os"]["type"] == "macOS"
+        assert inventory.refreshes >= 1
+
+    def test_unknown_agents_cached_until_the_file_changes(self, tmp_path):
+        path = str(tmp_path / "agents.json")
+        with open(path, "w") as f:
+            json.dump([{"id": "7", "os": {"name": "Ubuntu", "platform": "ubuntu"}}], f)
+        loads = []
+
+        def loader(path):
+            loads.append(path)
+            return load_json_dump(path)
+
+        inventory = AgentInventory(path, ttl=60, min_refresh_interval=0, loader=loader)
+        event = {}
+        # Alerts may carry the id unpadded; the inventory keys are padded
+        inventory(make_alert(agent={"id": "7", "name": "db"}), event)
+        assert event["device"]["os"]["type"] == "Linux"
+        inventory.start()
+        try:
+            for _ in range(100):
+                inventory(make_alert(agent={"id": "042", "name": "new"}), {})
+            time.sleep(0.1)
+            # One early wake, and no reload because the file has not changed
+            assert len(loads) == 1 and inventory.unknown == 100
+            with open(path, "w") as f:
+                json.dump([{"id": "042", "os": {"name": "macOS", "platform": "darwin"}}], f)
+            inventory.refresh()
+            inventory(make_alert(agent={"id": "042", "name": "new"}), event)
+            assert event["device"]["os"]["type"] == "macOS"
+        finally:
+            inventory.stop()
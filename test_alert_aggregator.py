@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the windowed alert aggregation stage
+"""
+from alert_aggregator import AlertAggregator
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def brute_force(second, srcip="10.0.0.5"):
+    return make_alert(timestamp="2024-01-01T12:00:%02d.000+0000" % second,
+                      data={"srcip": srcip, "srcuser": "root"})
+
+
+class TestAlertAggregator:
+
+    translator = OcsfTranslator()
+
+    def add(self, aggregator, alert):
+        return aggregator.add(alert, self.translator.translate(alert))
+
+    def test_duplicates_merged_with_count_and_seen_times(self):
+        """Test repeated alerts collapse into one finding"""
+        clock = FakeClock()
+        aggregator = AlertAggregator(window_seconds=60, clock=clock)
+        for second in (0, 5, 30):
+            assert self.add(aggregator, brute_force(second)) == []
+
+        clock.now = 61
+        [event] = aggregator.expire()
+        assert event["count"] == 3
+        assert event["finding"]["first_seen_time"] == 1704110400000
+        assert event["finding"]["last_seen_time"] == 1704110430000
+        assert event["end_time"] - event["start_time"] == 30000
+        assert len(aggregator) == 0
+
+    def test_distinct_keys_kept_apart(self):
+        """Test different source IPs are not merged"""
+        aggregator = AlertAggregator(clock=FakeClock())
+        self.add(aggregator, brute_force(0, "10.0.0.5"))
+        self.add(aggregator, brute_force(1, "10.0.0.6"))
+
+        assert sorted(e["src_endpoint"]["ip"] for e in aggregator.drain()) == ["10.0.0.5", "10.0.0.6"]
+
+    def test_event_outside_window_opens_new_aggregate(self):
+        """Test an event beyond the window closes the previous aggregate"""
+        aggregator = AlertAggregator(window_seconds=10, clock=FakeClock())
+        self.add(aggregator, brute_force(0))
+        [closed] = self.add(aggregator, brute_force(30))
+
+        assert closed["count"] == 1
+        assert len(aggregator) == 1
+
+    def test_table_bounded(self):
+        """Test the oldest aggregate is emitted when the table is full"""
+        aggregator = AlertAggregator(max_entries=2, clock=FakeClock())
+        self.add(aggregator, brute_force(0, "10.0.0.1"))
+        self.add(aggregator, brute_force(0, "10.0.0.2"))
+        [evicted] = self.add(aggregator, brute_force(0, "10.0.0.3"))
+
+        assert evicted["src_endpoint"]["ip"] == "10.0.0.1"
+        assert aggregator.evicted == 1
+
+    def test_unlisted_rules_pass_through(self):
+        """Test only configured rule ids are aggregated"""
+        aggregator = AlertAggregator(rule_ids=["5710"], clock=FakeClock())
+        assert len(self.add(aggregator, brute_force(0))) == 1
+
+    def test_held_alerts_are_replayed_after_a_restart(self, tmp_path):
+        """Test the queue offset never moves past an alert held in an open window"""
+        import json
+        from functools import partial
+
+        from ocsf_pipeline import QUEUE_CONSUMER, OcsfPipeline
+        from wal_queue import SegmentQueue
+
+        clock = FakeClock()
+        lines = [json.dumps(brute_force(0, "10.0.0.5")).encode(),
+                 json.dumps(brute_force(0, "10.0.0.6")).encode()]
+        queue = SegmentQueue(str(tmp_path))
+        sunk = []
+        pipeline = OcsfPipeline(self.translator, sunk.extend, queue=queue,
+                                aggregator=AlertAggregator(60, clock=clock))
+        ends = []
+        for now, line in ((0, lines[0]), (30, lines[1])):
+            clock.now = now
+            queue.append_batch([line])
+            queue.sync()
+            [record] = queue.read(QUEUE_CONSUMER)
+            ends.append(record.next_position)
+            pipeline.deliver([record.payload],
+                             partial(queue.ack, QUEUE_CONSUMER, record.next_position))
+        assert sunk == [] and queue.lag(QUEUE_CONSUMER) > ends[1] - ends[0]
+
+        # The first window closes: only the batch it held is acknowledged
+        clock.now = 61
+        pipeline.deliver([])
+        assert len(sunk) == 1 and queue.lag(QUEUE_CONSUMER) == ends[1] - ends[0]
+        # Crash with the second window still open
+        queue.close()
+
+        queue = SegmentQueue(str(tmp_path))
+        try:
+            assert [r.payload for r in queue.read(QUEUE_CONSUMER)] == [lines[1]]
+        finally:
+            queue.close()
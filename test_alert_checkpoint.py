@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit tests for acknowledgement-driven alerts.json checkpointing
+"""
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from alert_checkpoint import CheckpointManager, Position, check_source, ROTATED, TRUNCATED
+
+
+def write_alerts(path, lines):
+    with open(path, "a") as f:
+        for line in lines:
+            f.write(line + "\n")
+
+
+class TestCheckpointManager:
+
+    def test_offset_advances_only_on_contiguous_acks(self, tmp_path):
+        """Test out-of-order acks do not skip unacknowledged batches"""
+        alerts = str(tmp_path / "alerts.json")
+        write_alerts(alerts, ['{"id": "1"}'] * 3)
+        manager = CheckpointManager(str(tmp_path / "checkpoint"), alerts)
+        start = manager.resume()
+        assert start.offset == 0
+
+        first = manager.track(start.inode, 12)
+        second = manager.track(start.inode, 24)
+        manager.ack(second)
+        assert not manager.commit()
+
+        manager.ack(first)
+        assert manager.commit()
+        assert manager.load() == Position(start.inode, 24)
+
+    def test_commits_are_batched_by_interval(self, tmp_path):
+        """Test maybe_commit waits for the commit interval"""
+        alerts = str(tmp_path / "alerts.json")
+        write_alerts(alerts, ['{"id": "1"}'])
+        manager = CheckpointManager(str(tmp_path / "checkpoint"), alerts,
+                                    commit_interval_ms=60000)
+        start = manager.resume()
+        manager.ack(manager.track(start.inode, 12))
+
+        assert not manager.maybe_commit()
+        manager.close()
+        assert manager.load().offset == 12
+
+    def test_rotation_detected_by_inode(self, tmp_path):
+        """Test a replaced alerts.json restarts at zero and remembers the old inode"""
+        alerts = str(tmp_path / "alerts.json")
+        write_alerts(alerts, ['{"id": "1"}'])
+        manager = CheckpointManager(str(tmp_path / "checkpoint"), alerts)
+        start = manager.resume()
+        manager.ack(manager.track(start.inode, 12))
+        manager.close()
+
+        os.rename(alerts, str(tmp_path / "ossec-alerts-01.json"))
+        write_alerts(alerts, ['{"id": "2"}'])
+        assert check_source(alerts, start) == ROTATED
+
+        manager = CheckpointManager(str(tmp_path / "checkpoint"), alerts)
+        position = manager.resume()
+        assert position.offset == 0
+        assert position.inode != start.inode
+        assert manager.rotated_from == Position(start.inode, 12)
+
+    def test_truncation_detected_by_size(self, tmp_path):
+        """Test a truncated alerts.json is read again from the start"""
+        alerts = str(tmp_path / "alerts.json")
+        write_alerts(alerts, ['{"id": "1"}'] * 4)
+        inode = os.stat(alerts).st_ino
+        open(alerts, "w").close()
+
+        assert check_source(alerts, Position(inode, 48)) == TRUNCATED
+
+    def test_pipeline_commits_acks_that_arrive_while_idle(self, tmp_path):
+        """Test the committer thread writes acks without waiting for a new batch"""
+        from ocsf_pipeline import OcsfPipeline
+        from ocsf_translator import OcsfTranslator
+        from test_ocsf_translator import make_alert
+
+        alerts = str(tmp_path / "alerts.json")
+        line = json.dumps(make_alert())
+        write_alerts(alerts, [line])
+        manager = CheckpointManager(str(tmp_path / "checkpoint"), alerts,
+                                    commit_interval_ms=10)
+        start = manager.resume()
+        idle = threading.Event()
+        delivered = []
+
+        class Tailer:
+            def batches(self):
+                yield SimpleNamespace(inode=start.inode, end_offset=len(line) + 1,
+                                      lines=[line.encode()])
+                # No further alerts until the test is done
+                idle.wait(10)
+
+        class Sink:
+            def submit(self, events, done):
+                delivered.append(done)
+
+            def __call__(self, events):
+                pass
+
+        pipeline = OcsfPipeline(OcsfTranslator(), Sink(), checkpoint=manager)
+        runner = threading.Thread(target=pipeline.run, args=(Tailer(),))
+        runner.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not delivered and time.monotonic() < deadline:
+                time.sleep(0.005)
+            delivered[0]()
+            while manager.load() is None and time.monotonic() < deadline:
+                time.sleep(0.005)
+            assert manager.load() == Position(start.inode, len(line) + 1)
+        finally:
+            idle.set()
+            runner.join()
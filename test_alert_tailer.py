@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the rotation-aware alerts.json tailer
+"""
+import os
+
+import pytest
+
+from alert_checkpoint import CheckpointManager
+from alert_tailer import AlertTailer
+
+
+def append(path, lines, newline=True):
+    with open(path, "ab") as f:
+        f.write(b"\n".join(lines) + (b"\n" if newline else b""))
+
+
+def collect(tailer, count):
+    lines = []
+    for batch in tailer.batches():
+        lines.extend(batch.lines)
+        if len(lines) >= count:
+            break
+    return lines
+
+
+class TestAlertTailer:
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_reads_complete_lines_only(self, tmp_path, use_inotify):
+        """Test partial lines are held back until their newline arrives"""
+        alerts = str(tmp_path / "alerts.json")
+        append(alerts, [b'{"id": "1"}', b'{"id": "2"}'])
+        append(alerts, [b'{"id": '], newline=False)
+
+        tailer = AlertTailer(alerts, chunk_size=8, poll_interval=0.01,
+                             use_inotify=use_inotify)
+        tailer.open(0)
+        assert collect(tailer, 2) == [b'{"id": "1"}', b'{"id": "2"}']
+
+        append(alerts, [b'"3"}'])
+        assert collect(tailer, 1) == [b'{"id": "3"}']
+        tailer.close()
+
+    def test_rotated_file_drained_before_switch(self, tmp_path):
+        """Test late writes to the rotated file are read before the new file"""
+        alerts = str(tmp_path / "alerts.json")
+        append(alerts, [b'{"id": "1"}'])
+        tailer = AlertTailer(alerts, poll_interval=0.01)
+        tailer.open(0)
+        assert collect(tailer, 1) == [b'{"id": "1"}']
+
+        rotated_dir = tmp_path / "2024" / "Jan"
+        rotated_dir.mkdir(parents=True)
+        rotated = str(rotated_dir / "ossec-alerts-01.json")
+        os.rename(alerts, rotated)
+        append(rotated, [b'{"id": "2"}'])
+        append(rotated, [b'{"id": "3"}'], newline=False)
+        append(alerts, [b'{"id": "4"}'])
+
+        assert collect(tailer, 3) == [b'{"id": "2"}', b'{"id": "3"}', b'{"id": "4"}']
+        tailer.close()
+
+    def test_resume_drains_rotated_file_from_checkpoint(self, tmp_path):
+        """Test a restart after rotation finishes the old file first"""
+        alerts = str(tmp_path / "alerts.json")
+        checkpoint_path = str(tmp_path / "checkpoint")
+        append(alerts, [b'{"id": "1"}', b'{"id": "2"}'])
+
+        checkpoint = CheckpointManager(checkpoint_path, alerts)
+        tailer = AlertTailer(alerts, checkpoint=checkpoint, poll_interval=0.01)
+        tailer.open()
+        batch = next(tailer.batches())
+        checkpoint.ack(checkpoint.track(batch.inode, len(b'{"id": "1"}\n')))
+        checkpoint.close()
+        tailer.close()
+
+        rotated_dir = tmp_path / "2024" / "Jan"
+        rotated_dir.mkdir(parents=True)
+        os.rename(alerts, str(rotated_dir / "ossec-alerts-01.json"))
+        append(alerts, [b'{"id": "3"}'])
+
+        tailer = AlertTailer(alerts, checkpoint=CheckpointManager(checkpoint_path, alerts),
+                             poll_interval=0.01)
+        tailer.open()
+        assert collect(tailer, 2) == [b'{"id": "2"}', b'{"id": "3"}']
+        tailer.close()
+
+    def test_truncated_file_reread_from_start(self, tmp_path):
+        """Test an in-place truncation restarts reading at offset zero"""
+        alerts = str(tmp_path / "alerts.json")
+        append(alerts, [b'{"id": "1"}', b'{"id": "2"}'])
+        tailer = AlertTailer(alerts, poll_interval=0.01, use_inotify=False)
+        tailer.open(0)
+        assert len(collect(tailer, 2)) == 2
+
+        with open(alerts, "wb") as f:
+            f.write(b'{"id": "3"}\n')
+        assert collect(tailer, 1) == [b'{"id": "3"}']
+        tailer.close()
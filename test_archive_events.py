@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the archives.json Base Event path
+"""
+import json
+
+from archive_events import ARCHIVE_INDEX_PREFIX, ArchiveTranslator, build_archive_sink
+from ocsf_pipeline import OcsfPipeline
+
+
+def archive_line(**overrides):
+    record = {
+        "timestamp": "2024-01-01T12:00:00.250+0000",
+        "agent": {"id": "003", "name": "db-01", "ip": "10.0.0.3"},
+        "manager": {"name": "wazuh-manager-test"},
+        "id": "1704110400.998877",
+        "decoder": {"name": "pam"},
+        "location": "journald",
+        "full_log": "Jan  1 12:00:00 db-01 sshd[71]: pam_unix(sshd:session): session closed",
+    }
+    record.update(overrides)
+    return json.dumps(record).encode()
+
+
+class TestArchiveEvents:
+
+    def test_minimal_base_event(self):
+        event = ArchiveTranslator().translate_line(archive_line())
+        assert event == {
+            "activity_id": 0, "activity_name": "Unknown", "category_uid": 0,
+            "category_name": "Uncategorized", "class_uid": 0, "class_name": "Base Event",
+            "type_uid": 0, "type_name": "Base Event: Unknown", "severity_id": 1,
+            "severity": "Informational", "time": 1704110400250,
+            "device": {"uid": "003", "name": "db-01", "ip": "10.0.0.3"},
+            "metadata": {"version": "1.1.0", "product": event["metadata"]["product"],
+                         "log_name": "archives", "uid": "1704110400.998877",
+                         "log_provider": "journald", "event_code": "pam"},
+            "raw_data": "Jan  1 12:00:00 db-01 sshd[71]: pam_unix(sshd:session): session closed",
+        }
+        assert "raw_data" not in ArchiveTranslator(include_raw=False).translate_line(
+            archive_line())
+
+    def test_pipeline_converts_archives_without_rules(self):
+        lines = [archive_line(id="1704110400.%d" % n) for n in range(50)]
+        lines += [archive_line(timestamp=None), b"[]", b"{broken"]
+        pipeline = OcsfPipeline(ArchiveTranslator(), None)
+        output = [json.loads(event) for event in pipeline.process_batch(lines)]
+        assert [event["metadata"]["uid"] for event in output] == [
+            "1704110400.%d" % n for n in range(50)]
+        assert all(event["class_uid"] == 0 and "finding" not in event for event in output)
+        assert pipeline.metrics.events_filtered.value == 3
+
+    def test_archive_sink_ignores_the_alert_rollover_environment(self, monkeypatch):
+        monkeypatch.setenv("OUTPUT_OPENSEARCH_ROLLOVER_ALIAS", "ocsf-alerts")
+        monkeypatch.setenv("OUTPUT_OPENSEARCH_ROLLOVER_MAX_DOCS", "10")
+        for alias in (None, "ocsf-archives"):
+            sink = build_archive_sink(opensearch="http://127.0.0.1:9", rollover_alias=alias)
+            try:
+                bulk = sink.workers[0].sink
+                assert bulk.rollover_alias == alias and bulk.max_index_docs is None
+                assert bulk.index_prefix == ARCHIVE_INDEX_PREFIX
+            finally:
+                sink.close()
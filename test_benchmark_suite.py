@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the translator benchmark suite
+"""
+import json
+
+from benchmark_suite import (CORPORA, HERE, best_of, compare, generate_corpus, load_corpus,
+                             record_corpora, run_against)
+from ocsf_translator import OcsfTranslator
+
+
+class TestBenchmarkSuite:
+
+    translator = OcsfTranslator()
+
+    def test_corpora_are_deterministic_and_translate_cleanly(self):
+        for name in CORPORA:
+            lines = generate_corpus(name, 50)
+            assert lines == generate_corpus(name, 50)
+            for line in lines:
+                event = self.translator.translate_line(line)
+                assert event is not None
+                assert "ocsf_validation_errors" not in event
+
+    def test_recorded_corpora_take_precedence(self, tmp_path):
+        record_corpora(str(tmp_path), count=10)
+        lines = load_corpus("network", str(tmp_path))
+        assert len(lines) == 10
+        assert json.loads(lines[0])["rule"]["id"] == "4101"
+
+    def test_compare_flags_only_regressions_beyond_threshold(self):
+        baseline = {"corpora": {"mixed": {"events_per_sec": 1000.0},
+                                "network": {"events_per_sec": 1000.0}}}
+        results = {"corpora": {"mixed": {"events_per_sec": 850.0},
+                               "network": {"events_per_sec": 950.0},
+                               "process": {"events_per_sec": 10.0}}}
+        failures = compare(results, baseline, max_regression=10)
+        assert [name for name, *_ in failures] == ["mixed"]
+
+    def test_against_runs_both_trees_alternately_and_keeps_the_best(self, tmp_path):
+        runs = [{"python": "3", "corpora": {"mixed": {"events_per_sec": rate}}}
+                for rate in (900.0, 1100.0, 1000.0)]
+        assert best_of(runs)["corpora"]["mixed"]["events_per_sec"] == 1100.0
+
+        record_corpora(str(tmp_path), count=20)
+        results, reference = run_against(HERE, ["network"], str(tmp_path),
+                                         min_seconds=0.01, rounds=2)
+        assert set(results["corpora"]) == set(reference["corpora"]) == {"network"}
+        assert reference["corpora"]["network"]["events"] == 20
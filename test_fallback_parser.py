@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the full_log fallback parser
+"""
+import re
+
+from fallback_parser import PATTERNS, SAMPLE_LINES, FallbackParser, benchmark, sequential_parse
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+
+class TestFallbackParser:
+
+    parser = FallbackParser()
+
+    def test_combined_regex_agrees_with_sequential_search(self):
+        regexes = [(name, re.compile(pattern))
+                   for patterns in PATTERNS.values() for name, pattern in patterns]
+        results = []
+        for line in SAMPLE_LINES:
+            result = self.parser.parse(line, *self.parser.dispatch({}, line))
+            assert result == sequential_parse(regexes, line)
+            results.append(result)
+        assert results[0] == ("sshd_failed", {"user": "admin", "ip": "203.0.113.9",
+                                              "port": "50122"})
+        assert results[2][1]["command"] == "/usr/bin/systemctl restart nginx"
+        assert results[6] == ("nginx_access", {"ip": "192.0.2.44"})
+        assert results[-1] is None
+
+    def test_predecoder_program_name_drives_dispatch(self):
+        alert = {"predecoder": {"program_name": "sshd-session"}}
+        line = "Disconnected from invalid user oracle 198.51.100.7 port 60211 [preauth]"
+        assert self.parser.dispatch(alert, line) == ("sshd", 0)
+        assert self.parser.parse(line, "sshd") == (
+            "sshd_disconnect", {"user": "oracle", "ip": "198.51.100.7", "port": "60211"})
+
+    def test_stage_fills_only_undecoded_events(self):
+        parser = FallbackParser()
+        translator = OcsfTranslator()
+        translator.add_stage("fallback", parser, before="observables")
+        alert = make_alert(full_log=SAMPLE_LINES[1])
+        del alert["data"]
+        event = translator.translate(alert)
+        assert event["actor"]["user"]["name"] == "deploy"
+        assert event["src_endpoint"] == {"ip": "10.0.0.7", "port": 40022}
+        assert {o["name"] for o in event["observables"]} == {"src_endpoint.ip"}
+
+        decoded = translator.translate(make_alert(full_log=SAMPLE_LINES[1]))
+        assert decoded["actor"]["user"]["name"] == "root"
+        assert parser.parsed == {"sshd_accepted": 1}
+
+    def test_benchmark_reports_both_strategies(self):
+        results = benchmark(repeat=80)
+        assert set(results) == {"dispatched", "sequential"}
+        assert all(seconds > 0 for seconds in results.values())
+
+    def test_only_valid_addresses_reach_src_endpoint(self):
+        translator = OcsfTranslator()
+        translator.add_stage("fallback", FallbackParser(), before="observables")
+        audit = ('type=USER_LOGIN msg=audit(1720346405.123:992): pid=1 uid=0 '
+                 'acct="alice" exe="/usr/sbin/sshd" hostname=? addr=? terminal=ssh res=failed')
+        sshd = "Jul  7 10:00:08 host sshd[4023]: Connection closed by cafe port 22 [preauth]"
+        events = []
+        for line in (audit, sshd):
+            alert = make_alert(full_log=line)
+            del alert["data"]
+            events.append(translator.translate(alert))
+        assert events[0]["actor"]["user"]["name"] == "alice"
+        assert "ip" not in events[0].get("src_endpoint", {})
+        assert events[1]["src_endpoint"] == {"port": 22}
@@ -4,7 +4,6 @@ Unit tests for Wazuh to OCSF field mappings
 """
 import json
 import pytest
-from jsonschema import validate, ValidationError
 
 class TestFieldMappings:
 
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Unit tests for mmap'd GeoIP/ASN endpoint enrichment
+"""
+import pytest
+
+from geoip_enrichment import GeoIpDatabase, GeoIpEnricher, build_database, read_ranges
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+CSV = """network,country_iso_code,country_name,region,city,latitude,longitude,asn,as_org
+10.0.0.0/24,US,United States,CA,San Jose,37.33,-121.89,AS64500,Example Net
+10.0.1.0/24,US,United States,CA,San Jose,37.33,-121.89,AS64500,Example Net
+10.0.3.0/24,DE,Germany,BE,Berlin,52.52,13.40,64501,
+172.16.0.0/12,,,,,,,64502,Private Corp
+2001:db8::/32,NL,Netherlands,,,,,64503,
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    csv_path = tmp_path / "geo.csv"
+    csv_path.write_text(CSV)
+    db_path = str(tmp_path / "geo.db")
+    assert build_database(read_ranges(str(csv_path)), db_path) == 4
+    db = GeoIpDatabase(db_path, cache_size=16)
+    yield db
+    db.close()
+
+
+class TestGeoIp:
+
+    def test_lookup_boundaries(self, database):
+        san_jose = database.lookup("10.0.0.0")
+        assert san_jose == {
+            "location": {"country": "US", "region": "CA", "city": "San Jose",
+                         "coordinates": [-121.89, 37.33]},
+            "autonomous_system": {"number": 64500, "name": "Example Net"},
+        }
+        assert database.lookup("10.0.1.255") == san_jose
+        assert database.lookup("10.0.3.7")["location"]["city"] == "Berlin"
+        assert database.lookup("172.31.255.255") == {"autonomous_system": {
+            "number": 64502, "name": "Private Corp"}}
+        for ip in ("9.255.255.255", "10.0.2.1", "10.0.4.0", "255.255.255.255",
+                   "2001:db8::1", "not-an-ip", None):
+            assert database.lookup(ip) is None
+        # Identical records are stored once
+        assert len(database.offsets) == 4
+
+    def test_overlapping_ranges_are_rejected(self, tmp_path):
+        record = {"autonomous_system": {"number": 1}}
+        with pytest.raises(ValueError):
+            build_database([(0, 100, record), (50, 150, record)], str(tmp_path / "bad.db"))
+
+    def test_translator_stage_enriches_endpoints(self, database):
+        translator = OcsfTranslator()
+        enricher = GeoIpEnricher(database)
+        translator.add_stage("geoip", enricher)
+        assert [name for name, _ in translator.stages][-2:] == ["geoip", "validation"]
+        alert = make_alert(data={"srcip": "10.0.3.9", "dstip": "192.0.2.1",
+                                 "srcport": "22", "dstport": "4444"})
+        event = translator.translate(alert)
+        assert event["src_endpoint"]["location"]["country"] == "DE"
+        assert event["src_endpoint"]["ip"] == "10.0.3.9"
+        assert "location" not in event["dst_endpoint"]
+        assert enricher.enriched == 1
+        assert "ocsf_geoip_endpoints_enriched_total 1\n" in "".join(enricher.render())
+        # A later stage editing one event leaves the cached record alone
+        event["src_endpoint"]["location"]["country"] = "XX"
+        assert translator.translate(alert)["src_endpoint"]["location"]["country"] == "DE"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the OpenSearch index template generator
+"""
+import json
+import os
+
+from benchmark_suite import CORPORA, generate_corpus
+from index_template_generator import (LEGACY_TEMPLATE, TEMPLATE_DIR, _indexed, _leaves,
+                                      build_templates, doc_size_report)
+from ocsf_translator import OcsfTranslator
+
+
+class TestIndexTemplates:
+
+    templates = build_templates()
+
+    def test_one_template_per_class(self):
+        assert set(self.templates) == {
+            "ocsf-authentication.json", "ocsf-base_event.json",
+            "ocsf-detection_finding.json", "ocsf-file_system_activity.json",
+            "ocsf-network_activity.json", "ocsf-process_activity.json", LEGACY_TEMPLATE}
+        network = self.templates["ocsf-network_activity.json"]
+        assert network["index_patterns"] == ["ocsf-network_activity-*"]
+        properties = network["template"]["mappings"]["properties"]
+        assert properties["src_endpoint"]["properties"]["ip"] == {"type": "ip",
+                                                                  "ignore_malformed": True}
+        assert "file" not in properties and "finding" not in properties
+
+    def test_write_optimized_mapping_and_settings(self):
+        template = self.templates[LEGACY_TEMPLATE]
+        assert template["index_patterns"] == ["ocsf-security-events-*"]
+        settings = template["settings"]["index"]
+        assert settings["sort.field"] == ["time"] and settings["refresh_interval"] == "30s"
+        mappings = template["mappings"]
+        assert mappings["dynamic"] is False
+        properties = mappings["properties"]
+        assert properties["raw_data"] == {"type": "keyword", "index": False,
+                                          "doc_values": False}
+        assert properties["unmapped"] == {"type": "object", "enabled": False}
+        assert properties["time"] == {"type": "date", "format": "epoch_millis"}
+        assert properties["message"] == {"type": "text"}
+        # Aggregated findings carry the window's first and last seen times
+        assert properties["start_time"] == properties["end_time"] == properties["time"]
+        assert properties["count"] == {"type": "integer", "ignore_malformed": True}
+
+    def test_translated_fields_are_all_mapped(self):
+        translator = OcsfTranslator()
+        properties = self.templates[LEGACY_TEMPLATE]["mappings"]["properties"]
+        events = [translator.translate_line(line)
+                  for name in CORPORA for line in generate_corpus(name, 50)]
+        fields = {field for event in events for field, _ in _leaves(event)}
+        unindexed = {field for field in fields if not _indexed(properties, field)}
+        assert unindexed == {field for field in fields
+                             if field == "raw_data" or field.startswith("unmapped.")}
+        report = doc_size_report(self.templates[LEGACY_TEMPLATE], events)
+        assert report["template_indexed_values"] < report["dynamic_indexed_values"]
+
+    def test_committed_templates_are_current(self):
+        for name, template in self.templates.items():
+            with open(os.path.join(TEMPLATE_DIR, name)) as f:
+                assert json.load(f) == template, name
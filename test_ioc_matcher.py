@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the IOC matching stage
+"""
+import os
+import random
+
+from ioc_matcher import IocMatcher, PythonAutomaton
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+FEED = """# type,value,source
+type,value,source
+ip,10.0.0.5,blocklist
+sha256,9F86D081884C7D659A2FEAA0C55AD015A3BF4F1B2B0B822CD15D6C15B0F00A08,malware-hashes
+string,mimikatz,edr-strings
+filename,/tmp/.x11-unix/payload,edr-strings
+string,sh,too-short
+bogus,whatever,
+"""
+
+
+def write_feed(path, content):
+    with open(path + ".new", "w") as f:
+        f.write(content)
+    os.replace(path + ".new", path)
+
+
+class TestIocMatcher:
+
+    def test_automaton_matches_naive_search(self):
+        rng = random.Random(7)
+        patterns = ["".join(rng.choice("abc") for _ in range(rng.randrange(1, 6)))
+                    for _ in range(40)]
+        automaton = PythonAutomaton(patterns)
+        for _ in range(200):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randrange(0, 30)))
+            assert set(automaton.search(text)) == {p for p in patterns if p in text}
+        assert PythonAutomaton([]).search("anything") == ()
+
+    def test_matches_become_enrichments(self, tmp_path):
+        path = str(tmp_path / "feed.csv")
+        write_feed(path, FEED)
+        matcher = IocMatcher(path)
+        assert len(matcher.indicators) == 4 and matcher.indicators.skipped == 2
+
+        translator = OcsfTranslator()
+        translator.add_stage("ioc", matcher)
+        alert = make_alert(syscheck={
+            "path": "/tmp/.X11-unix/payload",
+            "sha256_after": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"})
+        alert["data"]["command"] = "C:\\Tools\\Mimikatz.exe sekurlsa::logonpasswords"
+        event = translator.translate(alert)
+        by_name = {item["name"]: item for item in event["enrichments"]}
+        assert by_name["src_endpoint.ip"] == {
+            "name": "src_endpoint.ip", "value": "10.0.0.5", "type": "IOC",
+            "provider": "blocklist", "data": {"indicator": "10.0.0.5", "indicator_type": "ip"}}
+        assert by_name["file.hashes"]["provider"] == "malware-hashes"
+        assert by_name["process.cmd_line"]["data"]["indicator"] == "mimikatz"
+        assert by_name["file.path"]["data"]["indicator_type"] == "filename"
+        assert "enrichments" not in translator.translate(make_alert(data={"srcip": "10.0.0.6"}))
+        assert matcher.matched_events == 1 and matcher.matches["ip"] == 1
+
+    def test_reload_swaps_whole_set(self, tmp_path):
+        path = str(tmp_path / "feed.csv")
+        write_feed(path, FEED)
+        matcher = IocMatcher(path)
+        assert not matcher.reload()
+        write_feed(path, "ip,10.0.0.6,blocklist\n")
+        assert matcher.reload()
+        event = {"src_endpoint": {"ip": "10.0.0.6"}, "dst_endpoint": {"ip": "10.0.0.5"}}
+        matcher(make_alert(), event)
+        assert [item["value"] for item in event["enrichments"]] == ["10.0.0.6"]
+
+        active = matcher.indicators
+        with open(path, "wb") as f:
+            f.write(b"ip,\xff\xfe\n")
+        assert not matcher.reload()
+        assert matcher.indicators is active and matcher.errors == 1
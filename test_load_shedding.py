@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Unit tests for adaptive load shedding
+"""
+import json
+
+from load_shedding import LoadShedder
+from ocsf_pipeline import OcsfPipeline
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+
+def alert_at(level, rule_id="5710"):
+    alert = make_alert()
+    alert["rule"] = dict(alert["rule"], level=level, id=rule_id)
+    return alert
+
+
+def overload(shedder, times=1):
+    for _ in range(times):
+        shedder.update(queue_depth=shedder.max_queue_depth * 2, latency=0.0)
+
+
+class TestLoadShedder:
+
+    def test_no_shedding_without_pressure(self):
+        shedder = LoadShedder()
+        shedder.update(queue_depth=100, latency=0.1)
+        assert not shedder.active
+        assert all(shedder.admit(alert_at(2)) == 1 for _ in range(100))
+
+    def test_rate_backs_off_and_recovers(self):
+        shedder = LoadShedder(decrease=0.5, increase=0.25)
+        overload(shedder, 3)
+        assert shedder.rate == 0.125
+        shedder.update(queue_depth=0, latency=2.0)
+        assert shedder.rate == 0.0625
+        for _ in range(4):
+            shedder.update(queue_depth=0, latency=0.0)
+        assert shedder.rate == 1.0
+
+    def test_high_severity_is_never_sampled(self):
+        shedder = LoadShedder(min_rate=0.01)
+        overload(shedder, 10)
+        assert all(shedder.admit(alert_at(12)) == 1 for _ in range(1000))
+
+    def test_count_weighting_preserves_totals(self):
+        shedder = LoadShedder()
+        overload(shedder, 2)
+        weights = [shedder.admit(alert_at(5)) for _ in range(1000)]
+        kept = [w for w in weights if w]
+        assert 240 <= len(kept) <= 260
+        # After recovery the next event of the rule carries what is still pending
+        for _ in range(20):
+            shedder.update(queue_depth=0, latency=0.0)
+        assert sum(kept) + shedder.admit(alert_at(5)) == 1001
+        assert shedder.shed_by_severity[2] == 1000 - len(kept)
+
+    def test_informational_events_lose_raw_data_while_shedding(self):
+        translator = OcsfTranslator()
+        shedder = LoadShedder()
+        event = translator.translate(alert_at(2))
+        shedder.degrade(event, 1)
+        assert "raw_data" in event
+        overload(shedder)
+        shedder.degrade(event, 1)
+        assert "raw_data" not in event
+        high = translator.translate(alert_at(10))
+        shedder.degrade(high, 1)
+        assert "raw_data" in high
+
+    def test_pipeline_sheds_before_translation(self):
+        shedder = LoadShedder()
+        overload(shedder, 3)
+        pipeline = OcsfPipeline(OcsfTranslator(), lambda events: None, shedder=shedder)
+        lines = [json.dumps(alert_at(5, rule_id=str(5700 + i % 4))).encode() for i in range(400)]
+        lines += [json.dumps(alert_at(13)).encode() for _ in range(50)]
+        output = [json.loads(e) for e in pipeline.process_batch(lines)]
+        low = [e for e in output if e["severity_id"] < 4]
+        assert len([e for e in output if e["severity_id"] >= 4]) == 50
+        assert len(low) < 100
+        assert sum(e["count"] for e in low) <= 400
+        assert 'ocsf_shedding_events_shed_total{severity_id="2"}' in "".join(shedder.render())
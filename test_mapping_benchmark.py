@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-row field mapping micro-benchmarks
+"""
+from mapping_benchmark import benchmark_rows, load_history, record
+from ocsf_translator import load_mapping
+
+
+class TestMappingBenchmark:
+
+    def test_every_csv_row_is_timed_and_ranked(self):
+        report = benchmark_rows(corpora=("mixed",), events=50, repeat=1)
+        rows, version = load_mapping()
+        assert report["version"] == version
+        assert {r["wazuh_field"] for r in report["rows"]} == {r["Wazuh Field"] for r in rows}
+        costs = [r["ns_per_event"] for r in report["rows"]]
+        assert costs == sorted(costs, reverse=True)
+        mitre = next(r for r in report["rows"] if r["wazuh_field"] == "rule.mitre.tactic")
+        assert mitre["ocsf_field"].startswith("finding.attack")
+        assert 0 < mitre["hit_rate"] <= 1
+
+    def test_history_is_appended_per_run(self, tmp_path):
+        path = str(tmp_path / "history.json")
+        report = benchmark_rows(corpora=("network",), events=20, repeat=1)
+        record(report, path)
+        record(report, path)
+        history = load_history(path)
+        assert len(history) == 2
+        assert history[0]["mapping_version"] == report["version"]
+        assert "data.dstport" in history[1]["rows"]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for hot reload of the field mapping
+"""
+import json
+import os
+import shutil
+import time
+
+from mapping_reload import MappingReloader
+from ocsf_pipeline import OcsfPipeline
+from ocsf_translator import DEFAULT_MAPPING_PATH, OcsfTranslator
+from test_ocsf_translator import make_alert
+
+EXTRA_ROW = "manager.name,observer.name,Base Event,String,No\n"
+
+
+def copy_mapping(tmp_path):
+    path = str(tmp_path / "mapping.csv")
+    shutil.copy(DEFAULT_MAPPING_PATH, path)
+    return path
+
+
+def rewrite(path, content):
+    # Write-and-rename, the way editors and config management replace files
+    with open(path + ".new", "w") as f:
+        f.write(content)
+    os.replace(path + ".new", path)
+
+
+class TestMappingReloader:
+
+    def test_change_is_compiled_and_swapped_between_batches(self, tmp_path):
+        path = copy_mapping(tmp_path)
+        translator = OcsfTranslator(path)
+        reloader = MappingReloader(translator)
+        old_version = reloader.version
+        lines = [json.dumps(make_alert()).encode()]
+        pipeline = OcsfPipeline(translator, lambda events: None, reloader=reloader)
+
+        first = json.loads(pipeline.process_batch(lines)[0])
+        assert first["metadata"]["labels"] == ["mapping_version:%s" % old_version]
+        assert "observer" not in first
+
+        with open(path) as f:
+            rewrite(path, f.read() + EXTRA_ROW)
+        assert reloader.check()
+        # Compiled, but not active until the next batch boundary
+        assert translator.plan.version == old_version
+
+        output = []
+        pipeline.sink = output.extend
+        pipeline.deliver(lines)
+        event = json.loads(output[0])
+        assert reloader.version != old_version
+        assert event["metadata"]["labels"] == ["mapping_version:%s" % reloader.version]
+        assert event["observer"] == {"name": "wazuh-manager-test"}
+        assert reloader.reloads == 1
+
+    def test_invalid_mapping_keeps_running_plan(self, tmp_path):
+        path = copy_mapping(tmp_path)
+        translator = OcsfTranslator(path)
+        reloader = MappingReloader(translator)
+        plan = translator.plan
+        rewrite(path, "Wazuh Field,OCSF Field\n")
+        assert not reloader.check()
+        rewrite(path, "not,a,mapping\nx,y,z\n")
+        assert not reloader.check()
+        assert not reloader.apply_pending()
+        assert translator.plan is plan
+        assert reloader.errors == 2
+
+    def test_background_watcher_picks_up_changes(self, tmp_path):
+        path = copy_mapping(tmp_path)
+        translator = OcsfTranslator(path)
+        reloader = MappingReloader(translator, poll_interval=0.05)
+        reloader.start()
+        try:
+            with open(path) as f:
+                rewrite(path, f.read() + EXTRA_ROW)
+            deadline = time.monotonic() + 5
+            while not reloader.apply_pending():
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+        finally:
+            reloader.stop()
+        assert reloader.last_compile_seconds < 0.1
+        assert any(step.ocsf_field == "observer.name" for step in translator.plan.steps)
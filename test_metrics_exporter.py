@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Prometheus exporter and the Python pipeline metrics
+"""
+import json
+import threading
+import urllib.request
+
+from alert_aggregator import AlertAggregator
+from metrics_exporter import Counter, MetricsServer, PipelineMetrics, Summary
+from ocsf_pipeline import OcsfPipeline
+from ocsf_translator import OcsfTranslator
+from test_ocsf_translator import make_alert
+
+
+def scrape(collectors):
+    server = MetricsServer(collectors, host="127.0.0.1", port=0)
+    port = server.start()
+    try:
+        with urllib.request.urlopen("http://127.0.0.1:%d/metrics" % port) as response:
+            return response.headers["Content-Type"], response.read().decode()
+    finally:
+        server.stop()
+
+
+class TestMetricPrimitives:
+
+    def test_counter_increments_from_threads(self):
+        """Test concurrent increments are never lost"""
+        counter = Counter("events_total", "Events")
+
+        def work():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.add(5)
+
+        assert counter.value == 40005
+
+    def test_summary_quantiles(self):
+        """Test quantiles are computed over the recent window"""
+        summary = Summary("latency_seconds", "Latency", window=128)
+        for value in range(1, 101):
+            summary.observe(value / 100.0)
+
+        quantiles = summary.quantiles()
+        assert quantiles[0.5] == 0.5
+        assert quantiles[0.95] == 0.95
+        assert summary.count == 100
+
+
+class TestPipelineMetrics:
+
+    def test_alert_rule_series_exposed(self):
+        """Test every series referenced by alert_rules.yml is scrapeable"""
+        content_type, body = scrape([PipelineMetrics(queue_size=lambda: 7)])
+
+        assert content_type.startswith("text/plain; version=0.0.4")
+        for series in ('logstash_pipeline_events_duration_seconds{quantile="0.95"}',
+                       "logstash_pipeline_events_in_total",
+                       "logstash_pipeline_events_filtered_total",
+                       "logstash_pipeline_events_queue_size 7",
+                       "logstash_jvm_memory_heap_used_bytes",
+                       "logstash_jvm_memory_heap_max_bytes"):
+            assert series in body
+
+    def test_pipeline_updates_counters(self):
+        """Test processed batches move the in/out/filtered counters"""
+        written = []
+        pipeline = OcsfPipeline(OcsfTranslator(), written.extend)
+        alert = make_alert()
+        invalid = make_alert()
+        del invalid["rule"]
+        pipeline.deliver([json.dumps(alert).encode(), json.dumps(invalid).encode(), b"{"])
+
+        metrics = pipeline.metrics
+        assert metrics.events_in.value == 3
+        assert metrics.events_out.value == 1
+        assert metrics.events_filtered.value == 2
+        assert metrics.duration.count == 1
+        assert json.loads(written[0])["class_uid"] == 2004
+
+    def test_pipeline_aggregates_duplicates(self):
+        """Test the aggregator collapses a batch of repeats on shutdown"""
+        written = []
+        pipeline = OcsfPipeline(OcsfTranslator(), written.extend,
+                                aggregator=AlertAggregator(window_seconds=60))
+        line = json.dumps(make_alert()).encode()
+        pipeline.deliver([line] * 5)
+        pipeline.stop()
+
+        assert len(written) == 1
+        assert json.loads(written[0])["count"] == 5
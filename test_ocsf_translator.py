@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Wazuh to OCSF translator
+"""
+import json
+import os
+import pickle
+import shutil
+
+from ocsf_translator import (
+    DEFAULT_MAPPING_PATH, OcsfTranslator, load_plan, parse_timestamp, plan_cache_path,
+    severity_for_level, validate,
+)
+
+
+def make_alert(**overrides):
+    alert = {
+        "timestamp": "2024-01-01T12:00:00.250+0000",
+        "rule": {
+            "level": 10,
+            "description": "sshd: brute force trying to get access to the system.",
+            "id": "5712",
+            "groups": ["syslog", "sshd", "authentication_failures"],
+            "mitre": {
+                "id": ["T1110"],
+                "tactic": ["Credential Access"],
+                "technique": ["Brute Force"],
+            },
+        },
+        "agent": {"id": "001", "name": "web-server-01", "ip": "192.168.1.100"},
+        "manager": {"name": "wazuh-manager-test"},
+        "id": "1704110400.123456",
+        "decoder": {"name": "sshd"},
+        "location": "/var/log/auth.log",
+        "data": {"srcip": "10.0.0.5", "srcport": "51022", "srcuser": "root"},
+        "full_log": "Jan  1 12:00:00 web sshd[1234]: Failed password for root from 10.0.0.5",
+    }
+    alert.update(overrides)
+    return alert
+
+
+class TestOcsfTranslator:
+
+    translator = OcsfTranslator()
+
+    def test_required_ocsf_fields(self):
+        """Test translated events carry every required OCSF field"""
+        event = self.translator.translate(make_alert())
+
+        assert validate(event) == []
+        assert event["class_uid"] == 2004
+        assert event["type_uid"] == 200401
+        assert event["metadata"]["version"] == "1.1.0"
+
+    def test_csv_mappings_applied(self):
+        """Test rows of wazuh_ocsf_field_mapping.csv land on their OCSF fields"""
+        event = self.translator.translate(make_alert())
+
+        assert event["device"] == {"uid": "001", "name": "web-server-01", "ip": "192.168.1.100"}
+        assert event["src_endpoint"] == {"ip": "10.0.0.5", "port": 51022}
+        assert event["actor"]["user"]["name"] == "root"
+        assert event["metadata"]["log_name"] == "sshd"
+        assert event["metadata"]["product"]["feature"]["name"] == "/var/log/auth.log"
+        assert event["finding"]["related_events"] == [{"uid": "T1110"}]
+        assert event["raw_data"].startswith("Jan  1 12:00:00 web sshd")
+
+    def test_severity_mapping(self):
+        """Test Wazuh level to OCSF severity mapping"""
+        cases = [(0, 1), (3, 1), (5, 2), (8, 3), (11, 4), (14, 5), (16, 6)]
+        for level, expected in cases:
+            assert severity_for_level(level)[0] == expected
+
+    def test_timestamp_conversion(self):
+        """Test Wazuh timestamp formats convert to epoch milliseconds"""
+        assert parse_timestamp("2024-01-01T12:00:00.000Z") == 1704110400000
+        assert parse_timestamp("2024-01-01T12:00:00.250+0000") == 1704110400250
+        assert parse_timestamp("2024-01-01T14:00:00.000+02:00") == 1704110400000
+        assert parse_timestamp("2024-01-01T12:00:00") == 1704110400000
+
+    def test_mitre_attack_mapping(self):
+        """Test rule.mitre becomes finding.attack"""
+        event = self.translator.translate(make_alert())
+
+        assert event["finding"]["attack"] == [{
+            "technique": {"uid": "T1110", "name": "Brute Force"},
+            "tactics": [{"name": "Credential Access"}],
+        }]
+
+    def test_syscheck_event_sets_activity(self):
+        """Test FIM events map onto finding activities and observables"""
+        alert = make_alert(syscheck={"path": "/etc/passwd", "event": "modified",
+                                     "size_after": "1024"})
+        event = self.translator.translate(alert)
+
+        assert event["activity_id"] == 2
+        assert event["type_name"] == "Detection Finding: Update"
+        assert event["file"]["size"] == 1024
+        assert {"name": "file.path", "type": "File Name", "type_id": 7,
+                "value": "/etc/passwd"} in event["observables"]
+
+    def test_invalid_input_dropped(self):
+        """Test alerts missing timestamp, rule or agent are dropped"""
+        alert = make_alert()
+        del alert["agent"]
+        assert self.translator.translate(alert) is None
+        assert self.translator.translate_line(b"not json") is None
+
+    def test_translate_line_keeps_raw_json_without_full_log(self):
+        """Test raw_data falls back to the original alert line"""
+        alert = make_alert()
+        del alert["full_log"]
+        line = json.dumps(alert).encode()
+        event = self.translator.translate_line(line)
+
+        assert json.loads(event["raw_data"]) == alert
+
+    def test_plan_is_picklable(self):
+        """Test the compiled mapping plan survives pickling"""
+        plan = pickle.loads(pickle.dumps(self.translator.plan))
+        assert plan.version == self.translator.plan.version
+        assert OcsfTranslator(plan=plan).translate(make_alert()) == self.translator.translate(make_alert())
+
+    def test_plan_cache_is_reused_until_the_mapping_changes(self, tmp_path):
+        """Test the pickled plan cache is keyed by the mapping file"""
+        mapping = str(tmp_path / "mapping.csv")
+        cache_dir = str(tmp_path / "cache")
+        shutil.copy(DEFAULT_MAPPING_PATH, mapping)
+
+        plan = load_plan(mapping, cache_dir)
+        cache_path = plan_cache_path(mapping, cache_dir)
+        assert os.path.exists(cache_path)
+        assert load_plan(mapping, cache_dir).version == plan.version
+
+        with open(mapping, "a") as f:
+            f.write("manager.name,observer.name,Base Event,String,No\n")
+        changed = load_plan(mapping, cache_dir)
+        assert changed.version != plan.version
+        # The stale entry is replaced, not accumulated
+        assert os.listdir(cache_dir) == [os.path.basename(plan_cache_path(mapping, cache_dir))]
+
+        with open(plan_cache_path(mapping, cache_dir), "wb") as f:
+            f.write(b"corrupt")
+        assert load_plan(mapping, cache_dir).version == changed.version
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-agent partitioned executor
+"""
+import json
+import time
+from collections import Counter, defaultdict
+from functools import partial
+
+from ocsf_pipeline import OcsfPipeline
+from ocsf_translator import OcsfTranslator
+from partitioned_executor import (PartitionedExecutor, TranslationWorker, agent_id_key,
+                                  field_key, rebalance)
+from test_ocsf_translator import make_alert
+
+
+class Echo:
+    """Worker returning (key, seq) pairs and counting what it saw for drain()"""
+
+    def __init__(self):
+        self.seen = 0
+
+    def __call__(self, items):
+        self.seen += len(items)
+        return items
+
+    def drain(self):
+        return [("drained", self.seen)]
+
+
+def run(executor, items):
+    for key, seq in items:
+        executor.submit(key, (key, seq))
+
+
+class TestPartitionedExecutor:
+
+    def test_rebalance_moves_few_slots(self):
+        table = rebalance([0] * 256, 4)
+        assert Counter(table) == {0: 64, 1: 64, 2: 64, 3: 64}
+        grown = rebalance(table, 5)
+        assert sorted(Counter(grown).values()) == [51, 51, 51, 51, 52]
+        # Only slots handed to the new worker move
+        assert all(new == old or new == 4 for old, new in zip(table, grown))
+        shrunk = rebalance(grown, 3)
+        assert all(new == old for old, new in zip(grown, shrunk) if old < 3)
+
+    def test_keys_keep_order_across_resize(self):
+        emitted = defaultdict(list)
+        drained = []
+
+        def emit(partition, results):
+            for key, seq in results:
+                (drained if key == "drained" else emitted[key]).append(seq)
+
+        executor = PartitionedExecutor(Echo, emit, workers=2, batch_size=7, mode="thread")
+        keys = ["%03d" % agent for agent in range(40)]
+        run(executor, [(key, seq) for seq in range(50) for key in keys])
+        executor.resize(5)
+        run(executor, [(key, seq) for seq in range(50, 100) for key in keys])
+        executor.resize(3)
+        run(executor, [(key, seq) for seq in range(100, 150) for key in keys])
+        executor.close()
+        assert executor.rebalances == 2
+        assert all(emitted[key] == list(range(150)) for key in keys)
+        assert drained
+
+    def test_agent_key(self):
+        line = json.dumps(make_alert(agent={"name": "web", "id": "017"})).encode()
+        assert agent_id_key(line) == b"017"
+        assert agent_id_key(b'{"rule": {"id": "1"}}') == b""
+        assert field_key("rule.id")(line) == b"5712"
+
+    def test_pipeline_aggregates_per_agent_in_worker_processes(self):
+        lines = [json.dumps(make_alert(agent={"id": "%03d" % (n % 4), "name": "a"},
+                                       id="1704110400.%d" % n)).encode() for n in range(40)]
+        bad = json.dumps(make_alert(timestamp="bad")).encode()
+        lines += [b"not json", bad]
+        sunk = []
+        errors = []
+        pipeline = OcsfPipeline(OcsfTranslator(), sunk.extend, partition_key=agent_id_key,
+                                error_sink=errors.extend)
+        pipeline.executor = PartitionedExecutor(
+            partial(TranslationWorker, aggregate_window=60), pipeline.collect_partition,
+            workers=2, batch_size=8)
+        assert pipeline.process_batch(lines) == []
+        # Lines reach the worker processes through shared-memory rings
+        assert pipeline.executor.ring_capacity
+        pipeline.stop()
+        events = [json.loads(event) for event in sunk]
+        assert sorted(event["device"]["uid"] for event in events) == ["000", "001", "002", "003"]
+        assert all(event["count"] == 10 for event in events)
+        assert pipeline.metrics.events_filtered.value == 2
+        assert errors == [bad]
+
+    def test_barrier_expires_aggregates_in_quiet_partitions(self):
+        line = json.dumps(make_alert()).encode()
+        pipeline = OcsfPipeline(OcsfTranslator(), None, partition_key=agent_id_key)
+        pipeline.executor = PartitionedExecutor(
+            partial(TranslationWorker, aggregate_window=0.05), pipeline.collect_partition,
+            workers=2, mode="thread")
+        try:
+            assert pipeline.process_batch([line] * 3) == []
+            time.sleep(0.1)
+            # No new alerts for that agent: the barrier alone closes its window
+            events = [json.loads(event) for event in pipeline.process_batch([])]
+            assert [event["count"] for event in events] == [3]
+        finally:
+            pipeline.executor.close()
+
+    def test_batches_held_by_worker_aggregates_are_acked_once_emitted(self):
+        line = json.dumps(make_alert()).encode()
+        sunk = []
+        acked = []
+        pipeline = OcsfPipeline(OcsfTranslator(), sunk.extend, partition_key=agent_id_key)
+        pipeline.executor = PartitionedExecutor(
+            partial(TranslationWorker, aggregate_window=0.05), pipeline.collect_partition,
+            workers=2, mode="thread")
+        try:
+            pipeline.deliver([line], lambda: acked.append(1))
+            pipeline.deliver([line], lambda: acked.append(2))
+            assert sunk == [] and acked == []
+            assert pipeline.held_position() is not None
+            time.sleep(0.1)
+            pipeline.deliver([])
+            assert len(sunk) == 1 and acked == [1, 2]
+            assert pipeline.held_position() is None
+        finally:
+            pipeline.executor.close()
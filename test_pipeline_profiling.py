@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Unit tests for translator stage timing and profiling hooks
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from metrics_exporter import MetricsServer
+from pipeline_profiling import Histogram, ProfileCapture, ProfiledTranslator, StageProfiler
+from test_ocsf_translator import make_alert
+
+
+class TestStageProfiler:
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram rendering follows the Prometheus bucket layout"""
+        histogram = Histogram(buckets=(0.001, 0.01))
+        for value in (0.0005, 0.005, 0.5):
+            histogram.observe(value)
+        lines = histogram.render("latency_seconds", {"stage": "decode"})
+
+        assert 'latency_seconds_bucket{stage="decode",le="0.001"} 1\n' in lines
+        assert 'latency_seconds_bucket{stage="decode",le="0.01"} 2\n' in lines
+        assert 'latency_seconds_bucket{stage="decode",le="+Inf"} 3\n' in lines
+        assert 'latency_seconds_count{stage="decode"} 3\n' in lines
+
+    def test_every_stage_is_timed(self):
+        """Test decode, translation stages and encode all record samples"""
+        translator = ProfiledTranslator()
+        event = translator.translate_line(json.dumps(make_alert()))
+        translator.encode(event)
+
+        assert set(translator.profiler.stages) == {
+            "decode", "mapping", "mitre", "observables", "finding", "validation", "encode"}
+        assert translator.profiler.class_counts[2004] == 1
+        assert translator.profiler.rule_counts["5712"] == 1
+
+    def test_rule_counter_cardinality_capped(self):
+        """Test rule ids beyond the cap are folded into one series"""
+        profiler = StageProfiler(max_rule_ids=1)
+        for rule_id in ("1", "2", "3"):
+            profiler.count_event({"class_uid": 2004, "metadata": {"event_code": rule_id}})
+
+        assert profiler.rule_counts == {"1": 1, "other": 2}
+
+    def test_metrics_endpoint_serves_profiler(self):
+        """Test the profiler is scrapeable over HTTP"""
+        translator = ProfiledTranslator()
+        translator.translate(make_alert())
+        server = MetricsServer([translator.profiler], host="127.0.0.1", port=0)
+        port = server.start()
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:%d/metrics" % port) as response:
+                body = response.read().decode()
+        finally:
+            server.stop()
+
+        assert 'ocsf_translator_events_total{class_uid="2004"} 1' in body
+        assert 'ocsf_translator_stage_duration_seconds_count{stage="mitre"} 1' in body
+
+
+class TestProfileCapture:
+
+    def test_cprofile_capture_toggles(self, tmp_path):
+        """Test toggling twice writes a pstats file"""
+        capture = ProfileCapture(str(tmp_path))
+        assert capture.toggle() is None
+        ProfiledTranslator().translate(make_alert())
+        path = capture.toggle()
+
+        assert path.endswith(".pstats") and os.path.getsize(path) > 0
+
+    def test_sampling_capture_covers_other_threads(self, tmp_path):
+        """Test samples are taken from worker threads, rooted at the thread name"""
+        done = threading.Event()
+
+        def translate_loop():
+            translator = ProfiledTranslator()
+            while not done.is_set():
+                translator.translate(make_alert())
+
+        worker = threading.Thread(target=translate_loop, name="ocsf-translator")
+        worker.start()
+        capture = ProfileCapture(str(tmp_path), mode="sampling", sample_interval=0.001)
+        try:
+            capture.start()
+            time.sleep(0.1)
+            path = capture.stop()
+        finally:
+            done.set()
+            worker.join()
+
+        with open(path) as f:
+            stacks = [line.rsplit(" ", 1)[0] for line in f]
+        assert any(stack.startswith("thread:ocsf-translator;")
+                   and "translate_loop" in stack for stack in stacks)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the rule-level pre-filter
+"""
+import json
+
+from ocsf_pipeline import OcsfPipeline
+from ocsf_translator import OcsfTranslator
+from rule_prefilter import PrefilterIndex, RulePrefilter, extract_subtree
+from test_ocsf_translator import make_alert
+
+CONFIG = {
+    "min_level": 3,
+    "keep_rule_ids": ["5712"],
+    "drop_rule_ids": ["5402"],
+    "drop_groups": ["pam"],
+    "group_min_levels": {"syscheck": 7},
+    "drop_agent_ids": ["000"],
+}
+
+
+def line_for(level=5, rule_id="5710", groups=("sshd",), agent_id="001", **overrides):
+    alert = make_alert(**overrides)
+    alert["rule"] = dict(alert["rule"], level=level, id=rule_id, groups=list(groups))
+    alert["agent"] = dict(alert["agent"], id=agent_id)
+    return json.dumps(alert).encode()
+
+
+class TestRulePrefilter:
+
+    prefilter = RulePrefilter(PrefilterIndex.from_config(CONFIG))
+
+    def test_extract_subtree_reads_only_the_value(self):
+        line = b'{"timestamp":"x","rule": {"id":"1","groups":["a"]},"agent":{"id":"002"}}'
+        assert extract_subtree(line, b'"rule":') == {"id": "1", "groups": ["a"]}
+        assert extract_subtree(line, b'"agent":') == {"id": "002"}
+        assert extract_subtree(line, b'"missing":') is None
+
+    def test_extract_subtree_beyond_the_window(self):
+        big = {"id": "1", "description": "é" * 5000}
+        line = json.dumps({"rule": big}, ensure_ascii=False).encode()
+        assert extract_subtree(line, b'"rule":') == big
+
+    def test_decisions(self):
+        accepts = self.prefilter.accepts_line
+        assert accepts(line_for())
+        assert not accepts(line_for(level=2))
+        assert accepts(line_for(level=2, rule_id="5712"))
+        assert not accepts(line_for(rule_id="5402", level=12))
+        assert not accepts(line_for(groups=("syslog", "pam")))
+        assert not accepts(line_for(level=5, groups=("ossec", "syscheck")))
+        assert accepts(line_for(level=7, groups=("ossec", "syscheck")))
+        assert not accepts(line_for(agent_id="000"))
+
+    def test_unreadable_lines_are_kept(self):
+        prefilter = RulePrefilter(PrefilterIndex(min_level=3))
+        assert prefilter.accepts_line(b"not json")
+        assert prefilter.accepts_line(b'{"rule": {"id": ')
+        assert prefilter.unreadable == 2
+
+    def test_decoded_alert_matches_line_decision(self):
+        for line in (line_for(), line_for(level=1), line_for(agent_id="000")):
+            assert (self.prefilter.accepts(json.loads(line))
+                    == self.prefilter.accepts_line(line))
+
+    def test_pipeline_drops_before_translation(self):
+        translated = []
+
+        class CountingTranslator(OcsfTranslator):
+            def decode(self, line):
+                translated.append(line)
+                return super().decode(line)
+
+        prefilter = RulePrefilter(PrefilterIndex(min_level=5))
+        pipeline = OcsfPipeline(CountingTranslator(), lambda events: None, prefilter=prefilter)
+        lines = [line_for(level=level % 10) for level in range(100)]
+        output = pipeline.process_batch(lines)
+        assert len(output) == len(translated) == 50
+        # Configured drops must not count towards the HighErrorRate alert
+        assert pipeline.metrics.events_filtered.value == 0
+        assert prefilter.dropped["level"] == 50
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared-memory ring buffer
+"""
+import multiprocessing
+
+import pytest
+
+from shm_ring import ShmRing
+
+
+def produce(ring, producer, batches):
+    for batch in range(batches):
+        ring.put_many([b"%d:%d:%s" % (producer, batch * 3 + n, b"x" * (batch % 40))
+                       for n in range(3)])
+    ring.shm.close()
+
+
+class TestShmRing:
+
+    def test_frames_wrap_around(self):
+        ring = ShmRing(1024)
+        try:
+            received = []
+            for batch in range(300):
+                records = [b"%d-%d" % (batch, n) + b"." * (batch % 97) for n in range(batch % 4)]
+                assert ring.put_many(records)
+                received.append((records, ring.get_many(timeout=0)))
+            assert all(sent == got for sent, got in received)
+            assert len(ring) == 0
+            assert ring.put(b"single") and ring.get() == b"single"
+        finally:
+            ring.close()
+
+    def test_get_takes_one_frame_and_keeps_its_records(self):
+        ring = ShmRing(1024)
+        try:
+            assert ring.put_many([b"a", b"b", b"c"]) and ring.put(b"d")
+            assert ring.put_many([b"e", b"f"])
+            assert ring.get() == b"a"
+            # Only the first frame was taken from the ring
+            assert ring.get_frame(timeout=0) == [b"d"]
+            assert ring.get() == b"b"
+            assert ring.get_many(timeout=0) == [b"c", b"e", b"f"]
+            assert ring.get(timeout=0) is None and len(ring) == 0
+        finally:
+            ring.close()
+
+    def test_full_and_empty_time_out(self):
+        ring = ShmRing(256)
+        try:
+            assert ring.get_many(timeout=0.01) == []
+            assert ring.put(b"a" * 200)
+            assert not ring.put(b"b" * 100, timeout=0.01)
+            with pytest.raises(ValueError):
+                ring.put(b"c" * 300)
+            assert ring.get_many() == [b"a" * 200]
+        finally:
+            ring.close()
+        ring = ShmRing(256)
+        try:
+            # Batches larger than the ring are split into frames that fit
+            assert not ring.put_many([b"d" * 50] * 8, timeout=0.01)
+            assert ring.get_many() == [b"d" * 50] * 4
+        finally:
+            ring.close()
+
+    def test_multi_producer_processes_keep_per_producer_order(self):
+        context = multiprocessing.get_context("spawn")
+        ring = ShmRing.multi_producer(4096, context)
+        producers = [context.Process(target=produce, args=(ring, producer, 200))
+                     for producer in range(3)]
+        try:
+            for process in producers:
+                process.start()
+            received = []
+            while len(received) < 3 * 600:
+                received += ring.get_many(timeout=10)
+            for process in producers:
+                process.join()
+        finally:
+            ring.close()
+        for producer in range(3):
+            sequence = [int(record.split(b":")[1]) for record in received
+                        if record.startswith(b"%d:" % producer)]
+            assert sequence == list(range(600))
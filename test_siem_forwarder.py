@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batched SIEM forwarder against a local HTTP server
+"""
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from siem_forwarder import SiemForwarder, retry_after_seconds
+from sink_fanout import RetryPolicy
+
+
+class SiemServer:
+    """Local stand-in for EXTERNAL_SIEM_URL recording every request"""
+
+    def __init__(self, throttle=0, retry_after="0"):
+        self.requests = []
+        self.connections = set()
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                with owner.lock:
+                    owner.concurrent += 1
+                    owner.max_concurrent = max(owner.max_concurrent, owner.concurrent)
+                    owner.connections.add(self.client_address)
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(0.01)
+                with owner.lock:
+                    owner.concurrent -= 1
+                    throttled = owner.throttle > 0
+                    if throttled:
+                        owner.throttle -= 1
+                    else:
+                        owner.requests.append((dict(self.headers), body))
+                self.send_response(429 if throttled else 200)
+                if throttled:
+                    self.send_header("Retry-After", owner.retry_after)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d/ingest" % self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def events(self):
+        lines = []
+        for headers, body in self.requests:
+            if headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            lines.extend(body.split(b"\n")[:-1])
+        return lines
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = SiemServer()
+    yield server
+    server.close()
+
+
+def events(start, count):
+    return [b'{"n":%d}' % n for n in range(start, start + count)]
+
+
+class TestSiemForwarder:
+
+    def test_batches_by_size_and_compresses(self, server):
+        forwarder = SiemForwarder(server.url, token="secret", batch_events=100,
+                                  linger_ms=60000, max_in_flight=2)
+        for start in range(0, 1000, 10):
+            forwarder(events(start, 10))
+        forwarder.close()
+        assert len(server.requests) == 10
+        headers, _ = server.requests[0]
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Content-Type"] == "application/x-ndjson"
+        assert headers["Authorization"] == "Bearer secret"
+        assert sorted(server.events()) == sorted(events(0, 1000))
+        # Keep-alive: one connection per sender thread at most
+        assert len(server.connections) <= 2
+
+    def test_partial_batch_is_sent_after_linger(self, server):
+        forwarder = SiemForwarder(server.url, batch_events=1000, linger_ms=20)
+        forwarder(events(0, 5))
+        deadline = time.monotonic() + 5
+        while not server.requests and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert server.events() == events(0, 5)
+        forwarder.close()
+
+    def test_in_flight_requests_are_bounded(self, server):
+        forwarder = SiemForwarder(server.url, batch_events=10, linger_ms=60000,
+                                  compression=None, max_in_flight=3)
+        for start in range(0, 500, 10):
+            forwarder(events(start, 10))
+        forwarder.close()
+        assert server.max_concurrent <= 3
+        assert len(server.events()) == 500
+
+    def test_throttled_requests_honor_retry_after(self):
+        server = SiemServer(throttle=2)
+        try:
+            forwarder = SiemForwarder(server.url, batch_events=10, linger_ms=60000,
+                                      max_in_flight=1,
+                                      retry=RetryPolicy(initial_backoff=30, max_backoff=30))
+            start = time.monotonic()
+            forwarder(events(0, 10))
+            forwarder.close()
+            # Retry-After: 0 overrides the 30 s backoff
+            assert time.monotonic() - start < 5
+            assert forwarder.retries == 2
+            assert server.events() == events(0, 10)
+        finally:
+            server.close()
+
+    def test_retry_after_is_capped_at_max_backoff(self):
+        server = SiemServer(throttle=1, retry_after="86400")
+        try:
+            forwarder = SiemForwarder(server.url, batch_events=10, linger_ms=60000,
+                                      max_in_flight=1,
+                                      retry=RetryPolicy(initial_backoff=0.01, max_backoff=0.05))
+            start = time.monotonic()
+            forwarder(events(0, 10))
+            assert forwarder.flush(timeout=5)
+            assert time.monotonic() - start < 5
+            assert server.events() == events(0, 10)
+            assert forwarder.requests == 2
+            assert "ocsf_siem_requests_total 2\n" in "".join(forwarder.render())
+            forwarder.close()
+        finally:
+            server.close()
+
+    def test_close_gives_up_after_its_deadline(self):
+        server = SiemServer(throttle=10 ** 6)
+        try:
+            forwarder = SiemForwarder(server.url, linger_ms=60000)
+            assert forwarder.retry.max_retries is not None
+            forwarder.close()
+            # Retrying forever, both senders busy and a partial batch waiting
+            forwarder = SiemForwarder(server.url, batch_events=10, linger_ms=60000,
+                                      max_in_flight=2, retry=RetryPolicy())
+            forwarder(events(0, 25))
+            start = time.monotonic()
+            forwarder.close(timeout=0.2)
+            assert time.monotonic() - start < 3
+            assert forwarder.rejected == 25 and forwarder.in_flight == 0
+        finally:
+            server.close()
+
+    def test_retry_after_parsing(self):
+        assert retry_after_seconds("120") == 120.0
+        assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470) == 10.0
+        assert retry_after_seconds("soon") is None
+        assert retry_after_seconds(None) is None
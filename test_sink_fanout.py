@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the sink fan-out and the OpenSearch bulk sink
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bulk_sink import OpenSearchBulkSink, daily_index, next_index
+from sink_fanout import (
+    OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_SPILL, FanoutSink, RetryPolicy, SinkError, SinkWorker,
+)
+
+
+class ListSink:
+
+    def __init__(self, failures=0):
+        self.events = []
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, events):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise SinkError("down")
+        self.events.extend(events)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def batch(start, size=10):
+    return [b'{"n":%d}' % n for n in range(start, start + size)]
+
+
+class TestSinkFanout:
+
+    def test_stuck_secondary_does_not_stall_primary(self):
+        release = threading.Event()
+        primary = ListSink()
+        secondary = ListSink()
+
+        def stuck(events):
+            release.wait()
+            secondary(events)
+
+        fanout = FanoutSink([
+            SinkWorker("index", primary, overflow=OVERFLOW_BLOCK),
+            SinkWorker("siem", stuck, max_queued_events=20, overflow=OVERFLOW_DROP),
+        ])
+        for start in range(0, 500, 10):
+            fanout(batch(start))
+        wait_for(lambda: len(primary.events) == 500)
+        siem = fanout.workers[1]
+        assert siem.dropped > 0
+        release.set()
+        fanout.close()
+        assert len(secondary.events) + siem.dropped == 500
+        assert 'ocsf_sink_events_dropped_total{sink="siem"}' in "".join(fanout.render())
+
+    def test_events_are_shared_not_copied(self):
+        first, second = ListSink(), ListSink()
+        fanout = FanoutSink([SinkWorker("a", first), SinkWorker("b", second)])
+        events = batch(0)
+        fanout(events)
+        fanout.close()
+        assert all(a is b for a, b in zip(first.events, second.events))
+
+    def test_spill_replays_in_order_after_recovery(self, tmp_path):
+        sink = ListSink(failures=3)
+        worker = SinkWorker("file", sink, max_queued_events=10, overflow=OVERFLOW_SPILL,
+                            spill_dir=str(tmp_path),
+                            retry=RetryPolicy(initial_backoff=0.02, max_backoff=0.02))
+        fanout = FanoutSink([worker])
+        for start in range(0, 100, 10):
+            fanout(batch(start))
+        wait_for(lambda: len(sink.events) == 100)
+        fanout.close()
+        assert worker.spilled > 0
+        assert sink.events == batch(0, 100)
+        assert worker.healthy and worker.dropped == 0
+
+    def test_spill_survives_restart(self, tmp_path):
+        release = threading.Event()
+        worker = SinkWorker("file", lambda events: release.wait(), max_queued_events=10,
+                            overflow=OVERFLOW_SPILL, spill_dir=str(tmp_path))
+        worker.start()
+        for start in range(0, 50, 10):
+            worker.put(batch(start))
+        worker.close(timeout=0.1)
+        release.set()
+
+        sink = ListSink()
+        restarted = SinkWorker("file", sink, max_queued_events=10,
+                               overflow=OVERFLOW_SPILL, spill_dir=str(tmp_path))
+        restarted.start()
+        restarted.put(batch(50))
+        wait_for(lambda: len(sink.events) >= 50)
+        restarted.close()
+        # The batch held by the stuck sink is lost with it; the rest replays in order
+        assert sink.events[-10:] == batch(50)
+        assert sink.events == sorted(sink.events, key=lambda e: json.loads(e)["n"])
+
+    def test_partial_failure_retries_only_remaining_events(self):
+        seen = []
+
+        def flaky(events):
+            seen.append(list(events))
+            if len(seen) == 1:
+                raise SinkError("partial", events[5:])
+
+        worker = SinkWorker("index", flaky, retry=RetryPolicy(initial_backoff=0.001))
+        worker.start()
+        worker.put(batch(0))
+        worker.close()
+        assert seen == [batch(0), batch(5, 5)]
+        assert worker.delivered == 10 and worker.failures == 1
+
+    def test_queued_batches_merge_up_to_max_batch_events(self):
+        sizes = []
+        worker = SinkWorker("archives", lambda events: sizes.append(len(events)),
+                            max_batch_events=25)
+        for start in range(0, 60, 10):
+            worker.put(batch(start))
+        worker.start()
+        worker.close()
+        assert sizes == [20, 20, 20]
+        assert worker.delivered == 60
+
+    def test_pipeline_acks_only_after_primary_delivery(self):
+        from ocsf_pipeline import OcsfPipeline
+        from ocsf_translator import OcsfTranslator
+        from test_ocsf_translator import make_alert
+
+        release = threading.Event()
+        primary = ListSink(failures=2)
+
+        def slow(events):
+            release.wait()
+            primary(events)
+
+        fanout = FanoutSink([
+            SinkWorker("index", slow, overflow=OVERFLOW_BLOCK,
+                       retry=RetryPolicy(initial_backoff=0.001)),
+            SinkWorker("file", ListSink()),
+        ])
+        acked = []
+        pipeline = OcsfPipeline(OcsfTranslator(), fanout)
+        line = json.dumps(make_alert()).encode()
+        for token in range(3):
+            pipeline.deliver([line] if token != 1 else [b"not json"],
+                             lambda token=token: acked.append(token))
+        time.sleep(0.05)
+        assert acked == []
+        release.set()
+        wait_for(lambda: len(acked) == 3)
+        assert acked == [0, 1, 2] and len(primary.events) == 2
+
+        # Batches a stuck primary never delivered are not acked on close
+        release.clear()
+        pipeline.deliver([line], lambda: acked.append(3))
+        fanout.close(timeout=0.05)
+        assert acked == [0, 1, 2]
+        release.set()
+
+
+class TestOpenSearchBulkSink:
+
+    def test_bulk_body_and_item_retries(self):
+        requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                requests.append((self.path, body))
+                lines = body.split(b"\n")[:-1]
+                items = [{"index": {"status": 201}} for _ in lines[::2]]
+                if len(requests) == 1:
+                    items[1] = {"index": {"status": 429}}
+                    items[2] = {"index": {"status": 400}}
+                data = json.dumps({"errors": len(requests) == 1, "items": items}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sink = OpenSearchBulkSink("http://127.0.0.1:%d" % server.server_address[1])
+        worker = SinkWorker("index", sink, retry=RetryPolicy(initial_backoff=0.001))
+        worker.start()
+        try:
+            worker.put(batch(0, 3))
+            worker.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        path, body = requests[0]
+        assert path == "/_bulk"
+        action = json.loads(body.split(b"\n")[0])
+        assert action == {"index": {"_index": daily_index()}}
+        assert body.split(b"\n")[1] == b'{"n":0}'
+        # Only the throttled item is resent; the mapping error is counted
+        assert requests[1][1].split(b"\n")[1] == b'{"n":1}'
+        assert sink.rejected == 1
+
+    def test_oversized_requests_split_and_refused_requests_rejected(self):
+        sizes = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                count = body.count(b"\n") // 2
+                if b'"n":99' in body:
+                    status, document = 401, {"error": "unauthorized"}
+                elif count > 2:
+                    status, document = 413, {"error": "too large"}
+                else:
+                    sizes.append(count)
+                    status, document = 200, {"errors": False, "items": []}
+                data = json.dumps(document).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sink = OpenSearchBulkSink("http://127.0.0.1:%d" % server.server_address[1])
+        try:
+            sink(batch(0, 5))
+            # A refused request is counted, not raised for endless retries
+            sink(batch(99, 1))
+        finally:
+            sink.close()
+            server.shutdown()
+            server.server_close()
+
+        assert sizes == [2, 1, 2]
+        assert sink.index_docs == 5 and sink.rejected == 1
+
+
+class AliasStandIn(BaseHTTPRequestHandler):
+    """Just enough of _bulk, _alias, _aliases and index creation for rollover"""
+
+    protocol_version = "HTTP/1.1"
+    indices = {}
+    aliases = {}
+
+    def reply(self, status, document):
+        data = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        if self.path.startswith("/_alias/"):
+            alias = self.path[len("/_alias/"):]
+            found = {index: {"aliases": {alias: {"is_write_index": writer}}}
+                     for (name, index), writer in self.aliases.items() if name == alias}
+            return self.reply(200 if found else 404, found or {"error": "alias missing"})
+        index = self.path.split("/")[1]
+        self.reply(200, {"_all": {"primaries": {"docs": {"count": len(self.indices[index])}}}})
+
+    def do_PUT(self):
+        index = self.path[1:]
+        if index in self.indices:
+            return self.reply(400, {"error": {"type": "resource_already_exists_exception"}})
+        self.indices[index] = []
+        body = self.body()
+        for alias, options in (json.loads(body).get("aliases", {}) if body else {}).items():
+            self.aliases[(alias, index)] = options.get("is_write_index", False)
+        self.reply(200, {"acknowledged": True})
+
+    def do_POST(self):
+        body = self.body()
+        if self.path == "/_aliases":
+            for action in json.loads(body)["actions"]:
+                add = action["add"]
+                self.aliases[(add["alias"], add["index"])] = add["is_write_index"]
+            return self.reply(200, {"acknowledged": True})
+        lines = body.split(b"\n")[:-1]
+        for action, source in zip(lines[::2], lines[1::2]):
+            self.indices[json.loads(action)["index"]["_index"]].append(source)
+        self.reply(200, {"errors": False, "items": [{"index": {"status": 201}}] * (len(lines) // 2)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBulkRollover:
+
+    def test_next_index(self):
+        assert next_index("ocsf-security-events-000009") == "ocsf-security-events-000010"
+        assert next_index("ocsf") == "ocsf-000001"
+
+    def test_size_and_doc_count_rollover(self):
+        AliasStandIn.indices, AliasStandIn.aliases = {}, {}
+        server = ThreadingHTTPServer(("127.0.0.1", 0), AliasStandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:%d" % server.server_address[1]
+        try:
+            sink = OpenSearchBulkSink(url, rollover_alias="ocsf", max_index_bytes=60,
+                                      max_index_docs=None)
+            for start in range(0, 12, 3):
+                sink(batch(start, 3))
+            # 3 events of 8 bytes per batch: the limit is crossed every third batch
+            assert sorted(AliasStandIn.indices) == ["ocsf-000001", "ocsf-000002"]
+            assert len(AliasStandIn.indices["ocsf-000001"]) == 9
+            assert AliasStandIn.aliases == {("ocsf", "ocsf-000001"): False,
+                                            ("ocsf", "ocsf-000002"): True}
+            assert sink.rollovers == 1 and sink.index_docs == 3
+            sink.close()
+
+            # A restarted writer resumes the existing write index and its doc count
+            sink = OpenSearchBulkSink(url, rollover_alias="ocsf", max_index_bytes=None,
+                                      max_index_docs=4)
+            sink(batch(12, 2))
+            # The 3 documents found in ocsf-000002 are sized like the new ones
+            assert sink.index_docs == 5 and sink.index_bytes == 5 * 8
+            sink(batch(14, 1))
+            assert sink._index == "ocsf-000003"
+            assert [len(AliasStandIn.indices[i]) for i in sorted(AliasStandIn.indices)] == [9, 5, 1]
+            assert "ocsf_bulk_rollovers_total 1\n" in "".join(sink.render())
+            sink.close()
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for thread-parallel translation and the sharded caches
+"""
+import functools
+import json
+import sys
+import threading
+
+from benchmark_suite import generate_corpus
+from ocsf_pipeline import NdjsonFileSink, OcsfPipeline
+from ocsf_translator import OcsfTranslator
+from sharded_cache import ShardedCache, lru_cache
+from test_ocsf_translator import make_alert
+from threaded_translation import ThreadedTranslator
+
+
+class TestThreadedTranslation:
+
+    def test_sharded_cache_memoizes_within_bounds(self):
+        calls = []
+
+        def square(value):
+            calls.append(value)
+            return value * value
+
+        cache = ShardedCache(square, maxsize=64, shards=4)
+        assert [cache(n) for n in range(8)] == [cache(n) for n in range(8)]
+        assert len(calls) == 8
+        assert cache.cache_info()[:2] == (8, 8)
+        for n in range(1000):
+            cache(n)
+        assert cache.cache_info().currsize <= 64
+        cache.cache_clear()
+        assert cache.cache_info() == (0, 0, 64, 0)
+
+        def hammer():
+            for n in range(2000):
+                assert cache(n % 300) == (n % 300) ** 2
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_lru_cache_follows_the_gil(self, monkeypatch):
+        assert isinstance(lru_cache(8)(abs), functools._lru_cache_wrapper)
+        monkeypatch.setattr(sys, "_is_gil_enabled", lambda: False, raising=False)
+        cached = lru_cache(8)(abs)
+        assert isinstance(cached, ShardedCache) and cached(-3) == 3
+
+    def test_threaded_pipeline_matches_serial(self):
+        lines = generate_corpus("mixed", 1500) + [b"not json"]
+        translator = OcsfTranslator()
+        serial = OcsfPipeline(translator, None).process_batch(lines)
+        threaded = ThreadedTranslator(translator, threads=4, min_chunk=50)
+        try:
+            pipeline = OcsfPipeline(translator, None, threaded=threaded)
+            assert pipeline.process_batch(lines) == serial
+            assert pipeline.metrics.events_filtered.value == 1
+        finally:
+            threaded.close()
+
+    def test_malformed_alerts_go_to_the_error_sink(self):
+        bad = [json.dumps(make_alert(timestamp="bad")).encode(),
+               json.dumps(make_alert(rule={"id": "1", "level": "x"})).encode(),
+               json.dumps(make_alert(rule="5712")).encode()]
+        lines = bad + generate_corpus("mixed", 200)
+        translator = OcsfTranslator()
+        threaded = ThreadedTranslator(translator, threads=2, min_chunk=50)
+        try:
+            for options in ({}, {"threaded": threaded}):
+                errors = []
+                pipeline = OcsfPipeline(translator, None, error_sink=errors.extend, **options)
+                assert len(pipeline.process_batch(lines)) == 200
+                assert errors == bad
+                assert pipeline.metrics.events_filtered.value == 3
+        finally:
+            threaded.close()
+
+    def test_error_file_collects_failures_until_stop(self, tmp_path):
+        bad = json.dumps(make_alert(timestamp="bad")).encode()
+        invalid = json.dumps(make_alert(rule={"id": "1"})).encode()
+        path = tmp_path / "errors.ndjson"
+        sunk = []
+        pipeline = OcsfPipeline(OcsfTranslator(), sunk.extend,
+                                error_sink=NdjsonFileSink(str(path)))
+        pipeline.deliver([bad, invalid] + generate_corpus("mixed", 5))
+        pipeline.stop()
+        records = path.read_bytes().splitlines()
+        assert len(sunk) == 5 and records[0] == bad
+        assert "ocsf_validation_errors" in json.loads(records[1])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the segment-file write-ahead queue
+"""
+import os
+
+import pytest
+
+from wal_queue import SegmentQueue, RECORD_HEADER
+
+
+class TestSegmentQueue:
+
+    def test_append_and_read_in_order(self, tmp_path):
+        """Test records are returned in append order after a commit"""
+        with SegmentQueue(str(tmp_path)) as queue:
+            queue.append_batch([b"alert-%d" % i for i in range(10)])
+            records = queue.read("translator", max_records=100)
+
+        assert [r.payload for r in records] == [b"alert-%d" % i for i in range(10)]
+
+    def test_uncommitted_records_not_visible(self, tmp_path):
+        """Test consumers only see group-committed records"""
+        with SegmentQueue(str(tmp_path), group_commit_ms=60000,
+                          group_commit_records=100) as queue:
+            queue.append(b"first")
+            assert queue.read("translator") == []
+            queue.sync()
+            assert [r.payload for r in queue.read("translator")] == [b"first"]
+
+    def test_restart_replays_unacknowledged_records(self, tmp_path):
+        """Test a reopened queue resumes from the last acknowledged offset"""
+        with SegmentQueue(str(tmp_path)) as queue:
+            queue.append_batch([b"a", b"b", b"c"])
+            records = queue.read("translator")
+            queue.ack("translator", records[0].next_position)
+
+        with SegmentQueue(str(tmp_path)) as queue:
+            assert [r.payload for r in queue.read("translator")] == [b"b", b"c"]
+            queue.append_batch([b"d"])
+            assert [r.payload for r in queue.read("translator")] == [b"d"]
+
+    def test_segments_roll_and_are_collected(self, tmp_path):
+        """Test records roll into new segments and consumed ones are deleted"""
+        segment_size = 4 * (RECORD_HEADER.size + 100)
+        payloads = [bytes([i]) * 100 for i in range(10)]
+        with SegmentQueue(str(tmp_path), segment_size=segment_size) as queue:
+            queue.append_batch(payloads)
+            assert len([n for n in os.listdir(str(tmp_path)) if n.endswith(".seg")]) == 3
+
+            records = queue.read("translator", max_records=100)
+            assert [r.payload for r in records] == payloads
+            queue.ack("translator", records[-1].next_position)
+            queue.commit_offsets()
+
+            assert len([n for n in os.listdir(str(tmp_path)) if n.endswith(".seg")]) == 1
+
+    def test_torn_tail_is_discarded(self, tmp_path):
+        """Test a partially written record is dropped on recovery"""
+        with SegmentQueue(str(tmp_path)) as queue:
+            queue.append_batch([b"complete"])
+            end = queue.write_position
+
+        segment = [n for n in os.listdir(str(tmp_path)) if n.endswith(".seg")][0]
+        with open(os.path.join(str(tmp_path), segment), "r+b") as f:
+            f.seek(end)
+            f.write(RECORD_HEADER.pack(8, 0) + b"torn")
+
+        with SegmentQueue(str(tmp_path)) as queue:
+            assert queue.write_position == end
+            assert [r.payload for r in queue.read("translator")] == [b"complete"]
+
+    def test_oversized_record_rejected(self, tmp_path):
+        """Test records larger than a segment are refused"""
+        with SegmentQueue(str(tmp_path), segment_size=64) as queue:
+            with pytest.raises(ValueError):
+                queue.append(b"x" * 64)
+
+    def test_empty_record_rejected(self, tmp_path):
+        """Test an empty record cannot hide the records after it"""
+        with SegmentQueue(str(tmp_path)) as queue:
+            with pytest.raises(ValueError):
+                queue.append(b"")
+            with pytest.raises(ValueError):
+                queue.append_batch([b"a", b"", b"b"])
+            queue.append_batch([b"a", b"b"])
+            queue.sync()
+            assert [bytes(r.payload) for r in queue.read("c", 10)] == [b"a", b"b"]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batch alerts.json to OCSF converter
+"""
+import gzip
+import io
+import json
+
+from benchmark_suite import generate_corpus
+from test_ocsf_translator import make_alert
+from wazuh_ocsf_convert import convert
+
+
+def write_corpus(tmp_path, name="alerts.json", count=300):
+    lines = generate_corpus("mixed", count)
+    path = str(tmp_path / name)
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "wb") as f:
+        f.write(b"\n".join(lines) + b"\n\n")
+    return path, lines
+
+
+def read_ndjson(path):
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestConvert:
+
+    def test_plain_and_gzip_inputs_convert_identically(self, tmp_path):
+        plain, lines = write_corpus(tmp_path)
+        packed, _ = write_corpus(tmp_path, "alerts.json.gz")
+        progress = io.StringIO()
+        summary = convert([plain], str(tmp_path / "a.ndjson"), cache_dir=None,
+                          batch_lines=64, progress_stream=progress)
+        convert([packed], str(tmp_path / "b.ndjson"), cache_dir=None, progress_interval=0)
+        first = read_ndjson(str(tmp_path / "a.ndjson"))
+        assert first == read_ndjson(str(tmp_path / "b.ndjson"))
+        assert summary["lines"] == summary["events"] == len(first) == len(lines)
+        assert first[0]["raw_data"] == json.loads(lines[0])["full_log"]
+        assert "events/s" in progress.getvalue()
+
+    def test_workers_preserve_input_order(self, tmp_path):
+        path, lines = write_corpus(tmp_path, count=500)
+        errors = str(tmp_path / "errors.ndjson")
+        summary = convert([path, path], str(tmp_path / "out.ndjson.gz"), workers=2,
+                          errors=errors, cache_dir=str(tmp_path / "cache"),
+                          batch_lines=50, progress_interval=0)
+        with gzip.open(str(tmp_path / "out.ndjson.gz")) as f:
+            logs = [json.loads(line)["raw_data"] for line in f]
+        expected = [json.loads(line)["full_log"] for line in lines]
+        assert logs == expected + expected
+        assert summary["events"] == 1000 and summary["invalid"] == 0
+
+    def test_malformed_alerts_are_skipped_and_counted(self, tmp_path):
+        path = str(tmp_path / "alerts.json")
+        good = generate_corpus("mixed", 20)
+        bad = [json.dumps(make_alert(timestamp="bad")).encode(),
+               json.dumps(make_alert(rule="5712")).encode()]
+        with open(path, "wb") as f:
+            f.write(b"\n".join(good[:10] + bad + good[10:]) + b"\n")
+        progress = io.StringIO()
+        summary = convert([path], str(tmp_path / "out.ndjson"), cache_dir=None,
+                          progress_stream=progress)
+        assert summary["events"] == 20 and summary["failed"] == 2
+        assert len(read_ndjson(str(tmp_path / "out.ndjson"))) == 20
+        assert "2 failed" in progress.getvalue()
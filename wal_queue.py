@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Persistent segment-file write-ahead queue for the Wazuh-OCSF pipeline
+
+Sits between the alerts.json reader and the OCSF translator so that events
+survive a crash of the translator or the sink. Records are appended to
+mmap'd, preallocated segment files and made durable in group commits; each
+consumer keeps its own committed offset and segments that every consumer has
+moved past are deleted.
+"""
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+# Record header: payload length, crc32 of payload. A zero length marks the
+# unused tail of a segment.
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+OFFSET_SUFFIX = ".offset"
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+Record = namedtuple("Record", ["position", "next_position", "payload"])
+
+
+def write_atomic(path, data):
+    """Replace path with data using write-to-temp, fsync and rename"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class Segment:
+    """One preallocated, memory-mapped segment file"""
+
+    def __init__(self, path, base, size=None):
+        self.path = path
+        self.base = base
+        if size is not None:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self._file = open(path, "r+b")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), self.size)
+
+    @property
+    def end(self):
+        return self.base + self.size
+
+    def scan(self):
+        """Return the offset just past the last intact record"""
+        offset = 0
+        header_size = RECORD_HEADER.size
+        while offset + header_size <= self.size:
+            length, crc = RECORD_HEADER.unpack_from(self.mm, offset)
+            if length == 0:
+                break
+            end = offset + header_size + length
+            if end > self.size or zlib.crc32(self.mm[offset + header_size:end]) != crc:
+                # Torn write from a crash: clear it so it is never replayed
+                stop = min(end, self.size)
+                self.mm[offset:stop] = bytes(stop - offset)
+                break
+            offset = end
+        return offset
+
+    def flush(self, start, end):
+        """msync the dirty byte range [start, end)"""
+        if end <= start:
+            return
+        start -= start % mmap.ALLOCATIONGRANULARITY
+        self.mm.flush(start, end - start)
+
+    def close(self):
+        self.mm.close()
+        self._file.close()
+
+
+class SegmentQueue:
+    """Append-only, group-committed queue with per-consumer offsets"""
+
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE,
+                 group_commit_ms=5, group_commit_records=1000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.group_commit_interval = group_commit_ms / 1000.0
+        self.group_commit_records = group_commit_records
+        self._consumer_dir = os.path.join(directory, "consumers")
+        os.makedirs(self._consumer_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._offsets_lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._segments = []
+        self._bases = []
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._flusher = None
+        self._closed = False
+
+        self._load_segments()
+        self.durable_position = self.write_position
+        self._synced_offset = self.write_position - self._active.base
+
+        self._consumer_offsets = self._load_consumer_offsets()
+        self._cursors = dict(self._consumer_offsets)
+        self._offsets_dirty = False
+
+    # -- segments -----------------------------------------------------------
+
+    def _segment_path(self, base):
+        return os.path.join(self.directory, "%020d%s" % (base, SEGMENT_SUFFIX))
+
+    def _load_segments(self):
+        bases = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+        for base in bases:
+            self._add_segment(Segment(self._segment_path(base), base))
+        if not self._segments:
+            self._add_segment(Segment(self._segment_path(0), 0, self.segment_size))
+        self._write_offset = self._active.scan()
+
+    def _add_segment(self, segment):
+        self._segments.append(segment)
+        self._bases.append(segment.base)
+
+    @property
+    def _active(self):
+        return self._segments[-1]
+
+    @property
+    def write_position(self):
+        return self._active.base + self._write_offset
+
+    def _roll(self):
+        """Seal the active segment and start a new one"""
+        active = self._active
+        active.flush(self._synced_offset, self._write_offset)
+        base = active.end
+        self._add_segment(Segment(self._segment_path(base), base, self.segment_size))
+        self._write_offset = 0
+        self._synced_offset = 0
+
+    # -- producer -----------------------------------------------------------
+
+    def append(self, payload):
+        """Append one record and return its position"""
+        with self._lock:
+            position = self._append_locked(payload)
+            self._pending += 1
+            if (self._pending >= self.group_commit_records or
+                    time.monotonic() - self._last_sync >= self.group_commit_interval):
+                self._sync_locked()
+        return position
+
+    def append_batch(self, payloads):
+        """Append many records under a single group commit"""
+        payloads = list(payloads)
+        if not all(payloads):
+            raise ValueError("empty records cannot be queued")
+        with self._lock:
+            positions = [self._append_locked(p) for p in payloads]
+            self._pending += len(positions)
+            self._sync_locked()
+        return positions
+
+    def _append_locked(self, payload):
+        if self._closed:
+            raise ValueError("queue is closed")
+        if not payload:
+            # A zero length marks the unused tail of a segment
+            raise ValueError("empty records cannot be queued")
+        record_size = RECORD_HEADER.size + len(payload)
+        if record_size > self.segment_size:
+            raise ValueError("record of %d bytes exceeds segment size %d"
+                             % (len(payload), self.segment_size))
+        if self._write_offset + record_size > self._active.size:
+            self._roll()
+        mm = self._active.mm
+        offset = self._write_offset
+        RECORD_HEADER.pack_into(mm, offset, len(payload), zlib.crc32(payload))
+        mm[offset + RECORD_HEADER.size:offset + record_size] = payload
+        self._write_offset = offset + record_size
+        return self._active.base + offset
+
+    def sync(self):
+        """Make every appended record durable and visible to consumers"""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self.durable_position != self.write_position:
+            self._active.flush(self._synced_offset, self._write_offset)
+            self._synced_offset = self._write_offset
+            self.durable_position = self.write_position
+            self._committed.notify_all()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def start_flusher(self):
+        """Group-commit in the background so idle producers still sync"""
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                             name="wal-queue-flusher")
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed:
+            time.sleep(self.group_commit_interval)
+            with self._lock:
+                if self._closed:
+                    break
+                if self._pending:
+                    self._sync_locked()
+            self.commit_offsets()
+
+    # -- consumers ----------------------------------------------------------
+
+    def _load_consumer_offsets(self):
+        offsets = {}
+        for name in os.listdir(self._consumer_dir):
+            if name.endswith(OFFSET_SUFFIX):
+                with open(os.path.join(self._consumer_dir, name)) as f:
+                    offsets[name[:-len(OFFSET_SUFFIX)]] = int(f.read().strip() or 0)
+        return offsets
+
+    def _start_position(self):
+        return self._bases[0]
+
+    def read(self, consumer, max_records=512, timeout=None):
+        """Return up to max_records committed records after the consumer cursor"""
+        with self._lock:
+            if consumer not in self._cursors:
+                self._cursors[consumer] = self._start_position()
+                self._consumer_offsets[consumer] = self._cursors[consumer]
+            position = max(self._cursors[consumer], self._start_position())
+            if position >= self.durable_position and timeout:
+                self._committed.wait(timeout)
+            limit = self.durable_position
+            segments = list(self._segments)
+            bases = list(self._bases)
+
+        records = []
+        header_size = RECORD_HEADER.size
+        while position < limit and len(records) < max_records:
+            segment = segments[bisect.bisect_right(bases, position) - 1]
+            offset = position - segment.base
+            length = 0
+            if offset + header_size <= segment.size:
+                length, _ = RECORD_HEADER.unpack_from(segment.mm, offset)
+            if length == 0:
+                # Unused tail of a sealed segment
+                position = segment.end
+                continue
+            start = offset + header_size
+            next_position = segment.base + start + length
+            records.append(Record(position, next_position,
+                                  segment.mm[start:start + length]))
+            position = next_position
+
+        with self._lock:
+            self._cursors[consumer] = position
+        return records
+
+    def ack(self, consumer, position):
+        """Mark everything before position as processed by consumer"""
+        with self._lock:
+            if position > self._consumer_offsets.get(consumer, 0):
+                self._consumer_offsets[consumer] = position
+                self._offsets_dirty = True
+
+    def rewind(self, consumer):
+        """Reset the read cursor to the last acknowledged position"""
+        with self._lock:
+            self._cursors[consumer] = self._consumer_offsets.get(
+                consumer, self._start_position())
+
+    def lag(self, consumer):
+        """Committed bytes not yet acknowledged by consumer"""
+        with self._lock:
+            return self.durable_position - self._consumer_offsets.get(
+                consumer, self._start_position())
+
+    def commit_offsets(self):
+        """Persist consumer offsets atomically and drop fully consumed segments"""
+        with self._offsets_lock:
+            with self._lock:
+                if not self._offsets_dirty:
+                    return
+                offsets = dict(self._consumer_offsets)
+                self._offsets_dirty = False
+            for consumer, position in offsets.items():
+                path = os.path.join(self._consumer_dir, consumer + OFFSET_SUFFIX)
+                write_atomic(path, str(position).encode())
+            self.collect_garbage(offsets)
+
+    def collect_garbage(self, offsets=None):
+        """Delete segments that every consumer has acknowledged"""
+        with self._lock:
+            if offsets is None:
+                offsets = dict(self._consumer_offsets)
+            if not offsets:
+                return 0
+            low_water = min(offsets.values())
+            removed = 0
+            while len(self._segments) > 1 and self._segments[0].end <= low_water:
+                segment = self._segments.pop(0)
+                self._bases.pop(0)
+                segment.close()
+                os.remove(segment.path)
+                removed += 1
+            return removed
+
+    def close(self):
+        """Sync outstanding records and offsets, then unmap all segments"""
+        with self._lock:
+            self._sync_locked()
+            self._closed = True
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.commit_offsets()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
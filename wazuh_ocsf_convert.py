@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Batch converter: Wazuh alerts.json files to OCSF NDJSON or Parquet
+
+Runs the OCSF translator over archived alert files without Logstash, Data
+Prepper or the live pipeline, for forensic backfills and for measuring the
+engine on its own. Inputs may be plain, gzip (.gz) or zstd (.zst, needs the
+zstandard package) and are decompressed as a stream; '-' reads stdin.
+Output is NDJSON (gzip-compressed when the name ends in .gz) or Parquet
+(.parquet, needs pyarrow).
+
+With --workers N, batches of lines are translated by N processes whose
+translators load the compiled mapping plan from the plan cache, and results
+are written in input order. Alerts whose fields the translator cannot
+handle (a bad timestamp, a non-numeric rule.level) are skipped and counted
+as failed. Progress and throughput, failed counts included, go to stderr.
+With --geoip, endpoints are enriched from the mmap'd database, which the
+workers share through the page cache.
+
+    python wazuh_ocsf_convert.py alerts-2024-07-*.json.gz -o backfill.ndjson --workers 4
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from collections import deque
+from time import monotonic
+
+from ocsf_translator import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAPPING_PATH, TRANSLATION_ERRORS, OcsfTranslator,
+)
+
+BATCH_LINES = 2000
+# Flat columns for Parquet output; the whole event is kept in "event"
+PARQUET_COLUMNS = (
+    ("time", ("time",)),
+    ("class_uid", ("class_uid",)),
+    ("type_uid", ("type_uid",)),
+    ("severity_id", ("severity_id",)),
+    ("event_code", ("metadata", "event_code")),
+    ("device_name", ("device", "name")),
+    ("finding_uid", ("finding", "uid")),
+)
+
+_translator = None
+
+
+def open_input(path):
+    """Return (line stream, raw file) for a plain, .gz or .zst input"""
+    if path == "-":
+        return sys.stdin.buffer, None
+    raw = open(path, "rb")
+    if path.endswith(".gz"):
+        return io.BufferedReader(gzip.GzipFile(fileobj=raw), 1 << 20), raw
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raw.close()
+            raise ValueError("reading .zst files needs the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        return io.BufferedReader(reader, 1 << 20), raw
+    return raw, raw
+
+
+def read_batches(paths, batch_lines=BATCH_LINES, progress=None):
+    """Yield lists of non-empty lines across input files"""
+    for path in paths:
+        stream, raw = open_input(path)
+        try:
+            batch = []
+            for line in stream:
+                line = line.rstrip(b"\r\n")
+                if not line:
+                    continue
+                batch.append(line)
+                if len(batch) >= batch_lines:
+                    if progress is not None and raw is not None:
+                        progress.read_to(raw.tell())
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            if progress is not None:
+                progress.finish_file(raw.tell() if raw is not None else 0)
+            if stream is not raw:
+                stream.close()
+            if raw is not None:
+                raw.close()
+
+
+def convert_batch(translator, lines):
+    """Translate lines; returns (encoded events, invalid events, skipped, failed)"""
+    encode = translator.encode
+    events = []
+    invalid = []
+    skipped = 0
+    failed = 0
+    for line in lines:
+        try:
+            event = translator.translate_line(line)
+        except TRANSLATION_ERRORS:
+            failed += 1
+            continue
+        if event is None:
+            skipped += 1
+        elif "ocsf_validation_errors" in event:
+            invalid.append(encode(event))
+        else:
+            events.append(encode(event))
+    return events, invalid, skipped, failed
+
+
+def make_translator(mapping_path=DEFAULT_MAPPING_PATH, cache_dir=None, geoip=None):
+    translator = OcsfTranslator(mapping_path, cache_dir=cache_dir)
+    if geoip:
+        from geoip_enrichment import GeoIpEnricher
+        translator.add_stage("geoip", GeoIpEnricher.load(geoip))
+    return translator
+
+
+def _init_worker(mapping_path, cache_dir, geoip):
+    global _translator
+    _translator = make_translator(mapping_path, cache_dir, geoip)
+
+
+def _convert_in_worker(lines):
+    return convert_batch(_translator, lines)
+
+
+def _ordered_results(pool, batches, max_in_flight):
+    """Results in input order, with at most max_in_flight batches submitted
+
+    Pool.imap reads its whole input ahead of the workers; bounding the
+    submissions keeps memory flat on multi-gigabyte backfills.
+    """
+    pending = deque()
+    for lines in batches:
+        pending.append(pool.apply_async(_convert_in_worker, (lines,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class NdjsonWriter:
+    """Write encoded events as NDJSON, gzip-compressed for .gz names"""
+
+    def __init__(self, path):
+        if path == "-":
+            self._file = sys.stdout.buffer
+            self._owned = False
+        else:
+            self._file = (gzip.open(path, "wb", compresslevel=6) if path.endswith(".gz")
+                          else open(path, "wb"))
+            self._owned = True
+
+    def write(self, events):
+        if events:
+            self._file.write(b"\n".join(events) + b"\n")
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class ParquetWriter:
+    """Write encoded events to Parquet: flat key columns plus the event JSON"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet output needs the pyarrow package")
+        self._pa = pyarrow
+        self.schema = pyarrow.schema(
+            [("time", pyarrow.timestamp("ms", tz="UTC")), ("class_uid", pyarrow.int32()),
+             ("type_uid", pyarrow.int64()), ("severity_id", pyarrow.int8()),
+             ("event_code", pyarrow.string()), ("device_name", pyarrow.string()),
+             ("finding_uid", pyarrow.string()), ("event", pyarrow.string())])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, events):
+        if not events:
+            return
+        columns = {name: [] for name, _ in PARQUET_COLUMNS}
+        texts = []
+        for encoded in events:
+            event = json.loads(encoded)
+            for name, path in PARQUET_COLUMNS:
+                value = event
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                columns[name].append(value)
+            texts.append(encoded.decode("utf-8"))
+        columns["event"] = texts
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_output(path, output_format=None):
+    if output_format is None:
+        output_format = "parquet" if path.endswith(".parquet") else "ndjson"
+    if output_format == "parquet":
+        if path == "-":
+            raise ValueError("Parquet output needs a file name")
+        return ParquetWriter(path)
+    return NdjsonWriter(path)
+
+
+class Progress:
+    """Input bytes, events and throughput, reported to stderr"""
+
+    def __init__(self, total_bytes, interval=2.0, stream=sys.stderr):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.stream = stream
+        self.start = self._last = monotonic()
+        self.lines = 0
+        self.events = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.failed = 0
+        self._done_bytes = 0
+        self._file_bytes = 0
+
+    @property
+    def bytes_read(self):
+        return self._done_bytes + self._file_bytes
+
+    def read_to(self, offset):
+        self._file_bytes = offset
+
+    def finish_file(self, size):
+        self._done_bytes += size
+        self._file_bytes = 0
+
+    def add(self, lines, events, invalid, skipped, failed=0):
+        self.lines += lines
+        self.events += events
+        self.invalid += invalid
+        self.skipped += skipped
+        self.failed += failed
+        now = monotonic()
+        if self.interval and now - self._last >= self.interval:
+            self._last = now
+            self.report(now)
+
+    def summary(self, now=None):
+        elapsed = max((now or monotonic()) - self.start, 1e-9)
+        return {"lines": self.lines, "events": self.events, "invalid": self.invalid,
+                "skipped": self.skipped, "failed": self.failed, "bytes_read": self.bytes_read,
+                "seconds": round(elapsed, 3),
+                "events_per_second": round(self.events / elapsed, 1),
+                "mb_per_second": round(self.bytes_read / elapsed / 1e6, 2)}
+
+    def report(self, now=None):
+        stats = self.summary(now)
+        done = ("%5.1f%% " % (100.0 * self.bytes_read / self.total_bytes)
+                if self.total_bytes else "")
+        self.stream.write("%s%d lines, %d events, %d invalid, %d skipped, %d failed, "
+                          "%.0f events/s, %.1f MB/s\n" % (
+                              done, stats["lines"], stats["events"], stats["invalid"],
+                              stats["skipped"], stats["failed"], stats["events_per_second"],
+                              stats["mb_per_second"]))
+        self.stream.flush()
+
+
+def convert(paths, output, mapping_path=DEFAULT_MAPPING_PATH, workers=1,
+            output_format=None, errors=None, cache_dir=DEFAULT_CACHE_DIR, geoip=None,
+            batch_lines=BATCH_LINES, progress_interval=2.0, progress_stream=sys.stderr):
+    """Convert alert files into output; returns the run summary"""
+    total = sum(os.path.getsize(p) for p in paths if p != "-" and os.path.isfile(p))
+    progress = Progress(total, progress_interval, progress_stream)
+    writer = open_output(output, output_format)
+    error_writer = NdjsonWriter(errors) if errors else None
+    pool = None
+    try:
+        batches = read_batches(paths, batch_lines, progress)
+        if workers > 1:
+            import multiprocessing
+            pool = multiprocessing.get_context("spawn").Pool(
+                workers, _init_worker, (mapping_path, cache_dir, geoip))
+            results = _ordered_results(pool, batches, workers * 4)
+        else:
+            translator = make_translator(mapping_path, cache_dir, geoip)
+            results = (convert_batch(translator, lines) for lines in batches)
+        for events, invalid, skipped, failed in results:
+            writer.write(events)
+            if error_writer is not None:
+                error_writer.write(invalid)
+            progress.add(len(events) + len(invalid) + skipped + failed,
+                         len(events), len(invalid), skipped, failed)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        writer.close()
+        if error_writer is not None:
+            error_writer.close()
+    if progress_interval:
+        progress.report()
+    return progress.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert Wazuh alerts.json files (plain, .gz, .zst) to OCSF")
+    parser.add_argument("inputs", nargs="+", help="alert files, or '-' for stdin")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output file: .ndjson, .ndjson.gz or .parquet ('-' for stdout)")
+    parser.add_argument("--format", choices=("ndjson", "parquet"),
+                        help="output format (default: from the output name)")
+    parser.add_argument("--geoip", help="GeoIP/ASN database built by geoip_enrichment.py")
+    parser.add_argument("--errors", help="NDJSON file for events failing OCSF validation")
+    parser.add_argument("--workers", type=int, default=1, help="translator processes")
+    parser.add_argument("--batch-lines", type=int, default=BATCH_LINES)
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_PATH)
+    parser.add_argument("--plan-cache", default=DEFAULT_CACHE_DIR,
+                        help="directory for the compiled mapping cache ('' disables it)")
+    parser.add_argument("--progress", type=float, default=2.0,
+                        help="seconds between progress lines on stderr (0 disables)")
+    args = parser.parse_args()
+
+    try:
+        summary = convert(args.inputs, args.output, mapping_path=args.mapping,
+                          workers=max(args.workers, 1), output_format=args.format,
+                          errors=args.errors, geoip=args.geoip,
+                          cache_dir=args.plan_cache or None, batch_lines=args.batch_lines,
+                          progress_interval=args.progress)
+    except ValueError as exc:
+        parser.error(str(exc))
+    json.dump(summary, sys.stderr)
+    sys.stderr.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())